@@ -0,0 +1,90 @@
+"""
+Compares the memory taken by lessons in the current Lesson representation and in the previous one (a frozen
+dataclass with a per-instance __dict__, a lecturers list and non-interned strings).
+
+Usage: python benchmarks/lesson_memory.py [number of lessons]
+"""
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List, Tuple
+
+from hujiscrape.huji_objects import Lesson
+
+DAYS = ["יום א'", "יום ב'", "יום ג'", "יום ד'", "יום ה'", "יום ו'"]
+SEMESTERS = ["סמסטר א'", "סמסטר ב'", "שנתי"]
+TYPES = ["שעור", "תרגיל", "מעבדה", "סמינר"]
+PASSING_TYPES = ["באולם ומוקלט", "בקמפוס", ""]
+LOCATIONS = [f"פלדמן {i} (קרית א\"י ספרא)" for i in range(200)]
+LECTURERS = [f"ד\"ר מרצה {i}" for i in range(2000)]
+
+
+@dataclass(frozen=True)
+class LegacyLesson:
+    location: str
+    passing_type: str
+    time: str
+    day: str
+    semester: str
+    group: str
+    type: str
+    lecturers: List[str]
+    row: int
+
+    @cached_property
+    def _split_time(self) -> Tuple[str, str]:
+        try:
+            end_time, start_time = self.time.split('-')
+        except ValueError:
+            return '', ''
+        return start_time, end_time
+
+
+def _copy(text: str) -> str:
+    # Parsed strings are distinct objects even when equal, like the strings produced by the html parser
+    return (text + ".")[:-1]
+
+
+def build(lesson_type, count: int) -> list:
+    lessons = []
+    for i in range(count):
+        lesson = lesson_type(
+            location=_copy(LOCATIONS[i % len(LOCATIONS)]),
+            passing_type=_copy(PASSING_TYPES[i % len(PASSING_TYPES)]),
+            time=_copy(f"{10 + i % 8}:45-{9 + i % 8}:00"),
+            day=_copy(DAYS[i % len(DAYS)]),
+            semester=_copy(SEMESTERS[i % len(SEMESTERS)]),
+            group=_copy(f"({i % 30})"),
+            type=_copy(TYPES[i % len(TYPES)]),
+            lecturers=[_copy(LECTURERS[i % len(LECTURERS)])],
+            row=i % 10,
+        )
+        # Start and end times are used by sorting, which fills the legacy cache
+        if isinstance(lesson, LegacyLesson):
+            lesson._split_time
+        lessons.append(lesson)
+    return lessons
+
+
+def measure(lesson_type, count: int) -> int:
+    tracemalloc.start()
+    lessons = build(lesson_type, count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del lessons
+    return size
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    legacy = measure(LegacyLesson, count)
+    current = measure(Lesson, count)
+    print(f"{count} lessons")
+    print(f"legacy:  {legacy / 1024 / 1024:8.1f} MB ({legacy / count:.0f} bytes per lesson)")
+    print(f"current: {current / 1024 / 1024:8.1f} MB ({current / count:.0f} bytes per lesson)")
+    print(f"reduction: {1 - current / legacy:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Runs the local stand-in for the Shnaton server (see tests/standin.py), and records the pages of real courses for
+it to replay (see record_pages).
+
+Usage: python -m benchmarks.standin [--port 8080] [--pages DIR] [--latency 0.05] [--error-rate 0.01] ...
+       python -m benchmarks.standin --record DIR --year 2026 COURSE_ID [COURSE_ID ...]
+(from the repository root)
+"""
+import argparse
+import asyncio
+from pathlib import Path
+from typing import Iterable
+
+from hujiscrape.fetch_tasks import CourseFetchTask, ExamFetchTask
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.scrapers import SingleCourseScraper
+from tests.standin import ShnatonStandIn, StandInConfig
+
+async def record_pages(course_ids: Iterable[int | str], year: int, pages_dir: str) -> int:
+    """
+    Saves the course and exam pages of the courses from the real Shnaton, for the stand-in to replay.
+    :return: the number of courses recorded.
+    """
+    directory = Path(pages_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    recorded = 0
+    async with Fetcher() as fetcher:
+        for course_id in course_ids:
+            course_html = await fetcher.fetch(CourseFetchTask(course_id, year))
+            if SingleCourseScraper.MISSING_COURSE_TEXT in course_html:
+                continue
+            exams_html = await fetcher.fetch(ExamFetchTask(course_id, year))
+            (directory / f"course_{course_id}.html").write_text(course_html, encoding="utf-8")
+            (directory / f"exams_{course_id}.html").write_text(exams_html, encoding="utf-8")
+            recorded += 1
+    return recorded
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = StandInConfig()
+    parser.add_argument("--pages", help="directory of recorded pages")
+    parser.add_argument("--latency", type=float, default=defaults.latency)
+    parser.add_argument("--latency-jitter", type=float, default=defaults.latency_jitter)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--reset-rate", type=float, default=defaults.reset_rate)
+    parser.add_argument("--slow-body-rate", type=float, default=defaults.slow_body_rate)
+    parser.add_argument("--slow-body-delay", type=float, default=defaults.slow_body_delay)
+    parser.add_argument("--missing-rate", type=float, default=defaults.missing_rate)
+
+
+def config_from_arguments(args: argparse.Namespace) -> StandInConfig:
+    return StandInConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        reset_rate=args.reset_rate,
+        slow_body_rate=args.slow_body_rate,
+        slow_body_delay=args.slow_body_delay,
+        missing_rate=args.missing_rate,
+    )
+
+
+async def serve(args: argparse.Namespace) -> None:
+    async with ShnatonStandIn(config_from_arguments(args), args.pages, args.port) as stand_in:
+        print(f"Serving at {stand_in.url}")
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8080)
+    add_config_arguments(parser)
+    parser.add_argument("--record", metavar="DIR", help="record the pages of the given courses into DIR")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("course_ids", nargs="*")
+    args = parser.parse_args()
+
+    if args.record:
+        recorded = asyncio.run(record_pages(args.course_ids, args.year, args.record))
+        print(f"Recorded {recorded} courses into {args.record}")
+    else:
+        asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Micro-benchmarks of the html parsers over a corpus of course and exam pages, with pytest-benchmark:
+    pytest benchmarks/test_parser_corpus.py [--benchmark-json results.json]
+
+The corpus is the pages of tests/data, a pathologically large course page with many schedule rows built from
+them, and the pages recorded into the directory in $HUJISCRAPE_CORPUS (see benchmarks/standin.py --record), if
+set. The stage timings of each benchmark (see ParseProfile) are saved in its extra_info.
+
+Run as a script to print the stage timings of parsing the whole corpus instead:
+    python benchmarks/test_parser_corpus.py [bs4|lxml]
+"""
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+import pytest
+
+from hujiscrape.html_to_object import BS4_ENGINE, LXML_ENGINE, HtmlToCourse, HtmlToExams, lxml
+from hujiscrape.parse_pool import COURSE_PAGE, EXAMS_PAGE
+from hujiscrape.parse_profiles import ParseProfile
+
+TEST_DATA_DIR = Path(__file__).parent.parent / "tests" / "data"
+LARGE_PAGE_ROWS = 500
+ENGINES = [BS4_ENGINE] + ([LXML_ENGINE] if lxml is not None else [])
+PARSERS = {COURSE_PAGE: HtmlToCourse, EXAMS_PAGE: HtmlToExams}
+
+if __name__ != "__main__":
+    pytest.importorskip("pytest_benchmark")
+
+
+def _large_course_page(html: str, rows: int) -> str:
+    # Repeats the schedule rows (after the title row) of the page
+    first_row = html.index('<div class="row">')
+    schedule_end = html.rindex("</div>", 0, html.rindex("</div>", 0, html.index("</body>")))
+    return html[:first_row] + html[first_row:schedule_end] * rows + html[schedule_end:]
+
+
+def load_corpus() -> Dict[str, Tuple[str, str]]:
+    """
+    :return: page name -> (page type, html)
+    """
+    course_html = (TEST_DATA_DIR / "course.html").read_text(encoding="utf-8")
+    corpus = {
+        "course": (COURSE_PAGE, course_html),
+        "exams": (EXAMS_PAGE, (TEST_DATA_DIR / "exams.html").read_text(encoding="utf-8")),
+        f"course_{LARGE_PAGE_ROWS}_rows": (COURSE_PAGE, _large_course_page(course_html, LARGE_PAGE_ROWS)),
+    }
+
+    recorded_dir = os.environ.get("HUJISCRAPE_CORPUS")
+    if recorded_dir:
+        for path in sorted(Path(recorded_dir).glob("*.html")):
+            page_type = EXAMS_PAGE if path.name.startswith("exams_") else COURSE_PAGE
+            corpus[f"recorded_{path.stem}"] = (page_type, path.read_text(encoding="utf-8"))
+    return corpus
+
+
+CORPUS = load_corpus()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("page", sorted(CORPUS))
+def test_parse(benchmark, engine: str, page: str) -> None:
+    page_type, html = CORPUS[page]
+    profile = ParseProfile()
+    parser = PARSERS[page_type](engine, profile)
+
+    benchmark(parser.convert, html)
+
+    benchmark.extra_info["chars"] = len(html)
+    benchmark.extra_info["stages"] = profile.to_dict()
+
+
+def main() -> None:
+    engine = sys.argv[1] if len(sys.argv) > 1 else BS4_ENGINE
+    for page_type, parser_type in PARSERS.items():
+        profile = ParseProfile()
+        parser = parser_type(engine, profile)
+        for page, (type_of_page, html) in sorted(CORPUS.items()):
+            if type_of_page == page_type:
+                parser.convert(html)
+        print(f"{page_type} pages ({engine}):")
+        print(profile.report())
+        print()
+
+
+if __name__ == "__main__":
+    main()
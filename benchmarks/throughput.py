@@ -0,0 +1,157 @@
+"""
+Measures the throughput of SingleCourseScraper against the local Shnaton stand-in (see tests/standin.py), for every
+combination of the given max_concurrency, tcp_socket_limit and parse worker counts. Each combination runs in a
+fresh process, so that its peak memory is measured on its own.
+
+Reports courses per second, the p50/p99 fetch latency (bucket upper bounds, from Metrics), the mean parse time,
+the CPU time per course and the peak RSS of the scraping process and of its parse workers.
+
+Usage: python -m benchmarks.throughput [--courses 500] [--concurrency 50 100] [--sockets 20] [--workers 1 4]
+                                       [--adaptive] [stand-in options, see standin.py]
+(from the repository root)
+With error injection and without --adaptive, every error pauses all requests for a while, so expect slow runs.
+"""
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.standin import add_config_arguments, config_from_arguments
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.metrics import Metrics
+from hujiscrape.scrapers import SingleCourseScraper
+from tests.standin import ShnatonStandIn
+
+FIRST_COURSE_ID = 10000
+YEAR = 2026
+COLUMNS = (
+    ("concurrency", "{:>11}"),
+    ("sockets", "{:>7}"),
+    ("workers", "{:>7}"),
+    ("courses", "{:>7}"),
+    ("courses/s", "{:>9.1f}"),
+    ("p50 ms", "{:>7.0f}"),
+    ("p99 ms", "{:>7.0f}"),
+    ("parse ms", "{:>8.2f}"),
+    ("cpu ms/course", "{:>13.2f}"),
+    ("rss MB", "{:>7.1f}"),
+    ("workers rss MB", "{:>14.1f}"),
+    ("failed fetches", "{:>14.0f}"),
+)
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _cpu_seconds() -> float:
+    return sum(
+        usage.ru_utime + usage.ru_stime
+        for usage in (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+    )
+
+
+def _total(metrics: Metrics, name: str, field: str | None = None) -> float:
+    """
+    :return: the sum of a counter, or of a field of a histogram, over all of its labels.
+    """
+    snapshot = metrics.snapshot()
+    if field is None:
+        return sum(series["value"] for series in snapshot["counters"].get(name, []))
+    return sum(series["value"][field] for series in snapshot["histograms"].get(name, []))
+
+
+def _reap_parse_workers(timeout: float = 10.0) -> None:
+    # The usage of the parse processes is only counted in RUSAGE_CHILDREN once they are waited for
+    deadline = time.monotonic() + timeout
+    while multiprocessing.active_children() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+async def _scrape(
+        url: str, courses: int, max_concurrency: int, tcp_socket_limit: int, workers: int, adaptive: bool
+) -> dict:
+    fetcher = Fetcher(
+        shnaton_url=url,
+        max_concurrency=max_concurrency,
+        tcp_socket_limit=tcp_socket_limit,
+        adaptive_concurrency=adaptive,
+    )
+    scraper = SingleCourseScraper(fetcher, max_cpu_workers=workers)
+
+    cpu_start = _cpu_seconds()
+    start = time.perf_counter()
+    scraped = await scraper.scrape(range(FIRST_COURSE_ID, FIRST_COURSE_ID + courses), YEAR)
+    elapsed = time.perf_counter() - start
+    _reap_parse_workers()
+    cpu = _cpu_seconds() - cpu_start
+
+    metrics = scraper.metrics
+    fetch_seconds = metrics.histogram("fetch_seconds")
+    parses = _total(metrics, "parse_seconds", "count")
+    return {
+        "concurrency": max_concurrency,
+        "sockets": tcp_socket_limit,
+        "workers": workers,
+        "courses": len(scraped),
+        "courses/s": len(scraped) / elapsed,
+        "p50 ms": fetch_seconds.quantile(0.5) * 1000 if fetch_seconds else 0.0,
+        "p99 ms": fetch_seconds.quantile(0.99) * 1000 if fetch_seconds else 0.0,
+        "parse ms": _total(metrics, "parse_seconds", "sum") / parses * 1000 if parses else 0.0,
+        "cpu ms/course": cpu / len(scraped) * 1000 if scraped else 0.0,
+        "rss MB": _peak_rss_mb(resource.RUSAGE_SELF),
+        "workers rss MB": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "failed fetches": _total(metrics, "fetch_failures_total"),
+    }
+
+
+def run_benchmark(
+        url: str, courses: int, max_concurrency: int, tcp_socket_limit: int, workers: int, adaptive: bool
+) -> dict:
+    """
+    Runs in a fresh process.
+    """
+    return asyncio.run(_scrape(url, courses, max_concurrency, tcp_socket_limit, workers, adaptive))
+
+
+async def run_all(args: argparse.Namespace) -> None:
+    print(" ".join(f"{name:>{len(name)}}" for name, _ in COLUMNS))
+    async with ShnatonStandIn(config_from_arguments(args), args.pages, seed=0) as stand_in:
+        for max_concurrency, tcp_socket_limit, workers in itertools.product(
+                args.concurrency, args.sockets, args.workers
+        ):
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as process:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    process,
+                    run_benchmark,
+                    stand_in.url,
+                    args.courses,
+                    max_concurrency,
+                    tcp_socket_limit,
+                    workers,
+                    args.adaptive,
+                )
+            print(" ".join(column.format(result[name]) for name, column in COLUMNS))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 100])
+    parser.add_argument("--sockets", type=int, nargs="+", default=[20])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument(
+        "--adaptive", action="store_true", help="use adaptive concurrency, which doesn't pause on errors"
+    )
+    add_config_arguments(parser)
+    asyncio.run(run_all(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from hujiscrape.scrapers import (
-    SingleCourseScraper
+    SingleCourseScraper,
+    CourseIdScraper,
 )
 
 from hujiscrape.magics import (
@@ -19,6 +20,34 @@ from hujiscrape.fetchers import (
     Fetcher
 )
 
+from hujiscrape.fetch_tasks import (
+    Priority
+)
+
+from hujiscrape.retries import (
+    RetryBudget,
+    RetryPolicy,
+)
+
+from hujiscrape.metrics import (
+    Metrics
+)
+
+from hujiscrape.caches import (
+    ResponseCache,
+    SqliteResponseCache,
+)
+
+from hujiscrape.shards import (
+    ShardedCourseScraper,
+    ShardWorker,
+    SqliteShardQueue,
+)
+
+from hujiscrape.search_index import (
+    CourseIndex
+)
+
 __all__ = [
     'Toar',
     'ToarYear',
@@ -28,10 +57,26 @@ __all__ = [
     'Course',
     'Exam',
     'Fetcher',
+    'Priority',
+    'RetryPolicy',
+    'RetryBudget',
+    'ResponseCache',
+    'SqliteResponseCache',
+    'Metrics',
+    'CourseIndex',
     'SingleCourseScraper',
+    'CourseIdScraper',
+    'ShardedCourseScraper',
+    'ShardWorker',
+    'SqliteShardQueue',
     'html_to_object',
     'scrapers',
     'fetchers',
+    'retries',
+    'caches',
+    'metrics',
+    'search_index',
+    'shards',
     'fetch_tasks',
     'huji_objects',
     'magics',
@@ -0,0 +1,198 @@
+import json
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional, Type
+
+from hujiscrape.fetch_tasks import FetchTask
+
+DEFAULT_TTL = 60 * 60  # 1 hour
+
+
+@dataclass
+class CachedResponse:
+    body: str
+    stored_at: float
+    # Validators sent back to the server to revalidate a stale response
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class ResponseCache:
+    """
+    Stores fetched pages by FetchTask.key, so that a Fetcher doesn't download pages that haven't changed.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = DEFAULT_TTL,
+        ttls: Dict[Type[FetchTask], float] | None = None,
+    ) -> None:
+        """
+        :param default_ttl: Seconds a response is considered fresh.
+        :param ttls: Per task type TTLs, overriding default_ttl. Subclasses of a given type share its TTL
+                     unless they are given one of their own.
+        """
+        self._default_ttl = default_ttl
+        self._ttls = ttls or {}
+
+    def ttl_for(self, task: FetchTask) -> float:
+        for task_type in type(task).__mro__:
+            if task_type in self._ttls:
+                return self._ttls[task_type]
+        return self._default_ttl
+
+    def is_fresh(self, task: FetchTask, response: CachedResponse) -> bool:
+        return time.time() - response.stored_at < self.ttl_for(task)
+
+    def get(self, task: FetchTask) -> CachedResponse | None:
+        """
+        :return: the stored response for the task, fresh or stale, or None if there is none.
+        """
+        raise NotImplementedError()
+
+    def set(self, task: FetchTask, response: CachedResponse) -> None:
+        raise NotImplementedError()
+
+    def touch(self, task: FetchTask) -> None:
+        """
+        Marks the stored response of the task as fresh again, after the server confirmed it didn't change.
+        """
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SqliteResponseCache(ResponseCache):
+    """
+    A ResponseCache kept in a local SQLite file. Bodies are stored compressed, and the least recently used
+    responses are evicted when the cache grows beyond max_entries or max_bytes.
+    """
+
+    # Eviction scans the whole table, so it only runs every few writes
+    EVICT_EVERY = 64
+
+    def __init__(
+        self,
+        path: str,
+        default_ttl: float = DEFAULT_TTL,
+        ttls: Dict[Type[FetchTask], float] | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        """
+        :param max_bytes: Limit on the total size of the (compressed) stored bodies.
+        """
+        super().__init__(default_ttl, ttls)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._writes_since_eviction = 0
+
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+
+    @staticmethod
+    def _db_key(task: FetchTask) -> str:
+        return json.dumps(task.key, ensure_ascii=False)
+
+    def get(self, task: FetchTask) -> CachedResponse | None:
+        key = self._db_key(task)
+        row = self._db.execute(
+            "SELECT body, stored_at, etag, last_modified FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._db.execute(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+        )
+        body, stored_at, etag, last_modified = row
+        return CachedResponse(
+            body=zlib.decompress(body).decode("utf-8"),
+            stored_at=stored_at,
+            etag=etag,
+            last_modified=last_modified,
+        )
+
+    def set(self, task: FetchTask, response: CachedResponse) -> None:
+        body = zlib.compress(response.body.encode("utf-8"))
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                self._db_key(task),
+                body,
+                len(body),
+                response.etag,
+                response.last_modified,
+                response.stored_at,
+                time.time(),
+            ),
+        )
+
+        self._writes_since_eviction += 1
+        if self._writes_since_eviction >= self.EVICT_EVERY:
+            self.evict()
+
+    def touch(self, task: FetchTask) -> None:
+        now = time.time()
+        self._db.execute(
+            "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+            (now, now, self._db_key(task)),
+        )
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used responses until the cache is within its limits.
+        """
+        self._writes_since_eviction = 0
+        if self._max_entries is not None:
+            self._db.execute(
+                """
+                DELETE FROM responses WHERE key NOT IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?
+                )
+                """,
+                (self._max_entries,),
+            )
+        if self._max_bytes is not None:
+            self._db.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS total_size
+                        FROM responses
+                    ) WHERE total_size > ?
+                )
+                """,
+                (self._max_bytes,),
+            )
+
+    def close(self) -> None:
+        self.evict()
+        self._db.close()
@@ -0,0 +1,269 @@
+"""
+Columnar export of scraped courses, for analytics over the whole catalog.
+
+The courses are normalized into tables, each a dict of column name -> list of values:
+    courses:          one row per course
+    lessons:          one row per lesson, with its day, times and semester as numbers
+    lecturers:        one row per distinct lecturer
+    lesson_lecturers: which lecturers teach each lesson
+    exams:            one row per exam
+Missing numbers are -1 (e.g. the day of a lesson without a day), and missing dates are None.
+
+The tables can be converted to pyarrow tables, written as parquet files or converted to numpy structured arrays,
+which require the optional pyarrow and numpy packages ('pip install hujiscrape[export]').
+"""
+import datetime
+import os
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is an optional dependency
+    pa = None
+
+from hujiscrape.huji_objects import Course, time_to_minutes
+from hujiscrape.magics import Day, Semester
+
+# Column types of every table: 'string', 'bool', 'date', 'float32' or a signed integer type
+SCHEMA: Dict[str, List[Tuple[str, str]]] = {
+    "courses": [
+        ("course_id", "string"),
+        ("hebrew_name", "string"),
+        ("english_name", "string"),
+        ("department", "string"),
+        ("faculty", "string"),
+        ("semester", "string"),
+        ("semester_code", "int8"),
+        ("weekly_hours", "int16"),
+        ("credits", "int16"),
+        ("language", "string"),
+        ("exam_length", "float32"),
+        ("exam_type", "string"),
+        ("hebrew_notes", "string"),
+        ("english_notes", "string"),
+        ("is_running", "bool"),
+        ("syllabus_url", "string"),
+        ("moodle_url", "string"),
+    ],
+    "lessons": [
+        ("lesson_id", "int32"),
+        ("course_id", "string"),
+        ("row", "int16"),
+        ("group", "string"),
+        ("type", "string"),
+        ("semester_code", "int8"),
+        ("day", "int8"),
+        ("start_minute", "int16"),
+        ("end_minute", "int16"),
+        ("location", "string"),
+        ("passing_type", "string"),
+    ],
+    "lecturers": [
+        ("lecturer_id", "int32"),
+        ("name", "string"),
+    ],
+    "lesson_lecturers": [
+        ("lesson_id", "int32"),
+        ("lecturer_id", "int32"),
+    ],
+    "exams": [
+        ("course_id", "string"),
+        ("semester_code", "int8"),
+        ("moed", "string"),
+        ("date", "date"),
+        ("start_minute", "int16"),
+        ("location", "string"),
+        ("notes", "string"),
+    ],
+}
+
+
+def semester_code(text: str) -> int:
+    """
+    :return: the Semester enum value of a hebrew semester text, or -1 if it is unknown.
+    """
+    try:
+        return int(Semester.from_hebrew(text))
+    except ValueError:
+        return -1
+
+
+def day_code(text: str) -> int:
+    """
+    :return: the Day enum value of a hebrew day text, or -1 if it is unknown.
+    """
+    try:
+        return int(Day.from_hebrew(text))
+    except ValueError:
+        return -1
+
+
+def _parse_date(text: str) -> datetime.date | None:
+    try:
+        return datetime.datetime.strptime(text.strip(), "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+
+class CatalogTables:
+    """
+    Courses normalized into columnar tables (see the module's documentation). Courses can be added in batches,
+    or one by one as they are streamed from the scraper.
+    """
+
+    def __init__(self) -> None:
+        self.tables: Dict[str, Dict[str, list]] = {
+            table: {column: [] for column, _ in columns}
+            for table, columns in SCHEMA.items()
+        }
+        self._lecturer_ids: Dict[str, int] = {}
+
+    @classmethod
+    def from_courses(cls, courses: Iterable[Course]) -> 'CatalogTables':
+        tables = cls()
+        tables.extend(courses)
+        return tables
+
+    def __len__(self) -> int:
+        """
+        :return: the number of courses.
+        """
+        return len(self.tables["courses"]["course_id"])
+
+    def extend(self, courses: Iterable[Course]) -> None:
+        for course in courses:
+            self.add(course)
+
+    def add(self, course: Course) -> None:
+        self._append(
+            "courses",
+            course_id=course.course_id,
+            hebrew_name=course.hebrew_name,
+            english_name=course.english_name,
+            department=course.department,
+            faculty=course.faculty,
+            semester=course.semester,
+            semester_code=semester_code(course.semester),
+            weekly_hours=course.weekly_hours,
+            credits=course.credits,
+            language=course.language,
+            exam_length=course.exam_length,
+            exam_type=course.exam_type,
+            hebrew_notes=course.hebrew_notes,
+            english_notes=course.english_notes,
+            is_running=course.is_running,
+            syllabus_url=course.syllabus_url,
+            moodle_url=course.moodle_url,
+        )
+
+        lessons = self.tables["lessons"]
+        for lesson in course.schedule:
+            lesson_id = len(lessons["lesson_id"])
+            self._append(
+                "lessons",
+                lesson_id=lesson_id,
+                course_id=course.course_id,
+                row=lesson.row,
+                group=lesson.group,
+                type=lesson.type,
+                semester_code=semester_code(lesson.semester),
+                day=day_code(lesson.day),
+                start_minute=lesson.start_minute,
+                end_minute=lesson.end_minute,
+                location=lesson.location,
+                passing_type=lesson.passing_type,
+            )
+            for lecturer in lesson.lecturers:
+                self._append(
+                    "lesson_lecturers",
+                    lesson_id=lesson_id,
+                    lecturer_id=self._lecturer_id(lecturer),
+                )
+
+        for exam in course.exams or []:
+            self._append(
+                "exams",
+                course_id=course.course_id,
+                semester_code=semester_code(exam.semester),
+                moed=exam.moed,
+                date=_parse_date(exam.date),
+                start_minute=time_to_minutes(exam.hour.strip()),
+                location=exam.location,
+                notes=exam.notes,
+            )
+
+    def _lecturer_id(self, name: str) -> int:
+        lecturer_id = self._lecturer_ids.get(name)
+        if lecturer_id is None:
+            lecturer_id = self._lecturer_ids[name] = len(self._lecturer_ids)
+            self._append("lecturers", lecturer_id=lecturer_id, name=name)
+        return lecturer_id
+
+    def _append(self, table: str, **row) -> None:
+        columns = self.tables[table]
+        for column, value in row.items():
+            columns[column].append(value)
+
+    def to_arrow(self) -> Dict[str, 'pa.Table']:
+        if pa is None:
+            raise ImportError("Arrow export requires pyarrow, install it with 'pip install hujiscrape[export]'")
+
+        arrow_types = {
+            "string": pa.string(),
+            "bool": pa.bool_(),
+            "date": pa.date32(),
+            "float32": pa.float32(),
+            "int8": pa.int8(),
+            "int16": pa.int16(),
+            "int32": pa.int32(),
+        }
+        return {
+            table: pa.table(
+                {column: self.tables[table][column] for column, _ in columns},
+                schema=pa.schema(
+                    [(column, arrow_types[column_type]) for column, column_type in columns]
+                ),
+            )
+            for table, columns in SCHEMA.items()
+        }
+
+    def write_parquet(self, directory: str) -> None:
+        """
+        Writes every table to <directory>/<table>.parquet.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for table, arrow_table in self.to_arrow().items():
+            pq.write_table(arrow_table, os.path.join(directory, f"{table}.parquet"))
+
+    def to_numpy(self) -> Dict[str, 'np.ndarray']:
+        """
+        :return: a structured array for every table. Strings are kept as python objects.
+        """
+        if np is None:
+            raise ImportError("NumPy export requires numpy, install it with 'pip install hujiscrape[export]'")
+
+        numpy_types = {
+            "string": object,
+            "bool": np.bool_,
+            "date": "datetime64[D]",
+            "float32": np.float32,
+            "int8": np.int8,
+            "int16": np.int16,
+            "int32": np.int32,
+        }
+        arrays = {}
+        for table, columns in SCHEMA.items():
+            array = np.empty(
+                len(self.tables[table][columns[0][0]]),
+                dtype=[(column, numpy_types[column_type]) for column, column_type in columns],
+            )
+            for column, _ in columns:
+                array[column] = self.tables[table][column]
+            arrays[table] = array
+        return arrays
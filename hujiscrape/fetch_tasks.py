@@ -1,5 +1,17 @@
+import enum
 import random
 
+from hujiscrape.magics import Semester, Toar, ToarYear
+
+
+class Priority(enum.IntEnum):
+    """
+    Tasks waiting for the fetcher's concurrency limit are sent most urgent (lowest) first.
+    """
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
 
 class FetchTask:
     def __init__(
@@ -9,24 +21,66 @@ class FetchTask:
         data: dict = None,
         query_params: dict = None,
         headers: dict = None,
+        priority: Priority = Priority.NORMAL,
+        deadline: float | None = None,
     ) -> None:
+        """
+        :param priority: Waiting tasks of a more urgent priority are sent first.
+        :param deadline: time.monotonic() by which the task should be sent. Among waiting tasks of the same
+                         priority, the earliest deadline is sent first, and tasks without one are sent last.
+        """
         self.url = url
         self.method = method
         self.data = data or {}
         self.query_params = query_params or {}
         self.headers = headers or {}
+        self.priority = priority
+        self.deadline = deadline
+
+    @property
+    def urgency(self) -> tuple:
+        """
+        Orders tasks by how soon they should be sent, most urgent first.
+        """
+        return self.priority, self.deadline if self.deadline is not None else float("inf")
+
+    @property
+    def key(self) -> tuple:
+        """
+        Identifies the request sent by this task. Tasks with equal keys receive the same response, so the key
+        ignores the headers (which only hold a random user agent).
+        """
+        return (
+            self.method.upper(),
+            self.url,
+            _freeze(self.data),
+            _freeze(self.query_params),
+        )
+
+
+def _freeze(params: dict) -> tuple:
+    # aiohttp sends every value as a string, so 1 and '1' are the same parameter
+    return tuple(sorted((str(k), str(v)) for k, v in params.items()))
 
 
 class ShnatonFetchTask(FetchTask):
     SHNATON_URL = "https://shnaton.huji.ac.il/index.php"
 
-    def __init__(self, data: dict = None, query_params: dict = None) -> None:
+    def __init__(
+        self,
+        data: dict = None,
+        query_params: dict = None,
+        priority: Priority = Priority.NORMAL,
+        deadline: float | None = None,
+    ) -> None:
         super().__init__(
             url=self.SHNATON_URL,
             method="POST",
             data=data,
             query_params=query_params,
             headers=self._get_default_headers(),
+            priority=priority,
+            deadline=deadline,
         )
 
     def _get_default_headers(self) -> dict:
@@ -40,21 +94,35 @@ class ShnatonFetchTask(FetchTask):
 
 
 class ExamFetchTask(ShnatonFetchTask):
-    def __init__(self, course_id: int | str, year: int):
+    def __init__(
+        self,
+        course_id: int | str,
+        year: int,
+        priority: Priority = Priority.NORMAL,
+        deadline: float | None = None,
+    ):
         super().__init__(
             data={
                 "peula": "CourseD",
                 "year": year,
                 "detail": "examDates",
                 "course": str(course_id),
-            }
+            },
+            priority=priority,
+            deadline=deadline,
         )
         self.course_id = str(course_id)
         self.year = year
 
 
 class CourseFetchTask(ShnatonFetchTask):
-    def __init__(self, course_id: int | str, year: int):
+    def __init__(
+        self,
+        course_id: int | str,
+        year: int,
+        priority: Priority = Priority.NORMAL,
+        deadline: float | None = None,
+    ):
         super().__init__(
             data={
                 "peula": "Simple",
@@ -62,7 +130,44 @@ class CourseFetchTask(ShnatonFetchTask):
                 "shana": 0,
                 "year": year,
                 "course": course_id,
-            }
+            },
+            priority=priority,
+            deadline=deadline,
         )
         self.course_id = str(course_id)
         self.year = year
+
+
+class SearchFetchTask(ShnatonFetchTask):
+    """
+    A page of the Shnaton search results for the given filters.
+    """
+
+    def __init__(
+        self,
+        year: int,
+        faculty: int | str,
+        toar: Toar = Toar.Any,
+        toar_year: ToarYear = ToarYear.Any,
+        semester: Semester | None = None,
+        page: int = 1,
+        priority: Priority = Priority.NORMAL,
+        deadline: float | None = None,
+    ):
+        super().__init__(
+            data={
+                "peula": "Simple",
+                "maslul": 0,
+                "shana": int(toar_year),
+                "year": year,
+                "faculty": faculty,
+                "toar": int(toar),
+                "semester": int(semester) if semester is not None else 0,
+                "page": page,
+            },
+            priority=priority,
+            deadline=deadline,
+        )
+        self.year = year
+        self.faculty = faculty
+        self.page = page
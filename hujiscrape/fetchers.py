@@ -1,14 +1,63 @@
 import asyncio
-import random
+import codecs
+import re
 import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
 
 import aiohttp
 from tqdm import tqdm
 
-from hujiscrape.fetch_tasks import FetchTask
+from hujiscrape.caches import CachedResponse, ResponseCache
+from hujiscrape.fetch_tasks import FetchTask, Priority, ShnatonFetchTask
+from hujiscrape.limiters import AIMDLimiter, ConcurrencyLimiter, HostRateLimiter
+from hujiscrape.metrics import SIZE_BUCKETS, Metrics
+from hujiscrape.retries import RetryPolicy
 
 DEFAULT_MAX_CONCURRENCY = 100
 DEFAULT_TCP_SOCKET_LIMIT = 20
+STREAM_CHUNK_SIZE = 16 * 1024
+# Pages declare their charset in a <meta> tag within their first bytes (the HTML spec prescans 1024)
+CHARSET_PRESCAN_SIZE = 1024
+# Errors of the connections of a session, that a new session may not run into
+SESSION_ERRORS = (aiohttp.ClientConnectionError, OSError)
+_META_CHARSET = re.compile(rb"""<meta[^>]*?charset\s*=\s*["']?\s*([-\w.:]+)""", re.IGNORECASE)
+
+# Receives the newly decoded text and the number of bytes read so far, returns whether to stop reading.
+# If it has a reset() method, it is called before reading each response (e.g. of every retry of a request).
+StopReading = Callable[[str, int], bool]
+
+
+def _page_encoding(header_charset: str | None, head: bytes) -> str:
+    """
+    :param head: The first CHARSET_PRESCAN_SIZE bytes of the body (or all of it, if shorter).
+    :return: the encoding of the charset in the Content-Type header, else of the page's <meta> charset, else
+             utf-8.
+    """
+    meta = _META_CHARSET.search(head[:CHARSET_PRESCAN_SIZE])
+    for charset in (header_charset, meta.group(1).decode("ascii") if meta else None):
+        if charset:
+            try:
+                return codecs.lookup(charset).name
+            except LookupError:
+                continue
+    return "utf-8"
+
+
+@dataclass
+class _InFlightFetch:
+    """
+    A request shared by concurrent fetches of equal tasks.
+    """
+    urgency: tuple
+    future: asyncio.Future | None = None
+    waiters: int = 0
+    # Whether the request got past the concurrency limit
+    sent: bool = False
+
+    def can_serve(self, task: FetchTask) -> bool:
+        # Joining a less urgent request that still waits to be sent would make the task wait behind it
+        return self.sent or self.urgency <= task.urgency
 
 
 class Fetcher:
@@ -19,6 +68,13 @@ class Fetcher:
         max_concurrency: int | None = DEFAULT_MAX_CONCURRENCY,
         tcp_socket_limit: int = DEFAULT_TCP_SOCKET_LIMIT,
         force_close_tcp: bool = False,
+        cache: ResponseCache | None = None,
+        adaptive_concurrency: bool = False,
+        requests_per_second: float | None = None,
+        burst: int = 1,
+        metrics: Metrics | None = None,
+        retry_policy: RetryPolicy | None = None,
+        shnaton_url: str | None = None,
         debug: bool = False,
     ):
         """
@@ -26,10 +82,24 @@ class Fetcher:
         :param force_close_tcp: There is a bug in aiohttp that causes the following error if force_close isn't true:
                                 error type: <class 'aiohttp.client_exceptions.ClientOSError'>, error msg: [Errno None]
                                 Can not write request body for URL
+        :param cache: Responses are served from the cache while fresh, and revalidated with the server (using
+                      ETag/Last-Modified) once stale.
+        :param adaptive_concurrency: Adapt the number of concurrent requests (up to max_concurrency) to the
+                                     server's latency and errors, instead of pausing all requests on errors.
+        :param requests_per_second: Limit on the rate of requests (including retries) sent to each host.
+                                    If None, requests are sent as soon as concurrency allows.
+        :param burst: Requests that may be sent at once to an idle host when requests_per_second is set.
+        :param metrics: Where request metrics are recorded. A new Metrics is created if not given.
+        :param retry_policy: Which failed requests are retried and when. Overrides retries.
+        :param shnaton_url: Where the requests of ShnatonFetchTasks are sent instead of ShnatonFetchTask.SHNATON_URL,
+                            e.g. a local stand-in of the Shnaton.
         :param debug: Enable debug logging
         """
         self._debug = debug
-        self._retries = retries
+        self._shnaton_url = shnaton_url
+        self._retry_policy = retry_policy or RetryPolicy(max_attempts=retries)
+        self._metrics = metrics or Metrics()
+        self._cache = cache
 
         # Soft timeout for aiohttp internals
         self._timeout = timeout or aiohttp.ClientTimeout(
@@ -39,7 +109,16 @@ class Fetcher:
         self._hard_timeout = 60.0
 
         self._max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
-        self._semaphore = asyncio.BoundedSemaphore(self._max_concurrency)
+        self._adaptive_concurrency = adaptive_concurrency
+        self._limiter = (
+            AIMDLimiter(initial_limit=min(10, self._max_concurrency), max_limit=self._max_concurrency)
+            if adaptive_concurrency
+            else ConcurrencyLimiter(self._max_concurrency)
+        )
+        self._burst = burst
+        self._rate_limiter = (
+            HostRateLimiter(requests_per_second, burst) if requests_per_second else None
+        )
 
         # Pass the socket limit correctly
         self._connector_kwargs = {
@@ -60,14 +139,39 @@ class Fetcher:
         self._recycle_threshold = 200
         self._last_error_time = 0
 
-        self._slot_dashboard = {}
+        # FetchTask.key (and should_stop, for fetch_until) -> the request of the tasks being fetched
+        self._in_flight: Dict[tuple, _InFlightFetch] = {}
+        # Number of `async with fetcher` blocks (e.g. of scrapers sharing the fetcher) that are running
+        self._users = 0
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
+
+    @property
+    def requests_per_second(self) -> float | None:
+        """
+        The limit on the rate of requests sent to each host, or None if there is none. May be changed while
+        fetching, affecting the requests that are yet to be sent.
+        """
+        return self._rate_limiter.rate if self._rate_limiter is not None else None
+
+    @requests_per_second.setter
+    def requests_per_second(self, requests_per_second: float | None) -> None:
+        if not requests_per_second:
+            self._rate_limiter = None
+        elif self._rate_limiter is None:
+            self._rate_limiter = HostRateLimiter(requests_per_second, self._burst)
+        else:
+            self._rate_limiter.rate = requests_per_second
 
     def _log_debug(self, msg):
         if self._debug:
             tqdm.write(f"[{time.strftime('%H:%M:%S')}] {msg}")
 
-    def _update_dash(self, task_id, status):
-        self._slot_dashboard[task_id] = {"status": status, "time": time.time()}
+    def _update_in_flight(self) -> None:
+        self._metrics.set_gauge("in_flight_requests", self._limiter.in_flight)
+        self._metrics.set_gauge("concurrency_limit", self._limiter.limit)
 
     def _create_new_session(self):
         return aiohttp.ClientSession(
@@ -75,9 +179,20 @@ class Fetcher:
         )
 
     async def __aenter__(self):
+        """
+        The fetcher may be entered by several users at once (such as scrapers sharing it). The session is closed
+        when the last of them exits, and a fetcher used again opens a new one.
+        """
+        self._users += 1
+        if self._session.closed:
+            self._session = self._create_new_session()
+            self._active_sessions.add(self._session)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._users = max(0, self._users - 1)
+        if self._users:
+            return
         if not self._session.closed:
             await self._session.close()
         for s in list(self._active_sessions):
@@ -99,13 +214,13 @@ class Fetcher:
         except Exception:
             pass
 
-    async def _background_restart_logic(self, faulty_session, delay):
+    async def _background_restart_logic(self, faulty_session, delay, reason):
         async with self._refresh_lock:
             if self._session is not faulty_session:
                 return
 
             now = time.time()
-            if delay > 0 and (now - self._last_error_time < 5):
+            if reason == "error" and (now - self._last_error_time < 5):
                 return
             self._last_error_time = now
 
@@ -131,26 +246,131 @@ class Fetcher:
                 self._active_sessions.add(self._session)
                 self._active_sessions_count += 1
                 self._request_count = 0
+                self._metrics.increment("session_recycles_total", reason=reason)
             finally:
                 self._network_status.set()
 
-    def _trigger_restart(self, current_session, delay=0):
-        asyncio.create_task(self._background_restart_logic(current_session, delay))
+    def _trigger_restart(self, current_session, delay=0, reason="threshold"):
+        """
+        Replaces the session in the background, after pausing all requests for delay seconds.
+        Recycles on errors (reason "error") happen at most once in 5 seconds.
+        """
+        asyncio.create_task(self._background_restart_logic(current_session, delay, reason))
 
     # --- MAIN INTERFACE: Matches original (Returns str or Raises) ---
     async def fetch(self, task: FetchTask) -> str:
+        """
+        Concurrent fetches of equal tasks (by FetchTask.key) share a single request, and its result or error,
+        unless the request still waits to be sent and is less urgent than the task (see FetchTask.urgency). The
+        task then sends its own request, which later equal tasks join instead.
+        """
+        text, _ = await self._shared_fetch(task.key, task)
+        return text
+
+    async def fetch_until(self, task: FetchTask, should_stop: StopReading) -> Tuple[str, bool]:
+        """
+        Reads the response body in chunks, and stops downloading it as soon as should_stop returns True.
+        Like fetch, concurrent fetches share a request, if both their tasks and their should_stop are equal. So a
+        stopping rule that can be shared should compare equal to the other instances of the same rule.
+        :param should_stop: Called after every chunk with the newly decoded text and the number of bytes read.
+        :return: (the text read, whether it is the complete body)
+        """
+        return await self._shared_fetch((task.key, should_stop), task, should_stop)
+
+    async def _shared_fetch(
+        self, key: tuple, task: FetchTask, should_stop: StopReading | None = None
+    ) -> Tuple[str, bool]:
+        in_flight = self._in_flight.get(key)
+        if in_flight is None or not in_flight.can_serve(task):
+            in_flight = self._in_flight[key] = _InFlightFetch(task.urgency)
+            in_flight.future = asyncio.ensure_future(self._fetch(task, should_stop, in_flight))
+            in_flight.future.add_done_callback(lambda _: self._forget_in_flight(key, in_flight))
+        else:
+            self._metrics.increment("coalesced_fetches_total")
+
+        in_flight.waiters += 1
+        try:
+            # A cancelled fetch doesn't cancel the request for the others
+            return await asyncio.shield(in_flight.future)
+        finally:
+            in_flight.waiters -= 1
+            if not in_flight.waiters and not in_flight.future.done():
+                # No one is waiting for the response anymore
+                self._forget_in_flight(key, in_flight)
+                in_flight.future.cancel()
+
+    def _forget_in_flight(self, key: tuple, in_flight: _InFlightFetch) -> None:
+        if self._in_flight.get(key) is in_flight:
+            del self._in_flight[key]
+
+    async def _fetch(
+        self,
+        task: FetchTask,
+        should_stop: StopReading | None = None,
+        in_flight: _InFlightFetch | None = None,
+    ) -> Tuple[str, bool]:
+        cached = self._cache.get(task) if self._cache is not None else None
+        if cached is not None and self._cache.is_fresh(task, cached):
+            self._metrics.increment("cache_hits_total")
+            return cached.body, True
+
         task_id = id(asyncio.current_task())
-        async with self._semaphore:
-            self._update_dash(task_id, "Starting...")
-            try:
-                # We return the string directly, just like original ultimately did
-                return await self._fetch_with_retries(task, task_id)
-            finally:
-                self._slot_dashboard.pop(task_id, None)
+        queued_at = time.monotonic()
+        await self._limiter.acquire(task.urgency)
+        if in_flight is not None:
+            in_flight.sent = True
+        self._metrics.observe(
+            "queue_wait_seconds",
+            time.monotonic() - queued_at,
+            priority=Priority(task.priority).name.lower(),
+        )
+        self._update_in_flight()
+        try:
+            status, headers, text, complete = await self._fetch_with_retries(
+                task, task_id, self._revalidation_headers(cached), should_stop
+            )
+        finally:
+            self._limiter.release()
+            self._update_in_flight()
+        # Including the queue wait and the retries
+        self._metrics.observe("fetch_seconds", time.monotonic() - queued_at)
+
+        if self._cache is None or not complete:
+            return text, complete
+        if status == 304:
+            self._metrics.increment("cache_revalidations_total")
+            self._cache.touch(task)
+            return cached.body, True
+
+        self._cache.set(
+            task,
+            CachedResponse(
+                body=text,
+                stored_at=time.time(),
+                etag=headers.get("ETag"),
+                last_modified=headers.get("Last-Modified"),
+            ),
+        )
+        return text, True
+
+    @staticmethod
+    def _revalidation_headers(cached: CachedResponse | None) -> dict:
+        headers = {}
+        if cached is None:
+            return headers
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        return headers
 
     async def _single_request_attempt(
-        self, method, url, data, params, headers, session
+        self, method, url, data, params, headers, session, should_stop=None
     ):
+        """
+        :return: (status, response headers, response text, whether the text is complete)
+        """
+        request_start = time.monotonic()
         response = await session.request(
             method=method,
             url=url,
@@ -161,73 +381,162 @@ class Fetcher:
             allow_redirects=False,
             timeout=self._timeout,
         )
+        self._metrics.observe("ttfb_seconds", time.monotonic() - request_start)
         response.raise_for_status()
-        text = await response.text()
-        return text
 
-    async def _fetch_with_retries(self, task: FetchTask, task_id: int) -> str:
+        download_start = time.monotonic()
+        if should_stop is None:
+            body = await response.read()
+            text = body.decode(_page_encoding(response.charset, body[:CHARSET_PRESCAN_SIZE]))
+            complete, bytes_read = True, len(body)
+        else:
+            text, complete, bytes_read = await self._read_until(response, should_stop)
+        self._metrics.observe("download_seconds", time.monotonic() - download_start)
+        self._metrics.observe("response_bytes", bytes_read, buckets=SIZE_BUCKETS)
+
+        return response.status, response.headers, text, complete
+
+    async def _read_until(
+        self, response: aiohttp.ClientResponse, should_stop: StopReading
+    ) -> Tuple[str, bool, int]:
+        """
+        :return: (the text read, whether it is the complete body, bytes read)
+        """
+        reset = getattr(should_stop, "reset", None)
+        if reset is not None:
+            reset()
+        texts = []
+        bytes_read = 0
+        decoder = None
+        # The start of the body, until it is long enough to detect the encoding from
+        head = b""
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            if decoder is None:
+                head += chunk
+                if len(head) < CHARSET_PRESCAN_SIZE:
+                    continue
+                decoder = codecs.getincrementaldecoder(_page_encoding(response.charset, head))()
+                chunk, head = head, b""
+            text = decoder.decode(chunk)
+            texts.append(text)
+            if should_stop(text, bytes_read):
+                # Drop the connection instead of downloading the rest of the body
+                response.close()
+                self._metrics.increment("truncated_responses_total")
+                return "".join(texts), False, bytes_read
+
+        if decoder is None:
+            # A body shorter than the prescan
+            decoder = codecs.getincrementaldecoder(_page_encoding(response.charset, head))()
+            texts.append(decoder.decode(head))
+        texts.append(decoder.decode(b"", final=True))
+        return "".join(texts), True, bytes_read
+
+    async def _fetch_with_retries(
+        self,
+        task: FetchTask,
+        task_id: int,
+        extra_headers: dict,
+        should_stop: StopReading | None = None,
+    ) -> tuple:
         self._request_count += 1
         if self._request_count > self._recycle_threshold:
             self._trigger_restart(self._session, delay=0)
-        course_id = task.data["course"]
-        for attempt in range(1, self._retries + 1):
+        # Identifies the task in debug logs
+        course_id = task.data.get("course", task.url)
+        url = self._shnaton_url if self._shnaton_url and isinstance(task, ShnatonFetchTask) else task.url
+        policy = self._retry_policy
+        policy.record_request()
+        delay = 0.0
+        for attempt in range(1, policy.max_attempts + 1):
             await self._network_status.wait()
 
-            self._update_dash(task_id, "Jitter Sleep")
-            await asyncio.sleep(random.uniform(0.1, 1.0))
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire(url)
 
             current_session = self._session
 
+            self._metrics.increment("requests_total")
+            if attempt > 1:
+                self._metrics.increment("retries_total")
             try:
-                self._update_dash(task_id, f"Attempt {attempt}: Working...")
-
+                attempt_start = time.monotonic()
                 # Hard Timeout wrapper: Essential for preventing hangs
-                text = await asyncio.wait_for(
+                result = await asyncio.wait_for(
                     self._single_request_attempt(
                         task.method,
-                        task.url,
+                        url,
                         task.data,
                         task.query_params,
-                        task.headers,
+                        {**task.headers, **extra_headers},
                         current_session,
+                        should_stop,
                     ),
                     timeout=self._hard_timeout,
                 )
-                return text
+                self._limiter.on_success(time.monotonic() - attempt_start)
+                return result
 
             except (
                 aiohttp.ClientError,
                 asyncio.TimeoutError,
                 OSError,
-                asyncio.CancelledError,
                 RuntimeError,
             ) as e:
-                is_cancelled = isinstance(e, asyncio.CancelledError)
+                self._metrics.increment("request_errors_total", error=type(e).__name__)
+                # The request never reached the server, so it is retried at once and not counted as a failure
                 is_session_closed = isinstance(
                     e, RuntimeError
                 ) and "Session is closed" in str(e)
 
-                if (is_cancelled or is_session_closed) and self._debug:
+                if is_session_closed and self._debug:
                     self._log_debug(
                         f"RACE: Task {task_id} caught in session rotation - {course_id}"
                     )
 
-                if attempt == 1 and not (is_cancelled or is_session_closed):
-                    if self._debug:
-                        self._log_debug(f"TRIGGER: {type(e).__name__} on {course_id}")
-                    self._trigger_restart(current_session, delay=30)
+                if not is_session_closed and not policy.is_retryable(e):
+                    self._log_debug(f"FAILED: {course_id} with non retryable {type(e).__name__}. Raising error.")
+                    self._metrics.increment("fetch_failures_total", error=type(e).__name__)
+                    raise e
 
-                if attempt == self._retries:
+                if not is_session_closed:
+                    self._limiter.on_failure()
+
+                if attempt == 1 and not is_session_closed:
+                    if not self._adaptive_concurrency:
+                        if self._debug:
+                            self._log_debug(f"TRIGGER: {type(e).__name__} on {course_id}")
+                        self._trigger_restart(current_session, delay=30, reason="error")
+                    elif isinstance(e, SESSION_ERRORS):
+                        # The adaptive limiter backs off by itself, without pausing all requests, but a broken
+                        # session is still replaced
+                        if self._debug:
+                            self._log_debug(f"RECYCLE: {type(e).__name__} on {course_id}")
+                        self._trigger_restart(current_session, delay=0, reason="error")
+
+                if attempt == policy.max_attempts:
                     self._log_debug(
-                        f"FAILED: {course_id} after {self._retries} attempts. Raising error."
+                        f"FAILED: {course_id} after {policy.max_attempts} attempts. Raising error."
                     )
+                    self._metrics.increment("fetch_failures_total", error=type(e).__name__)
                     raise e
 
-                self._update_dash(task_id, f"Error {type(e).__name__}: Sleep")
+                if is_session_closed:
+                    continue
 
-                # Exponential backoff (original behavior) + Jitter
-                backoff = 2**attempt + random.uniform(0, 1)
-                await asyncio.sleep(backoff)
+                delay = policy.delay(e, delay)
+                if delay is None:
+                    reason = "retry_after"
+                elif not policy.try_retry():
+                    reason = "budget"
+                else:
+                    await asyncio.sleep(delay)
+                    continue
+                self._log_debug(f"FAILED: {course_id}, retry denied by the {reason}. Raising error.")
+                self._metrics.increment("retries_denied_total", reason=reason)
+                self._metrics.increment("fetch_failures_total", error=type(e).__name__)
+                raise e
 
         raise Exception(
             f"Failed to fetch {course_id} for unknown reasons"
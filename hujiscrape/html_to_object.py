@@ -1,22 +1,98 @@
 import re
-from typing import Union, List
+from typing import Union, List, Optional
 
 from bs4 import BeautifulSoup, Tag, NavigableString
 
+try:
+    import lxml.html
+except ImportError:  # lxml is an optional dependency, only needed for the lxml engine
+    lxml = None
+
 from hujiscrape.huji_objects import HujiObject, Lesson, Course, Exam
+from hujiscrape.parse_profiles import (
+    EXAMS,
+    HEADER,
+    LESSONS,
+    NO_TIMER,
+    ROWS,
+    SORT,
+    TREE_BUILD,
+    ParseProfile,
+    StageTimer,
+)
 
 Bs4Obj = Union[BeautifulSoup, Tag, NavigableString]
 
+BS4_ENGINE = "bs4"
+LXML_ENGINE = "lxml"
+PARSER_ENGINES = (BS4_ENGINE, LXML_ENGINE)
+
+# The divs of a schedule row that hold the lesson fields
+_ROW_FIELD_CLASSES = (
+    "lecturer-name",
+    "groups",
+    "semester",
+    "days",
+    "hour",
+    "lesson",
+    "places",
+    "note",
+)
+
 
 class HtmlToObject:
     """
     Object that receives specific html and converts it to a huji object
     """
 
+    def __init__(self, engine: str = BS4_ENGINE, profile: ParseProfile | None = None) -> None:
+        """
+        :param engine: The html parsing engine. 'bs4' (BeautifulSoup), or 'lxml' which is several times faster
+                       and produces identical objects, but requires the lxml package.
+        :param profile: If given, the time of every conversion stage is added to it.
+        """
+        if engine not in PARSER_ENGINES:
+            raise ValueError(
+                f"'{engine}' is not a valid engine, expected one of {PARSER_ENGINES}"
+            )
+        if engine == LXML_ENGINE and lxml is None:
+            raise ImportError(
+                "The lxml engine requires lxml, install it with 'pip install hujiscrape[lxml]'"
+            )
+        self.engine = engine
+        self.profile = profile
+
+    def _timer(self) -> StageTimer:
+        return StageTimer(self.profile) if self.profile is not None else NO_TIMER
+
     def convert(self, html_str: str) -> HujiObject:
         raise NotImplementedError()
 
 
+def _has_class(element, class_name: str) -> bool:
+    """
+    Matches lxml elements the same way BeautifulSoup's class_ argument does.
+    """
+    classes = element.get("class")
+    if classes is None:
+        return False
+    return class_name in classes.split() or classes == class_name
+
+
+def _lxml_find(element, tag: str, class_name: str):
+    """
+    lxml equivalent of element.find(tag, class_=class_name) in BeautifulSoup.
+    """
+    for descendant in element.iterdescendants(tag):
+        if _has_class(descendant, class_name):
+            return descendant
+    return None
+
+
+def _lxml_stripped_strings(element) -> List[str]:
+    return [text.strip() for text in element.itertext() if text.strip()]
+
+
 class HtmlToCourse(HtmlToObject):
     def _sort_lessons(self, lessons: List[Lesson]) -> List[Lesson]:
         """
@@ -38,73 +114,24 @@ class HtmlToCourse(HtmlToObject):
         )
 
     def convert(self, html_str: str) -> Course:
-        html = BeautifulSoup(html_str, "html.parser")
-
-        # Extract faculty and department
-        faculty_data = html.find("div", class_="data-school").text.strip()
-        faculty_parts = faculty_data.split(":")
-        faculty = faculty_parts[0].strip()
-        department = faculty_parts[1].strip() if len(faculty_parts) > 1 else ""
+        if self.engine == LXML_ENGINE:
+            return self._convert_lxml(html_str)
+        return self._convert_bs4(html_str)
 
-        # Extract course details from the title section
-        course_id = html.find("div", class_="title").text.strip().split()[-1]
-        hebrew_course_name = html.find("div", class_="subtitle").text.strip()
-        english_course_name = html.find("div", class_="subtitle-eng").text.strip()
+    def _convert_bs4(self, html_str: str) -> Course:
+        timer = self._timer()
+        html = BeautifulSoup(html_str, "html.parser")
+        timer.lap(TREE_BUILD)
 
-        # Extract additional data
         additional_data = html.find("div", class_="additional-data")
-        semester = additional_data.find(
-            "div", class_="additional-data-semester"
-        ).text.strip()
-        # semester = Semester.from_hebrew(semester_text)
-
         weekly_hours_div = additional_data.find("div", class_=".additional-data-points")
-        weekly_hours = (
-            int(re.search(r"\d+", weekly_hours_div.text.strip()).group())
-            if weekly_hours_div
-            else 0
-        )
-
-        credits_text = additional_data.find(
-            "div", class_="additional-data-student-points"
-        ).text.strip()
-        credit_points = int(re.search(r"\d+", credits_text).group())
-
-        # Get test information
         test_div = additional_data.find("div", class_="additional-data-test")
-        test_info = test_div.text.strip() if test_div else ""
-        exam_type = test_info
-        exam_length = 0
-        if re.search(r"(\d+\.\d+)", test_info):
-            exam_length = float(re.search(r"(\d+\.\d+)", test_info).group())
-
-        # Get language
         language_div = additional_data.find("div", class_="additional-data-language")
-        language = language_div.text.strip() if language_div else ""
-
-        is_running = True  # Assuming course is running if it's in the system
-
-        # Extract notes
         notes_div = html.find("div", id="comments-course-NumCourse")
-        hebrew_notes = notes_div.text.strip() if notes_div else ""
-        english_notes = ""  # Not found in the new format
-
-        # Extract syllabus and moodle links
-        syllabus_url = ""
-        moodle_url = ""
 
         cyllabus_tag = html.select_one(".cyllabus-cource")
-        if cyllabus_tag and "href" in cyllabus_tag.attrs:
-            href = cyllabus_tag["href"]
-            # Extract the URL from JavaScript function
-            if "javascript:OpenUrl(" in href:
-                url_parts = href.split("'")
-                if len(url_parts) >= 2:
-                    syllabus_url = f"https://shnaton.huji.ac.il{url_parts[1]}"
-
         moodle_tag = html.select_one(".moodle-cource")
-        if moodle_tag and "href" in moodle_tag.attrs:
-            moodle_url = moodle_tag["href"]
+        timer.lap(HEADER)
 
         # Extract schedule information
         schedule = []
@@ -178,49 +205,256 @@ class HtmlToCourse(HtmlToObject):
                 else []
             )
 
-            # Create lesson objects
-            max_items = max(len(semesters), len(days), len(hours), len(places))
-
-            for i in range(max_items):
-                group = groups[0] if groups else ""
-                lesson_type = lesson_types[0] if lesson_types else ""
-                semester_val = semesters[i] if i < len(semesters) else ""
-                day_val = days[i] if i < len(days) else ""
-                time_val = hours[i] if i < len(hours) else ""
-                location_val = places[i] if i < len(places) else ""
-                passing_type_val = notes[i] if i < len(notes) else ""
-
-                lesson = Lesson(
-                    location=location_val,
-                    passing_type=passing_type_val,
-                    time=time_val,
-                    day=day_val,
-                    semester=semester_val,
-                    group=group,
-                    type=lesson_type,
-                    lecturers=lecturers,
-                    row=row_num,
+            timer.lap(ROWS)
+            schedule.extend(
+                self._create_lessons(
+                    row_num, lecturers, groups, semesters, days, hours, lesson_types, places, notes
+                )
+            )
+            timer.lap(LESSONS)
+
+        return self._create_course(
+            timer=timer,
+            faculty_data=html.find("div", class_="data-school").text,
+            title=html.find("div", class_="title").text,
+            hebrew_course_name=html.find("div", class_="subtitle").text,
+            english_course_name=html.find("div", class_="subtitle-eng").text,
+            semester=additional_data.find("div", class_="additional-data-semester").text,
+            weekly_hours_text=weekly_hours_div.text if weekly_hours_div else None,
+            credits_text=additional_data.find(
+                "div", class_="additional-data-student-points"
+            ).text,
+            test_info=test_div.text if test_div else "",
+            language=language_div.text if language_div else "",
+            hebrew_notes=notes_div.text if notes_div else "",
+            syllabus_href=cyllabus_tag.attrs.get("href") if cyllabus_tag else None,
+            moodle_href=moodle_tag.attrs.get("href") if moodle_tag else None,
+            schedule=schedule,
+        )
+
+    def _convert_lxml(self, html_str: str) -> Course:
+        timer = self._timer()
+        html = lxml.html.document_fromstring(html_str)
+        timer.lap(TREE_BUILD)
+
+        # A single pass over the document collects everything outside the additional data div
+        header_divs = {}
+        notes_div = None
+        rows = []
+        for div in html.iter("div"):
+            if _has_class(div, "row"):
+                rows.append(div)
+            if notes_div is None and div.get("id") == "comments-course-NumCourse":
+                notes_div = div
+            for class_name in ("data-school", "title", "subtitle", "subtitle-eng", "additional-data"):
+                if class_name not in header_divs and _has_class(div, class_name):
+                    header_divs[class_name] = div
+
+        additional_data = header_divs["additional-data"]
+        weekly_hours_div = _lxml_find(additional_data, "div", ".additional-data-points")
+        test_div = _lxml_find(additional_data, "div", "additional-data-test")
+        language_div = _lxml_find(additional_data, "div", "additional-data-language")
+
+        cyllabus_tag = next(
+            (tag for tag in html.iter() if _has_class(tag, "cyllabus-cource")), None
+        )
+        moodle_tag = next(
+            (tag for tag in html.iter() if _has_class(tag, "moodle-cource")), None
+        )
+        timer.lap(HEADER)
+
+        schedule = []
+        # Skip the title row
+        for row_num, row in enumerate(rows[1:], 0):
+            # A single pass over the row finds the first div of every field
+            field_divs = {}
+            for div in row.iterdescendants("div"):
+                for class_name in _ROW_FIELD_CLASSES:
+                    if class_name not in field_divs and _has_class(div, class_name):
+                        field_divs[class_name] = div
+
+            lecturers = []
+            lecturer_name_div = field_divs.get("lecturer-name")
+            if lecturer_name_div is not None:
+                lecturers = _lxml_stripped_strings(lecturer_name_div)
+
+            groups = self._lxml_texts(field_divs.get("groups"))
+            semesters = self._lxml_texts(field_divs.get("semester"))
+            days = [
+                text.strip()
+                for text in self._lxml_texts(field_divs.get("days"), "day")
+            ]
+            hours = [
+                text for text in self._lxml_texts(field_divs.get("hour")) if text.strip()
+            ]
+            lesson_types = self._lxml_texts(field_divs.get("lesson"))
+            places = [
+                text.strip()
+                for text in self._lxml_texts(field_divs.get("places"), "place-item")
+            ]
+            notes = [
+                text.strip() for text in self._lxml_texts(field_divs.get("note")) if text.strip()
+            ]
+
+            timer.lap(ROWS)
+            schedule.extend(
+                self._create_lessons(
+                    row_num, lecturers, groups, semesters, days, hours, lesson_types, places, notes
                 )
-                schedule.append(lesson)
+            )
+            timer.lap(LESSONS)
+
+        return self._create_course(
+            timer=timer,
+            faculty_data=header_divs["data-school"].text_content(),
+            title=header_divs["title"].text_content(),
+            hebrew_course_name=header_divs["subtitle"].text_content(),
+            english_course_name=header_divs["subtitle-eng"].text_content(),
+            semester=_lxml_find(additional_data, "div", "additional-data-semester").text_content(),
+            weekly_hours_text=(
+                weekly_hours_div.text_content() if weekly_hours_div is not None else None
+            ),
+            credits_text=_lxml_find(
+                additional_data, "div", "additional-data-student-points"
+            ).text_content(),
+            test_info=test_div.text_content() if test_div is not None else "",
+            language=language_div.text_content() if language_div is not None else "",
+            hebrew_notes=notes_div.text_content() if notes_div is not None else "",
+            syllabus_href=cyllabus_tag.get("href") if cyllabus_tag is not None else None,
+            moodle_href=moodle_tag.get("href") if moodle_tag is not None else None,
+            schedule=schedule,
+        )
+
+    @staticmethod
+    def _lxml_texts(field_div, class_name: Optional[str] = None) -> List[str]:
+        """
+        :return: the texts of the divs inside field_div (only those with class_name, if given).
+        """
+        if field_div is None:
+            return []
+        return [
+            div.text_content()
+            for div in field_div.iterdescendants("div")
+            if class_name is None or _has_class(div, class_name)
+        ]
+
+    @staticmethod
+    def _create_lessons(
+        row_num: int,
+        lecturers: List[str],
+        groups: List[str],
+        semesters: List[str],
+        days: List[str],
+        hours: List[str],
+        lesson_types: List[str],
+        places: List[str],
+        notes: List[str],
+    ) -> List[Lesson]:
+        lessons = []
+        max_items = max(len(semesters), len(days), len(hours), len(places))
+
+        for i in range(max_items):
+            group = groups[0] if groups else ""
+            lesson_type = lesson_types[0] if lesson_types else ""
+            semester_val = semesters[i] if i < len(semesters) else ""
+            day_val = days[i] if i < len(days) else ""
+            time_val = hours[i] if i < len(hours) else ""
+            location_val = places[i] if i < len(places) else ""
+            passing_type_val = notes[i] if i < len(notes) else ""
+
+            lesson = Lesson(
+                location=location_val,
+                passing_type=passing_type_val,
+                time=time_val,
+                day=day_val,
+                semester=semester_val,
+                group=group,
+                type=lesson_type,
+                lecturers=lecturers,
+                row=row_num,
+            )
+            lessons.append(lesson)
+
+        return lessons
+
+    def _create_course(
+        self,
+        timer: StageTimer,
+        faculty_data: str,
+        title: str,
+        hebrew_course_name: str,
+        english_course_name: str,
+        semester: str,
+        weekly_hours_text: Optional[str],
+        credits_text: str,
+        test_info: str,
+        language: str,
+        hebrew_notes: str,
+        syllabus_href: Optional[str],
+        moodle_href: Optional[str],
+        schedule: List[Lesson],
+    ) -> Course:
+        """
+        Builds the course from the raw texts extracted from the html, regardless of the parsing engine.
+        """
+        # Extract faculty and department
+        faculty_parts = faculty_data.strip().split(":")
+        faculty = faculty_parts[0].strip()
+        department = faculty_parts[1].strip() if len(faculty_parts) > 1 else ""
+
+        # Extract course details from the title section
+        course_id = title.strip().split()[-1]
+
+        # semester = Semester.from_hebrew(semester_text)
+        weekly_hours = (
+            int(re.search(r"\d+", weekly_hours_text.strip()).group())
+            if weekly_hours_text is not None
+            else 0
+        )
+        credit_points = int(re.search(r"\d+", credits_text.strip()).group())
+
+        # Get test information
+        test_info = test_info.strip()
+        exam_type = test_info
+        exam_length = 0
+        if re.search(r"(\d+\.\d+)", test_info):
+            exam_length = float(re.search(r"(\d+\.\d+)", test_info).group())
+
+        is_running = True  # Assuming course is running if it's in the system
+        english_notes = ""  # Not found in the new format
+
+        # Extract syllabus and moodle links
+        syllabus_url = ""
+        moodle_url = ""
+        # Extract the URL from JavaScript function
+        if syllabus_href and "javascript:OpenUrl(" in syllabus_href:
+            url_parts = syllabus_href.split("'")
+            if len(url_parts) >= 2:
+                syllabus_url = f"https://shnaton.huji.ac.il{url_parts[1]}"
+        if moodle_href is not None:
+            moodle_url = moodle_href
+
+        timer.lap(HEADER)
 
         # Sort the schedule
         schedule = self._sort_lessons(schedule)
+        timer.finish(SORT)
 
         return Course(
             faculty=faculty,
             department=department,
             course_id=course_id,
-            english_name=english_course_name,
-            hebrew_name=hebrew_course_name,
+            english_name=english_course_name.strip(),
+            hebrew_name=hebrew_course_name.strip(),
             credits=credit_points,
             weekly_hours=weekly_hours,
-            semester=semester,
-            language=language,
+            semester=semester.strip(),
+            language=language.strip(),
             exam_length=exam_length,
             exam_type=exam_type,
             schedule=schedule,
             exams=None,  # We'll need to handle exams separately
-            hebrew_notes=hebrew_notes,
+            hebrew_notes=hebrew_notes.strip(),
             english_notes=english_notes,
             is_running=is_running,
             syllabus_url=syllabus_url,
@@ -230,14 +464,61 @@ class HtmlToCourse(HtmlToObject):
 
 class HtmlToExams(HtmlToObject):
     def convert(self, html_str: str) -> List[Exam]:
-        html = BeautifulSoup(html_str, "html.parser")
-        exam_table = html.find("table")
+        timer = self._timer()
+        if self.engine == LXML_ENGINE:
+            rows = self._lxml_rows(html_str, timer)
+        else:
+            rows = self._bs4_rows(html_str, timer)
+        timer.lap(ROWS)
+
         exams = []
-        for tr in exam_table.find_all("tr")[1:]:
-            semester, moed, exam_date, exam_hour, location, exam_notes = [
-                td.text for td in tr.find_all("td")
-            ]
+        for semester, moed, exam_date, exam_hour, location, exam_notes in rows:
             exams.append(
                 Exam(exam_date, exam_hour, exam_notes, location, moed, semester)
             )
+        timer.finish(EXAMS)
         return exams
+
+    @staticmethod
+    def _bs4_rows(html_str: str, timer: StageTimer = NO_TIMER) -> List[List[str]]:
+        html = BeautifulSoup(html_str, "html.parser")
+        timer.lap(TREE_BUILD)
+        exam_table = html.find("table")
+        return [
+            [td.text for td in tr.find_all("td")]
+            for tr in exam_table.find_all("tr")[1:]
+        ]
+
+    @staticmethod
+    def _lxml_rows(html_str: str, timer: StageTimer = NO_TIMER) -> List[List[str]]:
+        html = lxml.html.document_fromstring(html_str)
+        timer.lap(TREE_BUILD)
+        exam_table = next(html.iter("table"), None)
+        return [
+            [td.text_content() for td in tr.iterdescendants("td")]
+            for tr in list(exam_table.iterdescendants("tr"))[1:]
+        ]
+
+
+class HtmlToCourseIds(HtmlToObject):
+    """
+    Extracts the ids of the courses listed in a search results page. Each course is titled like a single
+    course page, with its id as the last word of the title.
+    """
+
+    def convert(self, html_str: str) -> List[str]:
+        if self.engine == LXML_ENGINE:
+            html = lxml.html.document_fromstring(html_str)
+            titles = [
+                div.text_content() for div in html.iter("div") if _has_class(div, "title")
+            ]
+        else:
+            html = BeautifulSoup(html_str, "html.parser")
+            titles = [div.text for div in html.find_all("div", class_="title")]
+
+        course_ids = []
+        for title in titles:
+            words = title.split()
+            if words and words[-1].isdigit():
+                course_ids.append(words[-1])
+        return course_ids
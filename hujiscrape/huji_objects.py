@@ -1,13 +1,42 @@
-from dataclasses import dataclass
-from functools import cached_property
+import sys
+from dataclasses import asdict, dataclass, field, fields
 from typing import List, Optional, Tuple
 
 
 class HujiObject:
-    pass
+    __slots__ = ()
 
 
-@dataclass(frozen=True)
+def _intern(value):
+    # Values repeat a lot between objects (days, semesters, locations...), so they share a single copy
+    return sys.intern(value) if type(value) is str else value
+
+
+def _split_time(time: str) -> Tuple[str, str]:
+    """
+    :return: time as a tuple of (start_time, end_time). If time == '', returns ('', '').
+    """
+    try:
+        # The format of the time field is <end_time>-<start_time>
+        end_time, start_time = time.split('-')
+    except ValueError:
+        return '', ''
+
+    return start_time, end_time
+
+
+def time_to_minutes(time: str) -> int:
+    """
+    :return: minutes since midnight of a time such as '14:45', or -1 if it is empty or malformed.
+    """
+    try:
+        hours, minutes = time.split(':')
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return -1
+
+
+@dataclass(frozen=True, slots=True)
 class Lesson(HujiObject):
     location: str
     passing_type: str  # Meaning in campus / videotaped etc...
@@ -16,35 +45,39 @@ class Lesson(HujiObject):
     semester: str
     group: str
     type: str  # Tirgul, Lecture...
-    lecturers: List[str]
+    lecturers: Tuple[str, ...]  # Lists are converted to tuples
 
     # The row where the lesson appeared in the shnaton.
     # Helpful to know which lessons are considered the same (basically group + semester)
     row: int
 
-    @cached_property
-    def _split_time(self) -> Tuple[str, str]:
-        """
-        :return: self.time as a tuple of (start_time, end_time). If self.time == '', returns ('', '').
-        """
-        try:
-            # The format of the time field is <end_time>-<start_time>
-            end_time, start_time = self.time.split('-')
-        except ValueError:
-            return '', ''
+    # Derived from time
+    start_time: str = field(init=False, repr=False, compare=False)
+    end_time: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # The dataclass is frozen, so attributes are set through object
+        for name in ('location', 'passing_type', 'time', 'day', 'semester', 'group', 'type'):
+            object.__setattr__(self, name, _intern(getattr(self, name)))
+        object.__setattr__(self, 'lecturers', tuple(_intern(lecturer) for lecturer in self.lecturers))
 
-        return start_time, end_time
+        start_time, end_time = _split_time(self.time)
+        object.__setattr__(self, 'start_time', start_time)
+        object.__setattr__(self, 'end_time', end_time)
 
     @property
-    def start_time(self) -> str:
-        return self._split_time[0]
+    def start_minute(self) -> int:
+        """
+        :return: start_time in minutes since midnight, or -1 if the lesson has no time.
+        """
+        return time_to_minutes(self.start_time)
 
     @property
-    def end_time(self) -> str:
-        return self._split_time[1]
+    def end_minute(self) -> int:
+        return time_to_minutes(self.end_time)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Exam(HujiObject):
     date: str
     hour: str
@@ -53,8 +86,12 @@ class Exam(HujiObject):
     moed: str
     semester: str
 
+    def __post_init__(self) -> None:
+        for name in ('date', 'hour', 'location', 'moed', 'semester'):
+            object.__setattr__(self, name, _intern(getattr(self, name)))
+
 
-@dataclass(frozen=False)
+@dataclass(frozen=False, slots=True)
 class Course(HujiObject):
     course_id: str
     hebrew_name: str
@@ -74,3 +111,28 @@ class Course(HujiObject):
     is_running: bool
     syllabus_url: str
     moodle_url: str
+
+    def __post_init__(self) -> None:
+        for name in ('department', 'faculty', 'semester', 'language', 'exam_type'):
+            setattr(self, name, _intern(getattr(self, name)))
+
+    def to_dict(self) -> dict:
+        """
+        :return: the course as a JSON serializable dict.
+        """
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Course':
+        data = dict(data)
+        data['schedule'] = [Lesson(**_init_fields(Lesson, lesson)) for lesson in data['schedule']]
+        if data['exams'] is not None:
+            data['exams'] = [Exam(**exam) for exam in data['exams']]
+        return cls(**data)
+
+
+def _init_fields(cls, data: dict) -> dict:
+    """
+    :return: the items of data that are arguments of cls's __init__ (leaving out derived fields).
+    """
+    return {f.name: data[f.name] for f in fields(cls) if f.init}
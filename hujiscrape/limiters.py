@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import itertools
+import time
+from urllib.parse import urlsplit
+
+
+class ConcurrencyLimiter:
+    """
+    Limits the number of requests in flight. Waiting requests are let through most urgent first, and in the
+    order they arrived among equally urgent ones.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._in_flight = 0
+        # A heap of (urgency, arrival, future)
+        self._waiters = []
+        self._arrivals = itertools.count()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self, urgency: tuple = ()) -> None:
+        """
+        :param urgency: Compared between waiting requests, the lowest is let through first (see FetchTask.urgency).
+        """
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (urgency, next(self._arrivals), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were let through just as we got cancelled, pass the slot on
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Cancelled while waiting
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        """
+        Called after every successful request with its latency in seconds.
+        """
+        pass
+
+    def on_failure(self) -> None:
+        """
+        Called after every failed request (network error, timeout, etc.).
+        """
+        pass
+
+
+class AIMDLimiter(ConcurrencyLimiter):
+    """
+    A ConcurrencyLimiter that adapts its limit to the server (additive increase, multiplicative decrease).
+    The limit grows by about one for every limit-worth of requests that succeed while the latency is stable,
+    and is cut proportionally when requests fail or the latency rises above the normal latency.
+    """
+
+    # Weights of a new latency measurement in the recent and the normal (baseline) latency averages
+    RECENT_SMOOTHING = 0.3
+    BASELINE_SMOOTHING = 0.02
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        latency_tolerance: float = 2.0,
+        failure_backoff: float = 0.5,
+        latency_backoff: float = 0.9,
+        backoff_cooldown: float = 1.0,
+    ) -> None:
+        """
+        :param initial_limit: Clamped to [min_limit, max_limit].
+        :param latency_tolerance: The recent latency may be this many times the baseline before backing off.
+        :param failure_backoff: Factor the limit is multiplied by after a failure.
+        :param latency_backoff: Factor the limit is multiplied by when latency is too high.
+        :param backoff_cooldown: Minimal seconds between two decreases, so that a burst of failures caused by
+                                 the same congestion cuts the limit only once.
+        """
+        super().__init__(max(min_limit, min(initial_limit, max_limit)))
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._latency_tolerance = latency_tolerance
+        self._failure_backoff = failure_backoff
+        self._latency_backoff = latency_backoff
+        self._backoff_cooldown = backoff_cooldown
+
+        self._recent_latency: float | None = None
+        self._baseline_latency: float | None = None
+        self._last_decrease = 0.0
+
+    def on_success(self, latency: float) -> None:
+        if self._baseline_latency is None:
+            self._recent_latency = self._baseline_latency = latency
+
+        self._recent_latency += self.RECENT_SMOOTHING * (latency - self._recent_latency)
+        self._baseline_latency += self.BASELINE_SMOOTHING * (latency - self._baseline_latency)
+
+        if self._recent_latency > self._baseline_latency * self._latency_tolerance:
+            self._decrease(self._latency_backoff)
+        else:
+            self._limit = min(self._max_limit, self._limit + 1 / self._limit)
+            self._wake_waiters()
+
+    def on_failure(self) -> None:
+        self._decrease(self._failure_backoff)
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self._backoff_cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self._min_limit, self._limit * factor)
+
+
+class TokenBucket:
+    """
+    Spaces out requests to at most `rate` per second, allowing bursts of up to `burst` requests.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        # Reserve a token, going into debt if there is none. Each caller waits until its debt is paid, which
+        # spaces the callers evenly.
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self._tokens / self.rate)
+        except asyncio.CancelledError:
+            self._tokens += 1
+            raise
+
+
+class HostRateLimiter:
+    """
+    Keeps a separate TokenBucket for every host.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """
+        :param rate: Requests per second allowed to each host.
+        :param burst: Requests that may be sent at once to a host that was idle.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._buckets = {}
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate: float) -> None:
+        self._rate = rate
+        for bucket in self._buckets.values():
+            bucket.rate = rate
+
+    async def acquire(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self._rate, self._burst)
+        await bucket.acquire()
@@ -62,6 +62,43 @@ class Semester(enum.IntEnum):
         return semester
 
 
+# Days of the week
+class Day(enum.IntEnum):
+    Sunday = 1
+    Monday = 2
+    Tuesday = 3
+    Wednesday = 4
+    Thursday = 5
+    Friday = 6
+    Saturday = 7
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def from_hebrew(cls, text: str) -> 'Day':
+        """
+        A method that returns an enum value for a given text, such as "יום ב'".
+        :return: an enum
+        :raise: ValueError if the text doesn't map to any enum.
+        """
+        letter = text.replace("יום", "").strip().rstrip("'׳")
+        day = {
+            "א": Day.Sunday,
+            "ב": Day.Monday,
+            "ג": Day.Tuesday,
+            "ד": Day.Wednesday,
+            "ה": Day.Thursday,
+            "ו": Day.Friday,
+            "ש": Day.Saturday,
+        }.get(letter)
+
+        if day is None:
+            raise ValueError(f"'{text}' is not a valid Day")
+
+        return day
+
+
 if __name__ == '__main__':
     a = Semester("סמסטר א'")
     print(a)
@@ -0,0 +1,176 @@
+import bisect
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from tqdm import tqdm
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# (kind, name, value, labels)
+MetricsCallback = Callable[[str, str, float, Dict[str, str]], None]
+LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        # The last count is of values above all the buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        :return: an estimate of the q-quantile (0 <= q <= 1): the upper bound of the bucket it falls in.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms recorded by the fetcher and the scrapers.
+    Read them with snapshot() or to_prometheus(), or subscribe to be called on every recorded value.
+    """
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, Dict[LabelsKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelsKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelsKey, Histogram]] = {}
+        self._callbacks: List[MetricsCallback] = []
+        # Callbacks that raised, whose errors are logged once
+        self._failed_callbacks: List[MetricsCallback] = []
+
+    def subscribe(self, callback: MetricsCallback) -> None:
+        """
+        :param callback: Called with (kind, name, value, labels) on every recorded value.
+                         Errors it raises are logged, and never fail the code that recorded the value.
+        """
+        self._callbacks.append(callback)
+
+    def _notify(self, kind: str, name: str, value: float, labels: Dict[str, str]) -> None:
+        for callback in self._callbacks:
+            try:
+                callback(kind, name, value, labels)
+            except Exception as e:
+                if callback not in self._failed_callbacks:
+                    self._failed_callbacks.append(callback)
+                    tqdm.write(
+                        f"[{time.strftime('%H:%M:%S')}] [WARNING] Metrics callback {callback!r} failed on {name}: "
+                        f"{e!r}. Its further errors are not logged."
+                    )
+
+    @staticmethod
+    def _labels_key(labels: Dict[str, str]) -> LabelsKey:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        series = self._counters.setdefault(name, {})
+        key = self._labels_key(labels)
+        series[key] = series.get(key, 0) + value
+        self._notify(COUNTER, name, value, labels)
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        self._gauges.setdefault(name, {})[self._labels_key(labels)] = value
+        self._notify(GAUGE, name, value, labels)
+
+    def observe(
+        self, name: str, value: float, buckets: Sequence[float] = SECONDS_BUCKETS, **labels
+    ) -> None:
+        """
+        Records a value in a histogram. The buckets are fixed by the first observation of each series.
+        """
+        series = self._histograms.setdefault(name, {})
+        key = self._labels_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        histogram.observe(value)
+        self._notify(HISTOGRAM, name, value, labels)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(self._labels_key(labels), 0)
+
+    def histogram(self, name: str, **labels) -> Histogram | None:
+        return self._histograms.get(name, {}).get(self._labels_key(labels))
+
+    def snapshot(self) -> dict:
+        """
+        :return: {kind: {name: [{"labels": {...}, "value": ...}]}}, where histogram values are
+                 {"count", "sum", "buckets": {upper bound: cumulative count}}.
+        """
+        return {
+            "counters": self._snapshot_series(self._counters, lambda value: value),
+            "gauges": self._snapshot_series(self._gauges, lambda value: value),
+            "histograms": self._snapshot_series(self._histograms, Histogram.snapshot),
+        }
+
+    @staticmethod
+    def _snapshot_series(metrics: dict, to_value: Callable) -> dict:
+        return {
+            name: [
+                {"labels": dict(labels), "value": to_value(value)}
+                for labels, value in series.items()
+            ]
+            for name, series in metrics.items()
+        }
+
+    def to_prometheus(self, prefix: str = "hujiscrape_") -> str:
+        """
+        :return: the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for kind, metrics in ((COUNTER, self._counters), (GAUGE, self._gauges)):
+            for name, series in metrics.items():
+                lines.append(f"# TYPE {prefix}{name} {kind}")
+                for labels, value in series.items():
+                    lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+
+        for name, series in self._histograms.items():
+            lines.append(f"# TYPE {prefix}{name} {HISTOGRAM}")
+            for labels, histogram in series.items():
+                for bound, count in histogram.snapshot()["buckets"].items():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{prefix}{name}_bucket{_format_labels(labels + (('le', le),))} {count}"
+                    )
+                lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{_format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: LabelsKey) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
@@ -0,0 +1,493 @@
+"""
+Parsing of Shnaton pages off the event loop.
+
+Small pages are parsed inline, medium ones in a thread and large ones in worker processes. Every worker process
+holds its own parsers, created once by the pool initializer, and parses pages in batches. Results are sent back
+as plain tuples, which are much cheaper to pickle than the dataclasses graph.
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from hujiscrape.html_to_object import BS4_ENGINE, HtmlToCourse, HtmlToCourseIds, HtmlToExams
+from hujiscrape.huji_objects import Course, Exam, HujiObject, Lesson
+from hujiscrape.metrics import SIZE_BUCKETS, Metrics
+from hujiscrape.parse_profiles import ParseProfile
+
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_BATCH_DELAY = 0.005  # seconds
+# Large pages are sent on their own rather than holding back a whole batch
+MAX_BATCH_CHARS = 512 * 1024
+
+COURSE_PAGE = "course"
+EXAMS_PAGE = "exams"
+# A page of search results, parsed to the course ids it lists
+SEARCH_PAGE = "search"
+PAGE_TYPES = (COURSE_PAGE, EXAMS_PAGE, SEARCH_PAGE)
+
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+
+_worker_parsers: Dict[str, Tuple[Callable, Callable]] = {}
+# The stage timings of the worker's parsers, when profiling
+_worker_profiles: Dict[str, ParseProfile] = {}
+
+
+def create_parse_pool(
+    max_workers: int, parser_engine: str = BS4_ENGINE, profile: bool = False
+) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(parser_engine, profile)
+    )
+
+
+def _pack_course(course: Course) -> tuple:
+    lessons = tuple(
+        (
+            lesson.location,
+            lesson.passing_type,
+            lesson.time,
+            lesson.day,
+            lesson.semester,
+            lesson.group,
+            lesson.type,
+            tuple(lesson.lecturers),
+            lesson.row,
+        )
+        for lesson in course.schedule
+    )
+    return (
+        course.course_id,
+        course.hebrew_name,
+        course.english_name,
+        course.department,
+        course.faculty,
+        course.semester,
+        course.weekly_hours,
+        course.credits,
+        course.language,
+        course.exam_length,
+        course.exam_type,
+        lessons,
+        course.hebrew_notes,
+        course.english_notes,
+        course.is_running,
+        course.syllabus_url,
+        course.moodle_url,
+    )
+
+
+def _unpack_course(packed: tuple) -> Course:
+    (
+        course_id,
+        hebrew_name,
+        english_name,
+        department,
+        faculty,
+        semester,
+        weekly_hours,
+        credits,
+        language,
+        exam_length,
+        exam_type,
+        lessons,
+        hebrew_notes,
+        english_notes,
+        is_running,
+        syllabus_url,
+        moodle_url,
+    ) = packed
+    schedule = [
+        Lesson(
+            location=location,
+            passing_type=passing_type,
+            time=time_,
+            day=day,
+            semester=lesson_semester,
+            group=group,
+            type=lesson_type,
+            lecturers=lecturers,
+            row=row,
+        )
+        for location, passing_type, time_, day, lesson_semester, group, lesson_type, lecturers, row in lessons
+    ]
+    return Course(
+        course_id=course_id,
+        hebrew_name=hebrew_name,
+        english_name=english_name,
+        department=department,
+        faculty=faculty,
+        semester=semester,
+        weekly_hours=weekly_hours,
+        credits=credits,
+        language=language,
+        exam_length=exam_length,
+        exam_type=exam_type,
+        schedule=schedule,
+        exams=None,
+        hebrew_notes=hebrew_notes,
+        english_notes=english_notes,
+        is_running=is_running,
+        syllabus_url=syllabus_url,
+        moodle_url=moodle_url,
+    )
+
+
+def _pack_exams(exams: List[Exam]) -> tuple:
+    return tuple(
+        (exam.date, exam.hour, exam.notes, exam.location, exam.moed, exam.semester)
+        for exam in exams
+    )
+
+
+def _unpack_exams(packed: tuple) -> List[Exam]:
+    return [Exam(*exam) for exam in packed]
+
+
+_UNPACK = {COURSE_PAGE: _unpack_course, EXAMS_PAGE: _unpack_exams, SEARCH_PAGE: list}
+
+
+def _init_worker(parser_engine: str, profile: bool = False) -> None:
+    if profile:
+        for page_type in PAGE_TYPES:
+            _worker_profiles[page_type] = ParseProfile()
+    _worker_parsers[COURSE_PAGE] = (
+        HtmlToCourse(parser_engine, _worker_profiles.get(COURSE_PAGE)).convert,
+        _pack_course,
+    )
+    _worker_parsers[EXAMS_PAGE] = (
+        HtmlToExams(parser_engine, _worker_profiles.get(EXAMS_PAGE)).convert,
+        _pack_exams,
+    )
+    _worker_parsers[SEARCH_PAGE] = (
+        HtmlToCourseIds(parser_engine, _worker_profiles.get(SEARCH_PAGE)).convert,
+        tuple,
+    )
+
+
+def _parse_batch(page_type: str, htmls: List[str]) -> Tuple[List[tuple], dict | None]:
+    """
+    Runs in a worker process.
+    Returns: (packed object or None, execution time in seconds, error message or None) for every page, and the
+             stage timings of the batch (see ParseProfile.to_dict) if profiling
+    """
+    convert, pack = _worker_parsers[page_type]
+    results = []
+    for html in htmls:
+        t_start = time.perf_counter()
+        try:
+            results.append((pack(convert(html)), time.perf_counter() - t_start, None))
+        except Exception as e:
+            results.append((None, time.perf_counter() - t_start, str(e)))
+
+    profile = _worker_profiles.get(page_type)
+    return results, profile.drain() if profile is not None else None
+
+
+class ParseBatcher:
+    """
+    Collects pages of one type from concurrent callers and sends them to a pool created by create_parse_pool in
+    batches, so each submission amortizes the IPC overhead over several pages.
+    """
+
+    def __init__(
+        self,
+        pool: ProcessPoolExecutor,
+        page_type: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        batch_delay: float = DEFAULT_BATCH_DELAY,
+        profile: ParseProfile | None = None,
+    ) -> None:
+        """
+        :param page_type: One of PAGE_TYPES.
+        :param batch_size: Number of pages sent to a worker at once.
+        :param batch_delay: Seconds to wait for a batch to fill before sending it anyway.
+        :param profile: Where the stage timings of the workers are added, if the pool profiles its parsers.
+        """
+        self._pool = pool
+        self._profile = profile
+        self._page_type = page_type
+        self._unpack = _UNPACK[page_type]
+        self._batch_size = batch_size
+        self._batch_delay = batch_delay
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._pending_chars = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    async def parse(self, html: str) -> Tuple[HujiObject | List[HujiObject], float]:
+        """
+        :return: (Parsed Object, Execution Time in Seconds)
+        :raise: ValueError if the page couldn't be parsed.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((html, future))
+        self._pending_chars += len(html)
+
+        if len(self._pending) >= self._batch_size or self._pending_chars >= MAX_BATCH_CHARS:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._batch_delay, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending, self._pending_chars = self._pending, [], 0
+        if not batch:
+            return
+
+        futures = [future for _, future in batch]
+        try:
+            batch_future = asyncio.wrap_future(
+                self._pool.submit(_parse_batch, self._page_type, [html for html, _ in batch])
+            )
+        except Exception as e:
+            # The pool is broken or shut down
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        batch_future.add_done_callback(
+            lambda done: self._distribute_results(done, futures)
+        )
+
+    def _distribute_results(self, batch_future: asyncio.Future, futures: List[asyncio.Future]) -> None:
+        if batch_future.cancelled():
+            for future in futures:
+                future.cancel()
+            return
+
+        if batch_future.exception() is not None:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(batch_future.exception())
+            return
+
+        results, stages = batch_future.result()
+        if stages is not None and self._profile is not None:
+            self._profile.merge(stages)
+        for future, (packed, duration, error) in zip(futures, results):
+            if future.done():
+                # The caller was cancelled
+                continue
+            if error is not None:
+                future.set_exception(ValueError(error))
+            else:
+                future.set_result((self._unpack(packed), duration))
+
+
+class ParseCostModel:
+    """
+    Estimates the seconds it takes to parse a page as a fixed overhead plus a cost per character, fitted by least
+    squares to the measured parses, with recent parses weighted more.
+    """
+
+    def __init__(self, smoothing: float) -> None:
+        """
+        :param smoothing: Weight of a new measurement; the weights of older ones decay by 1 - smoothing.
+        """
+        self._decay = 1 - smoothing
+        # Weighted sums of 1, chars, seconds, chars ** 2 and chars * seconds
+        self._sums = (0.0, 0.0, 0.0, 0.0, 0.0)
+        self.samples = 0
+
+    def add(self, chars: int, seconds: float) -> None:
+        weight, x, y, xx, xy = (total * self._decay for total in self._sums)
+        self._sums = (weight + 1, x + chars, y + seconds, xx + chars * chars, xy + chars * seconds)
+        self.samples += 1
+
+    def fit(self) -> Tuple[float, float]:
+        """
+        :return: (overhead seconds, seconds per character)
+        """
+        weight, x, y, xx, xy = self._sums
+        if not weight or not x:
+            return (y / weight if weight else 0.0), 0.0
+        variance = weight * xx - x * x
+        if variance <= 1e-9 * weight * xx:
+            # All the pages were about the same size, so the overhead can't be told apart
+            return 0.0, y / x
+        cost_per_char = max(0.0, (weight * xy - x * y) / variance)
+        overhead = max(0.0, (y - cost_per_char * x) / weight)
+        return overhead, cost_per_char
+
+    def max_chars(self, seconds: float) -> int:
+        """
+        :return: the size of the largest page expected to parse within the given seconds, -1 if none is.
+        """
+        overhead, cost_per_char = self.fit()
+        if overhead > seconds:
+            return -1
+        if cost_per_char == 0:
+            return sys.maxsize
+        return int((seconds - overhead) / cost_per_char)
+
+
+class ParseDispatcher:
+    """
+    Chooses where each page is parsed by its size: inline on the event loop for small pages, where any hop
+    costs more than the parse itself, a thread for medium pages, and the process pool for large ones.
+    The size thresholds of each page type are calibrated from its measured parse durations (see ParseCostModel),
+    so that an inline parse takes at most inline_budget seconds and only pages expected to take
+    process_min_duration go to the process pool. Until a page type is calibrated, its pages are never parsed
+    inline, since a single slow parse there blocks the event loop.
+    """
+
+    # Weight of a new measurement in the parse cost moving average
+    COST_SMOOTHING = 0.1
+    MIN_CALIBRATION_SAMPLES = 20
+
+    def __init__(
+        self,
+        max_workers: int,
+        parser_engine: str = BS4_ENGINE,
+        inline_max_chars: int = -1,
+        process_min_chars: int = 200 * 1024,
+        inline_budget: float = 0.005,
+        process_min_duration: float = 0.05,
+        calibrate: bool = True,
+        thread_workers: int = 2,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        metrics: Metrics | None = None,
+        profile: bool = False,
+    ) -> None:
+        """
+        :param max_workers: Number of parsing processes.
+        :param inline_max_chars: Pages up to this size are parsed inline, until calibrated. By default none are.
+        :param process_min_chars: Pages from this size are parsed in the process pool, until calibrated.
+        :param inline_budget: Seconds a parse may block the event loop.
+        :param process_min_duration: Expected parse seconds from which a page is worth sending to a process.
+        :param calibrate: Recalculate the thresholds from measured parse durations.
+        :param metrics: Where parse durations and page sizes are recorded.
+        :param profile: Time the stages of every parse, in all venues, into profiles.
+        """
+        self.metrics = metrics
+        # page type -> the stage timings of its parses, if profiling
+        self.profiles: Dict[str, ParseProfile] = (
+            {page_type: ParseProfile() for page_type in PAGE_TYPES} if profile else {}
+        )
+        self.inline_max_chars = inline_max_chars
+        self.process_min_chars = process_min_chars
+        self._inline_budget = inline_budget
+        self._process_min_duration = process_min_duration
+        self._calibrate = calibrate
+
+        self._parsers = {
+            COURSE_PAGE: HtmlToCourse(parser_engine, self.profiles.get(COURSE_PAGE)).convert,
+            EXAMS_PAGE: HtmlToExams(parser_engine, self.profiles.get(EXAMS_PAGE)).convert,
+            SEARCH_PAGE: HtmlToCourseIds(parser_engine, self.profiles.get(SEARCH_PAGE)).convert,
+        }
+        self._max_workers = max_workers
+        self._parser_engine = parser_engine
+        self._thread_workers = thread_workers
+        self._batch_size = batch_size
+        # Started on first use, so that a dispatcher which only parses small pages never spawns processes
+        self._threads: ThreadPoolExecutor | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._batchers: Dict[str, ParseBatcher] = {}
+
+        self._cost_models = {
+            page_type: ParseCostModel(self.COST_SMOOTHING) for page_type in PAGE_TYPES
+        }
+        # page type -> its calibrated (inline_max_chars, process_min_chars)
+        self._thresholds: Dict[str, Tuple[int, int]] = {}
+
+    def venue_for(self, html: str, page_type: str = COURSE_PAGE) -> str:
+        inline_max_chars, process_min_chars = self._thresholds.get(
+            page_type, (self.inline_max_chars, self.process_min_chars)
+        )
+        if len(html) <= inline_max_chars:
+            return INLINE
+        if len(html) < process_min_chars:
+            return THREAD
+        return PROCESS
+
+    async def parse_course(self, html: str) -> Tuple[Course, float]:
+        """
+        :return: (Course Object, Execution Time in Seconds)
+        """
+        return await self._parse(COURSE_PAGE, html)
+
+    async def parse_exams(self, html: str) -> Tuple[List[Exam], float]:
+        """
+        :return: (Exams, Execution Time in Seconds)
+        """
+        return await self._parse(EXAMS_PAGE, html)
+
+    async def parse_search_results(self, html: str) -> Tuple[List[str], float]:
+        """
+        :return: (Course Ids, Execution Time in Seconds)
+        """
+        return await self._parse(SEARCH_PAGE, html)
+
+    def _batcher(self, page_type: str) -> ParseBatcher:
+        if self._pool is None:
+            self._pool = create_parse_pool(self._max_workers, self._parser_engine, bool(self.profiles))
+            self._batchers = {
+                page_type: ParseBatcher(
+                    self._pool, page_type, self._batch_size, profile=self.profiles.get(page_type)
+                )
+                for page_type in PAGE_TYPES
+            }
+        return self._batchers[page_type]
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self._thread_workers)
+        return self._threads
+
+    async def _parse(self, page_type: str, html: str) -> tuple:
+        venue = self.venue_for(html, page_type)
+        if venue == PROCESS:
+            result, duration = await self._batcher(page_type).parse(html)
+        elif venue == THREAD:
+            result, duration = await asyncio.get_running_loop().run_in_executor(
+                self._thread_pool(), self._timed_parse, page_type, html
+            )
+        else:
+            result, duration = self._timed_parse(page_type, html)
+
+        self._record(page_type, len(html), duration)
+        if self.metrics is not None:
+            self.metrics.observe("parse_seconds", duration, page=page_type, venue=venue)
+            self.metrics.observe("page_chars", len(html), buckets=SIZE_BUCKETS, page=page_type)
+        return result, duration
+
+    def _timed_parse(self, page_type: str, html: str) -> tuple:
+        t_start = time.perf_counter()
+        result = self._parsers[page_type](html)
+        return result, time.perf_counter() - t_start
+
+    def _record(self, page_type: str, size: int, duration: float) -> None:
+        if not self._calibrate or size == 0:
+            return
+
+        model = self._cost_models[page_type]
+        model.add(size, duration)
+        if model.samples >= self.MIN_CALIBRATION_SAMPLES:
+            inline_max_chars = model.max_chars(self._inline_budget)
+            self._thresholds[page_type] = (
+                inline_max_chars,
+                max(inline_max_chars + 1, model.max_chars(self._process_min_duration)),
+            )
+
+    def shutdown(self) -> None:
+        """
+        Stops the threads and processes. They are started again if the dispatcher is used afterwards.
+        """
+        if self._threads is not None:
+            self._threads.shutdown(wait=False)
+            self._threads = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            self._batchers = {}
@@ -0,0 +1,113 @@
+import threading
+import time
+from typing import Dict, Tuple
+
+# Stages of converting a page
+TREE_BUILD = "tree_build"
+HEADER = "header"
+ROWS = "rows"
+LESSONS = "lessons"
+EXAMS = "exams"
+SORT = "sort"
+
+
+class ParseProfile:
+    """
+    Total seconds spent in each stage of converting pages, aggregated over all the pages converted by a parser
+    (see HtmlToObject's profile parameter).
+    """
+
+    def __init__(self) -> None:
+        # stage -> (total seconds, number of times it ran)
+        self._stages: Dict[str, Tuple[float, int]] = {}
+        self.pages = 0
+        # Parsers are shared between threads
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, count: int = 1) -> None:
+        with self._lock:
+            total, runs = self._stages.get(stage, (0.0, 0))
+            self._stages[stage] = (total + seconds, runs + count)
+
+    def add_page(self, count: int = 1) -> None:
+        with self._lock:
+            self.pages += count
+
+    def seconds(self, stage: str) -> float:
+        return self._stages.get(stage, (0.0, 0))[0]
+
+    def to_dict(self) -> dict:
+        """
+        :return: {"pages": ..., "stages": {stage: [total seconds, runs]}}, e.g. to send from a worker process.
+        """
+        with self._lock:
+            return self._to_dict()
+
+    def _to_dict(self) -> dict:
+        return {"pages": self.pages, "stages": {stage: list(value) for stage, value in self._stages.items()}}
+
+    def drain(self) -> dict:
+        """
+        :return: to_dict(), and resets the profile.
+        """
+        with self._lock:
+            data = self._to_dict()
+            self._stages = {}
+            self.pages = 0
+        return data
+
+    def merge(self, data: dict) -> None:
+        """
+        Adds the stages of another profile, given as its to_dict().
+        """
+        for stage, (seconds, count) in data["stages"].items():
+            self.record(stage, seconds, count)
+        self.add_page(data["pages"])
+
+    def report(self) -> str:
+        """
+        :return: a table of the stages, slowest first, with their share of the total time and mean per page.
+        """
+        total = sum(seconds for seconds, _ in self._stages.values()) or 1.0
+        pages = self.pages or 1
+        lines = [f"{'stage':<12} {'total s':>9} {'share':>6} {'ms/page':>8} {'runs':>8}"]
+        for stage, (seconds, runs) in sorted(self._stages.items(), key=lambda item: -item[1][0]):
+            lines.append(
+                f"{stage:<12} {seconds:>9.3f} {seconds / total:>6.1%} {seconds / pages * 1000:>8.3f} {runs:>8}"
+            )
+        lines.append(f"{self.pages} pages")
+        return "\n".join(lines)
+
+
+class StageTimer:
+    """
+    Records the time since the previous lap (or since the timer was created) as the given stage.
+    """
+
+    def __init__(self, profile: ParseProfile) -> None:
+        self._profile = profile
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self._profile.record(stage, now - self._last)
+        self._last = now
+
+    def finish(self, stage: str) -> None:
+        self.lap(stage)
+        self._profile.add_page()
+
+
+class _NoTimer:
+    """
+    Used when profiling is off, so that converting doesn't pay for the timing.
+    """
+
+    def lap(self, stage: str) -> None:
+        pass
+
+    def finish(self, stage: str) -> None:
+        pass
+
+
+NO_TIMER = _NoTimer()
@@ -0,0 +1,141 @@
+import asyncio
+import collections
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+# Statuses that mean the server may answer the same request later
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Network errors and timeouts. Other errors (e.g. a 404, or a bug in our code) fail the same way on every attempt.
+RETRYABLE_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+    OSError,
+)
+
+
+class RetryBudget:
+    """
+    Limits retries to a share of the requests sent recently, so that while the server is overloaded the retries
+    don't multiply the load on it. Shared by all the requests of a fetcher.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries_per_second: float = 1.0, window: float = 10.0) -> None:
+        """
+        :param ratio: Retries allowed per request sent in the window.
+        :param min_retries_per_second: Retries allowed regardless of the traffic, so that a few requests can
+                                       still be retried when little is sent.
+        :param window: Seconds of traffic the budget is computed over.
+        """
+        self._ratio = ratio
+        self._min_retries = min_retries_per_second * window
+        self._window = window
+        # Times of the requests (first attempts) and retries in the window
+        self._requests = collections.deque()
+        self._retries = collections.deque()
+
+    def _prune(self, now: float) -> None:
+        for times in (self._requests, self._retries):
+            while times and times[0] <= now - self._window:
+                times.popleft()
+
+    def record_request(self) -> None:
+        now = time.monotonic()
+        self._prune(now)
+        self._requests.append(now)
+
+    def try_retry(self) -> bool:
+        """
+        :return: whether a retry is allowed now, and if so counts it.
+        """
+        now = time.monotonic()
+        self._prune(now)
+        if len(self._retries) >= self._min_retries + self._ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests are retried and when (see Fetcher's retry_policy parameter).
+    Retryable errors are retried after the server's Retry-After, or after a decorrelated jitter backoff: a random
+    delay between base_delay and three times the previous delay, capped at max_delay.
+    Cancellation is never retried.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        retryable_statuses: frozenset = RETRYABLE_STATUSES,
+        retryable_errors: tuple = RETRYABLE_ERRORS,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        max_retry_after: float = 120.0,
+        budget: RetryBudget | None = None,
+    ) -> None:
+        """
+        :param max_attempts: Including the first attempt.
+        :param retryable_statuses: HTTP error statuses that are retried.
+        :param retryable_errors: Exception types that are retried. An HTTP error status is retried only if it's
+                                 in retryable_statuses.
+        :param max_retry_after: A request the server asks to retry later than this many seconds is not retried.
+        :param budget: Limits the share of retries in the traffic. A new RetryBudget is created if not given.
+        """
+        self.max_attempts = max_attempts
+        self._retryable_statuses = retryable_statuses
+        self._retryable_errors = retryable_errors
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._max_retry_after = max_retry_after
+        self._budget = budget or RetryBudget()
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, asyncio.CancelledError):
+            return False
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in self._retryable_statuses
+        return isinstance(error, self._retryable_errors)
+
+    def record_request(self) -> None:
+        """
+        Called before the first attempt of every request.
+        """
+        self._budget.record_request()
+
+    def try_retry(self) -> bool:
+        """
+        :return: whether the budget allows another retry now.
+        """
+        return self._budget.try_retry()
+
+    def delay(self, error: BaseException, previous_delay: float) -> float | None:
+        """
+        :param previous_delay: The delay before the previous retry of the request, 0 before the first retry.
+        :return: seconds to wait before retrying, or None if the server asks to wait longer than max_retry_after.
+        """
+        retry_after = self.retry_after(error)
+        if retry_after is not None:
+            return retry_after if retry_after <= self._max_retry_after else None
+        return min(self._max_delay, random.uniform(self._base_delay, max(self._base_delay, previous_delay * 3)))
+
+    @staticmethod
+    def retry_after(error: BaseException) -> float | None:
+        """
+        :return: the seconds in the Retry-After header of an HTTP error (given in seconds or as a date).
+        """
+        headers = getattr(error, "headers", None) if isinstance(error, aiohttp.ClientResponseError) else None
+        value = headers.get("Retry-After") if headers else None
+        if value is None:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
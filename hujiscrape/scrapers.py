@@ -1,33 +1,137 @@
 import asyncio
+import hashlib
 import os
-import time
-from concurrent.futures import ProcessPoolExecutor
-from functools import partial
-from typing import List, Tuple
+from collections import OrderedDict
+from dataclasses import replace
+from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple
 
 from tqdm.asyncio import tqdm
 
-from hujiscrape.fetch_tasks import CourseFetchTask, ExamFetchTask
+from hujiscrape.fetch_tasks import CourseFetchTask, ExamFetchTask, Priority, SearchFetchTask
 from hujiscrape.fetchers import Fetcher
-from hujiscrape.html_to_object import HtmlToCourse, HtmlToExams
-from hujiscrape.huji_objects import Course
+from hujiscrape.html_to_object import BS4_ENGINE
+from hujiscrape.huji_objects import Course, Exam
+from hujiscrape.magics import Semester, Toar, ToarYear
+from hujiscrape.metrics import Metrics
+from hujiscrape.parse_pool import ParseDispatcher
+from hujiscrape.state_stores import CourseStateStore, ScrapeJournal, hash_html
 
+DEFAULT_MAX_IN_FLIGHT = 200
 
-def _cpu_bound_parse_course(parser: HtmlToCourse, html: str) -> Tuple[Course, float]:
+
+class _CoursePageGuard:
+    """
+    Stops reading a course page as soon as it is known to be missing or too large to parse (over max_size bytes).
+    Guards of the same limits are equal, so that concurrent fetches of the same page share a request (see
+    Fetcher.fetch_until).
+    """
+
+    def __init__(self, missing_text: str, max_size: int) -> None:
+        self._missing_text = missing_text
+        self._max_size = max_size
+        # The end of the text read so far, in case the missing text is split between chunks
+        self._tail = ""
+
+    def reset(self) -> None:
+        """
+        Called before reading each response, so that a retried request starts over.
+        """
+        self._tail = ""
+
+    def __call__(self, text: str, bytes_read: int) -> bool:
+        if bytes_read > self._max_size:
+            return True
+
+        window = self._tail + text
+        if self._missing_text in window:
+            return True
+        self._tail = window[-len(self._missing_text):]
+        return False
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, _CoursePageGuard)
+            and (self._missing_text, self._max_size) == (other._missing_text, other._max_size)
+        )
+
+    def __hash__(self) -> int:
+        return hash((self._missing_text, self._max_size))
+
+
+async def _gather_or_cancel(awaitables: Iterable[Awaitable]) -> list:
     """
-    Runs in a separate process.
-    Returns: (Course Object, Execution Time in Seconds)
+    Like asyncio.gather, but once one of the awaitables fails, the others are cancelled rather than left running.
     """
-    t_start = time.time()
-    course = parser.convert(html)
-    duration = time.time() - t_start
-    return course, duration
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _completed(course: Course) -> Course:
+    return course
+
+
+async def _with_year(
+        course_ids: AsyncIterable[int | str], year: int
+) -> AsyncIterator[Tuple[int | str, int]]:
+    async for course_id in course_ids:
+        yield course_id, year
+
+
+class _SharedParses:
+    """
+    Parses identical course pages (such as the page of a course that didn't change between years) only once.
+    Only pages with exactly the same text are identical, since some fields (such as a lesson's group) keep the
+    page's whitespace. Remembers the parses of the last max_pages pages.
+    """
+
+    def __init__(self, max_pages: int, metrics: Metrics) -> None:
+        self._max_pages = max_pages
+        self._metrics = metrics
+        # content hash -> the parse of the page, which may still be running
+        self._parses: OrderedDict[str, asyncio.Future] = OrderedDict()
+
+    async def parse(
+            self, html: str, parse: Callable[[], Awaitable[Course | None]]
+    ) -> Course | None:
+        content_hash = hashlib.blake2b(html.encode("utf-8"), digest_size=16).hexdigest()
+        parsing = self._parses.get(content_hash)
+        if parsing is None:
+            parsing = self._parses[content_hash] = asyncio.ensure_future(parse())
+            if len(self._parses) > self._max_pages:
+                self._parses.popitem(last=False)
+        else:
+            self._parses.move_to_end(content_hash)
+            self._metrics.increment("shared_parses_total")
+
+        # Cancelling one of the courses waiting for the parse doesn't cancel it for the others
+        course = await asyncio.shield(parsing)
+        if course is None:
+            return None
+        # Every course gets its own copy, since exams are attached to it
+        return replace(course, schedule=list(course.schedule), exams=None)
+
+    def cancel(self) -> None:
+        for parsing in self._parses.values():
+            parsing.cancel()
 
 
 class ShnatonScraper:
     def __init__(self, fetcher: Fetcher | None = None) -> None:
         self._fetcher = fetcher or Fetcher()
 
+    @property
+    def metrics(self) -> Metrics:
+        """
+        The scraper records its metrics along with its fetcher's.
+        """
+        return self._fetcher.metrics
+
     async def scrape(self, **kwargs):
         raise NotImplementedError()
 
@@ -36,105 +140,402 @@ class SingleCourseScraper(ShnatonScraper):
     MISSING_COURSE_TEXT = "לא נמצא קורס"
     MAX_HTML_SIZE = 5 * 1024 * 1024  # 5 MB
     LONG_PARSE_THRESHOLD = 5.0  # seconds
+    # Number of recently parsed pages whose parse is shared with identical pages of other years
+    SHARED_PARSES = 1024
 
     def __init__(
-            self, fetcher: Fetcher | None = None, max_cpu_workers: int | None = None
+            self,
+            fetcher: Fetcher | None = None,
+            max_cpu_workers: int | None = None,
+            parser_engine: str = BS4_ENGINE,
+            parse_dispatcher: ParseDispatcher | None = None,
+            priority: Priority = Priority.NORMAL,
     ) -> None:
         """
         :param max_cpu_workers: Number of CPU processes. If None, uses os.cpu_count().
+        :param parser_engine: The engine used by the html parsers, see HtmlToObject.
+        :param parse_dispatcher: Decides where pages are parsed. Overrides max_cpu_workers and parser_engine.
+                                 The scraper doesn't shut down a dispatcher it is given, so that it can be shared.
+        :param priority: Priority of the scraper's requests in its fetcher. E.g. a scraper refreshing single
+                         courses on demand can share a fetcher with a BACKGROUND catalog scrape and still be
+                         answered quickly. The fetcher's session stays open until the last scraper using it is
+                         done (see Fetcher.__aenter__).
         """
         super().__init__(fetcher)
-        self._course_parser = HtmlToCourse()
-        self._exam_parser = HtmlToExams()
+        self._priority = priority
 
         self._workers = max_cpu_workers or os.cpu_count() or 1
-        self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        self._parse_dispatcher = parse_dispatcher or ParseDispatcher(
+            self._workers, parser_engine, metrics=self.metrics
+        )
+        # Only a dispatcher created by the scraper is shut down by it
+        self._owns_parse_dispatcher = parse_dispatcher is None
+        # Inside `async with scraper`, the session and the parse processes stay up between scrapes
+        self._in_context = False
+
+    async def __aenter__(self) -> 'SingleCourseScraper':
+        """
+        Keeps the fetcher's session and the parse processes (started on first use) alive across scrape calls
+        until the block exits. Outside of the block, every scrape call opens and closes them (the session only
+        if no one else is using the fetcher, see Fetcher.__aenter__):
+            async with SingleCourseScraper() as scraper:
+                for course_ids in requests:
+                    courses = await scraper.scrape(course_ids, year)
+        """
+        await self._fetcher.__aenter__()
+        self._in_context = True
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._in_context = False
+        try:
+            if self._owns_parse_dispatcher:
+                self._parse_dispatcher.shutdown()
+        finally:
+            await self._fetcher.__aexit__(exc_type, exc_val, exc_tb)
 
     async def scrape(
             self,
-            course_ids: list[int | str],
+            course_ids: Iterable[int | str] | AsyncIterable[int | str],
             year: int,
             include_exams: bool = True,
             show_progress: bool = False,
             fail_after_n_missing_courses: int = 0,
+            state_store: CourseStateStore | None = None,
+            journal: ScrapeJournal | None = None,
     ) -> List[Course]:
-        courses = []
+        """
+        :param state_store: Courses from a previous scrape. Pages that haven't changed since are not parsed again,
+                            and the store is updated with the pages that have.
+        :param journal: Records every course and failed id as it completes. Courses it already recorded are
+                        taken from it instead of being scraped again, so an interrupted scrape can be resumed by
+                        running it again with the same journal.
+        """
+        return [
+            course
+            async for course in self.stream(
+                course_ids,
+                year,
+                include_exams=include_exams,
+                show_progress=show_progress,
+                fail_after_n_missing_courses=fail_after_n_missing_courses,
+                state_store=state_store,
+                journal=journal,
+            )
+        ]
+
+    async def stream(
+            self,
+            course_ids: Iterable[int | str] | AsyncIterable[int | str],
+            year: int,
+            include_exams: bool = True,
+            show_progress: bool = False,
+            fail_after_n_missing_courses: int = 0,
+            max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+            state_store: CourseStateStore | None = None,
+            journal: ScrapeJournal | None = None,
+    ) -> AsyncIterator[Course]:
+        """
+        Yields each course as soon as it is scraped (with its exams attached if include_exams), instead of
+        collecting the whole batch like scrape does.
+        :param course_ids: ids to scrape. Consumed lazily, so a generator over a large range is fine. May also be
+                           an async iterable, such as CourseIdScraper.stream.
+        :param max_in_flight: Maximal number of courses being scraped at once. Bounds the memory of large runs.
+        :param state_store: See scrape.
+        :param journal: See scrape.
+        """
+        if isinstance(course_ids, AsyncIterable):
+            course_keys = _with_year(course_ids, year)
+        else:
+            course_keys = ((course_id, year) for course_id in course_ids)
+
+        async for _, course in self._stream(
+                course_keys,
+                len(course_ids) if hasattr(course_ids, "__len__") else None,
+                include_exams,
+                show_progress,
+                fail_after_n_missing_courses,
+                max_in_flight,
+                state_store,
+                journal,
+        ):
+            yield course
+
+    async def scrape_years(
+            self,
+            course_ids: Iterable[int | str],
+            years: Iterable[int],
+            include_exams: bool = True,
+            show_progress: bool = False,
+            fail_after_n_missing_courses: int = 0,
+            journal: ScrapeJournal | None = None,
+    ) -> Dict[int, List[Course]]:
+        """
+        Scrapes the courses of several years with a single fetcher session and parse pool.
+        :return: year -> the courses of that year.
+        """
+        years = list(years)
+        courses = {year: [] for year in years}
+        async for year, course in self.stream_years(
+                course_ids,
+                years,
+                include_exams=include_exams,
+                show_progress=show_progress,
+                fail_after_n_missing_courses=fail_after_n_missing_courses,
+                journal=journal,
+        ):
+            courses[year].append(course)
+        return courses
+
+    async def stream_years(
+            self,
+            course_ids: Iterable[int | str],
+            years: Iterable[int],
+            include_exams: bool = True,
+            show_progress: bool = False,
+            fail_after_n_missing_courses: int = 0,
+            max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+            journal: ScrapeJournal | None = None,
+    ) -> AsyncIterator[Tuple[int, Course]]:
+        """
+        Yields (year, course) for each course of each year as soon as it is scraped. The years of a course are
+        scraped one after the other, so load is spread over the years, and a course page that is identical in
+        several years is parsed only once.
+        :param course_ids: See stream. Unlike stream, may not be an async iterable.
+        """
+        years = list(years)
+        course_keys = ((course_id, year) for course_id in course_ids for year in years)
+
+        async for (_, year), course in self._stream(
+                course_keys,
+                len(course_ids) * len(years) if hasattr(course_ids, "__len__") else None,
+                include_exams,
+                show_progress,
+                fail_after_n_missing_courses,
+                max_in_flight,
+                None,
+                journal,
+                _SharedParses(self.SHARED_PARSES, self.metrics),
+        ):
+            yield year, course
+
+    async def _stream(
+            self,
+            course_keys: Iterable[Tuple[int | str, int]] | AsyncIterable[Tuple[int | str, int]],
+            total: int | None,
+            include_exams: bool,
+            show_progress: bool,
+            fail_after_n_missing_courses: int,
+            max_in_flight: int,
+            state_store: CourseStateStore | None,
+            journal: ScrapeJournal | None,
+            shared_parses: _SharedParses | None = None,
+    ) -> AsyncIterator[Tuple[Tuple[int | str, int], Course]]:
+        """
+        Scrapes (course id, year) pairs, yielding ((course id, year), course) for each course as soon as it is
+        scraped, with the course id as given.
+        """
         failed_courses = 0
+        course_keys_aiter = (
+            course_keys.__aiter__() if isinstance(course_keys, AsyncIterable) else None
+        )
+        course_keys_iter = iter(course_keys) if course_keys_aiter is None else None
+        # The next pair of async course_keys, fetched concurrently with the pending courses
+        next_course_key = None
+        # task -> the (course id, year) it scrapes
+        pending = {}
+        # Tasks of the last wait, which are done but may not have been yielded yet
+        finished = {}
+        progress = tqdm(desc="Scraping courses", total=total, disable=not show_progress)
 
-        async with self._fetcher:
-            course_scrape_tasks = [
-                self._scrape_single_course(CourseFetchTask(course_id, year))
-                for course_id in course_ids
-            ]
+        def schedule(course_key: Tuple[int | str, int]) -> None:
+            course_id, year = course_key
+            journaled = journal.course(course_id, year) if journal is not None else None
+            if journaled is not None:
+                self.metrics.increment("resumed_courses_total")
+                scraping = _completed(journaled)
+            else:
+                scraping = self._scrape_course_with_exams(
+                    CourseFetchTask(course_id, year, self._priority), include_exams, state_store, shared_parses
+                )
+            pending[asyncio.create_task(scraping)] = course_key
 
-            await_for_courses = (
-                asyncio.as_completed
-                if not show_progress
-                else partial(tqdm.as_completed, desc="Scraping courses")
-            )
+        def schedule_more() -> None:
+            nonlocal next_course_key
+            if course_keys_iter is not None:
+                for course_key in islice(course_keys_iter, max_in_flight - len(pending)):
+                    schedule(course_key)
+            elif (
+                    course_keys_aiter is not None
+                    and next_course_key is None
+                    and len(pending) < max_in_flight
+            ):
+                next_course_key = asyncio.ensure_future(course_keys_aiter.__anext__())
 
+        async with self._fetcher:
             try:
-                for course_coro in await_for_courses(course_scrape_tasks):
-                    course = await course_coro
-                    if course is None:
-                        failed_courses += 1
-                        if (
-                                fail_after_n_missing_courses
-                                and failed_courses >= fail_after_n_missing_courses
-                        ):
-                            raise ValueError(
-                                f"Failed to fetch {failed_courses} courses"
-                            )
-                        continue
-
-                    courses.append(course)
-
-                if include_exams:
-                    exam_scrape_tasks = [
-                        self._attach_exams_to_course(course, year) for course in courses
-                    ]
-
-                    await_for_exams = (
-                        asyncio.as_completed
-                        if not show_progress
-                        else partial(tqdm.as_completed, desc="Scraping exams")
+                schedule_more()
+                while pending or next_course_key is not None:
+                    done, _ = await asyncio.wait(
+                        pending.keys() | {next_course_key} - {None},
+                        return_when=asyncio.FIRST_COMPLETED,
                     )
-                    for exams_coro in await_for_exams(exam_scrape_tasks):
-                        await exams_coro
+                    if next_course_key in done:
+                        done.discard(next_course_key)
+                        try:
+                            schedule(next_course_key.result())
+                        except StopAsyncIteration:
+                            course_keys_aiter = None
+                        next_course_key = None
+                    finished = {task: pending.pop(task) for task in done}
+                    schedule_more()
 
-            finally:
-                # Cleanup processes gracefully
-                self._pool.shutdown(wait=False)
+                    for task, (course_id, year) in finished.items():
+                        try:
+                            course = task.result()
+                        except Exception as e:
+                            # Counted as a failed course, so that one course can't end the whole stream
+                            tqdm.write(f"[WARNING] Failed to scrape course {course_id}: {e}")
+                            course = None
+                        progress.update()
+                        if course is None:
+                            self.metrics.increment("courses_failed_total")
+                            if journal is not None:
+                                journal.record_failure(course_id, year)
+                            failed_courses += 1
+                            if (
+                                    fail_after_n_missing_courses
+                                    and failed_courses >= fail_after_n_missing_courses
+                            ):
+                                raise ValueError(
+                                    f"Failed to fetch {failed_courses} courses"
+                                )
+                            continue
 
-            return courses
+                        self.metrics.increment("courses_scraped_total")
+                        if journal is not None and journal.course(course_id, year) is None:
+                            journal.record_course(course_id, year, course)
+                        yield (course_id, year), course
+            finally:
+                unfinished = list(pending)
+                if next_course_key is not None:
+                    unfinished.append(next_course_key)
+                for task in unfinished:
+                    task.cancel()
+                if shared_parses is not None:
+                    shared_parses.cancel()
+                # Also retrieves the errors of finished tasks that weren't reached
+                await asyncio.gather(*unfinished, *finished, return_exceptions=True)
+                progress.close()
+                if self._owns_parse_dispatcher and not self._in_context:
+                    # Cleanup processes gracefully
+                    self._parse_dispatcher.shutdown()
 
-    async def _scrape_single_course(
-            self, course_fetch_task: CourseFetchTask
+    async def _scrape_course_with_exams(
+            self,
+            course_fetch_task: CourseFetchTask,
+            include_exams: bool,
+            state_store: CourseStateStore | None,
+            shared_parses: _SharedParses | None = None,
     ) -> Course | None:
-        # Download course HTML
+        course_html = await self._fetch_course_html(course_fetch_task)
+        if course_html is None:
+            return None
+
+        # Fetch the exams while the course is being parsed, to keep the fetcher busy
+        exams_task = (
+            asyncio.create_task(
+                self._fetcher.fetch(
+                    ExamFetchTask(course_fetch_task.course_id, course_fetch_task.year, course_fetch_task.priority)
+                )
+            )
+            if include_exams
+            else None
+        )
         try:
-            course_html = await self._fetcher.fetch(course_fetch_task)
+            course = await self._course_from_html(
+                course_fetch_task, course_html, state_store, shared_parses
+            )
+            if course is not None and exams_task is not None:
+                course.exams = await self._exams(course_fetch_task, exams_task)
+        finally:
+            if exams_task is not None and not exams_task.done():
+                exams_task.cancel()
+                await asyncio.gather(exams_task, return_exceptions=True)
+
+        return course
+
+    async def _exams(
+            self, course_fetch_task: CourseFetchTask, exams_task: asyncio.Task
+    ) -> List[Exam] | None:
+        # Like a failed course, failed exams are skipped rather than failing the whole scrape
+        try:
+            exams_html = await exams_task
+        except Exception as e:
+            self.metrics.increment("exam_failures_total")
+            tqdm.write(f"[WARNING] Failed to fetch the exams of course {course_fetch_task.course_id}: {e}")
+            return None
+        try:
+            exams, _ = await self._parse_dispatcher.parse_exams(exams_html)
+        except Exception as e:
+            self.metrics.increment("parse_failures_total", page="exams")
+            tqdm.write(f"[WARNING] Failed to convert the exams of course {course_fetch_task.course_id}: {e}")
+            return None
+        return exams
+
+    async def _fetch_course_html(self, course_fetch_task: CourseFetchTask) -> str | None:
+        # Download course HTML, stopping early if it is missing or too large
+        try:
+            course_html, complete = await self._fetcher.fetch_until(
+                course_fetch_task,
+                _CoursePageGuard(self.MISSING_COURSE_TEXT, self.MAX_HTML_SIZE),
+            )
         except Exception:
             return None
 
         # Filter out missing or too large courses before parsing
         if not course_html or self.MISSING_COURSE_TEXT in course_html:
             return None
-        if len(course_html) > self.MAX_HTML_SIZE:
+        if not complete or len(course_html) > self.MAX_HTML_SIZE:
             tqdm.write(
                 f"[SKIP] Course {course_fetch_task.course_id} is too large "
-                f"({len(course_html) / 1024 / 1024:.2f} MB). Skipping parse."
+                f"(over {self.MAX_HTML_SIZE / 1024 / 1024:.2f} MB). Skipping parse."
             )
             return None
 
-        # Parse course HTML in separate process to avoid blocking event loop
-        try:
-            loop = asyncio.get_running_loop()
+        return course_html
 
-            # Run in process, receive (Result, Duration) tuple back
-            course, duration = await loop.run_in_executor(
-                self._pool, _cpu_bound_parse_course, self._course_parser, course_html
+    async def _course_from_html(
+            self,
+            course_fetch_task: CourseFetchTask,
+            course_html: str,
+            state_store: CourseStateStore | None,
+            shared_parses: _SharedParses | None = None,
+    ) -> Course | None:
+        if shared_parses is not None:
+            return await shared_parses.parse(
+                course_html, lambda: self._parse_course_html(course_fetch_task, course_html)
             )
+        if state_store is None:
+            return await self._parse_course_html(course_fetch_task, course_html)
+
+        content_hash = hash_html(course_html)
+        course = state_store.lookup(course_fetch_task.course_id, content_hash)
+        if course is not None:
+            self.metrics.increment("unchanged_courses_total")
+            return course
+
+        course = await self._parse_course_html(course_fetch_task, course_html)
+        if course is not None:
+            state_store.update(course_fetch_task.course_id, content_hash, course)
+        return course
+
+    async def _parse_course_html(
+            self, course_fetch_task: CourseFetchTask, course_html: str
+    ) -> Course | None:
+        # Parse course HTML off the event loop, unless it is small enough to not block it
+        try:
+            course, duration = await self._parse_dispatcher.parse_course(course_html)
 
             # Check actual CPU time, not queue wait time
             if duration > self.LONG_PARSE_THRESHOLD:
@@ -143,11 +544,139 @@ class SingleCourseScraper(ShnatonScraper):
                 )
 
         except Exception as e:
+            self.metrics.increment("parse_failures_total", page="course")
             tqdm.write(f"[WARNING] Failed to convert course {course_fetch_task.course_id}: {e}")
             return None
 
         return course
 
-    async def _attach_exams_to_course(self, course: Course, year: int) -> None:
-        exams_html = await self._fetcher.fetch(ExamFetchTask(course.course_id, year))
-        course.exams = self._exam_parser.convert(exams_html)
+
+class CourseIdScraper(ShnatonScraper):
+    """
+    Lists the ids of existing courses from the Shnaton search results, so that courses can be scraped without
+    guessing their ids.
+    """
+
+    def __init__(
+            self,
+            fetcher: Fetcher | None = None,
+            parser_engine: str = BS4_ENGINE,
+            page_window: int = 4,
+            max_cpu_workers: int | None = None,
+            parse_dispatcher: ParseDispatcher | None = None,
+            priority: Priority = Priority.NORMAL,
+    ) -> None:
+        """
+        :param page_window: Number of result pages of a faculty fetched concurrently.
+        :param max_cpu_workers: See SingleCourseScraper.
+        :param parse_dispatcher: See SingleCourseScraper. May be shared with a SingleCourseScraper.
+        :param priority: Priority of the scraper's requests in its fetcher, see SingleCourseScraper.
+        """
+        super().__init__(fetcher)
+        self._page_window = page_window
+        self._priority = priority
+        self._parse_dispatcher = parse_dispatcher or ParseDispatcher(
+            max_cpu_workers or os.cpu_count() or 1, parser_engine, metrics=self.metrics
+        )
+        # Only a dispatcher created by the scraper is shut down by it
+        self._owns_parse_dispatcher = parse_dispatcher is None
+
+    async def scrape(
+            self,
+            year: int,
+            faculties: Iterable[int | str],
+            toar: Toar = Toar.Any,
+            toar_year: ToarYear = ToarYear.Any,
+            semester: Semester | None = None,
+    ) -> List[str]:
+        """
+        :param faculties: Faculty codes, as used by the Shnaton search.
+        """
+        async with self._fetcher:
+            return [
+                course_id
+                async for course_id in self.stream(
+                    year, faculties, toar, toar_year, semester
+                )
+            ]
+
+    async def stream(
+            self,
+            year: int,
+            faculties: Iterable[int | str],
+            toar: Toar = Toar.Any,
+            toar_year: ToarYear = ToarYear.Any,
+            semester: Semester | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields every course id once, as soon as its results page is fetched. The faculties are listed
+        concurrently. Unlike scrape, doesn't close the fetcher, so that it can feed SingleCourseScraper.stream
+        with the same fetcher:
+            courses = await SingleCourseScraper(fetcher).scrape(CourseIdScraper(fetcher).stream(...), year)
+        """
+        result_pages = asyncio.Queue()
+
+        async def list_faculties() -> None:
+            try:
+                await _gather_or_cancel(
+                    self._list_faculty(result_pages, year, faculty, toar, toar_year, semester)
+                    for faculty in faculties
+                )
+            finally:
+                await result_pages.put(None)
+
+        listing = asyncio.create_task(list_faculties())
+        seen = set()
+        try:
+            while (course_ids := await result_pages.get()) is not None:
+                for course_id in course_ids:
+                    if course_id not in seen:
+                        seen.add(course_id)
+                        yield course_id
+            # Raises the errors of the listing, if there were any
+            await listing
+        finally:
+            listing.cancel()
+            await asyncio.gather(listing, return_exceptions=True)
+            if self._owns_parse_dispatcher:
+                self._parse_dispatcher.shutdown()
+
+    async def _list_faculty(
+            self,
+            result_pages: asyncio.Queue,
+            year: int,
+            faculty: int | str,
+            toar: Toar,
+            toar_year: ToarYear,
+            semester: Semester | None,
+    ) -> None:
+        seen = set()
+        first_page = 1
+        while True:
+            pages = await _gather_or_cancel(
+                self._fetch_course_ids(
+                    SearchFetchTask(year, faculty, toar, toar_year, semester, page, self._priority)
+                )
+                for page in range(first_page, first_page + self._page_window)
+            )
+
+            found_new_ids = False
+            for course_ids in pages:
+                new_ids = [course_id for course_id in course_ids if course_id not in seen]
+                if new_ids:
+                    found_new_ids = True
+                    seen.update(new_ids)
+                    await result_pages.put(new_ids)
+
+            # Stop when the results end, or when the pages only repeat results we've seen
+            if not found_new_ids or not all(pages):
+                return
+            first_page += self._page_window
+
+    async def _fetch_course_ids(self, search_fetch_task: SearchFetchTask) -> List[str]:
+        html = await self._fetcher.fetch(search_fetch_task)
+        self.metrics.increment("search_pages_total")
+        if not html or SingleCourseScraper.MISSING_COURSE_TEXT in html:
+            return []
+        course_ids, _ = await self._parse_dispatcher.parse_search_results(html)
+        return course_ids
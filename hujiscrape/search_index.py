@@ -0,0 +1,127 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from hujiscrape.huji_objects import Course
+
+LECTURER = "lecturer"
+FACULTY = "faculty"
+DEPARTMENT = "department"
+LOCATION = "location"
+LANGUAGE = "language"
+EXAM_TYPE = "exam_type"
+FIELDS = (LECTURER, FACULTY, DEPARTMENT, LOCATION, LANGUAGE, EXAM_TYPE)
+
+# Hebrew points and cantillation marks, which are dropped. Hebrew punctuation in the same block (e.g. the maqaf
+# in בית־ספר) separates words like any other punctuation.
+_HEBREW_MARKS = re.compile("[\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]")
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+# Geresh and gershayim (also typed as quotes) are part of abbreviations such as ד"ר, so they are removed rather
+# than splitting the word
+_ABBREVIATION_MARKS = re.compile("[\"'׳״`]")
+_TOKEN = re.compile(r"\w+")
+
+Term = Tuple[str, str]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    :return: the normalized words of text. Case, Hebrew points, final letter forms and abbreviation marks are
+             ignored, so 'ד"ר כֹּהֵן', 'ד״ר כהן' and 'דר כהן' are tokenized the same way.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _HEBREW_MARKS.sub("", text)
+    text = _ABBREVIATION_MARKS.sub("", text)
+    return _TOKEN.findall(text.translate(_FINAL_LETTERS))
+
+
+def _field_values(course: Course) -> Iterator[Tuple[str, str]]:
+    yield FACULTY, course.faculty
+    yield DEPARTMENT, course.department
+    yield LANGUAGE, course.language
+    yield EXAM_TYPE, course.exam_type
+    for lesson in course.schedule:
+        yield LOCATION, lesson.location
+        for lecturer in lesson.lecturers:
+            yield LECTURER, lecturer
+
+
+class CourseIndex:
+    """
+    An inverted index from the words of course fields (lecturers, faculty, department, location, language and
+    exam type) to course ids. Adding a course that is already indexed replaces it, so re-scraped courses can be
+    added as they arrive.
+    """
+
+    def __init__(self, courses: Iterable[Course] = ()) -> None:
+        self._courses: Dict[str, Course] = {}
+        self._postings: Dict[Term, Set[str]] = {}
+        # The terms of every course, to remove it without scanning the postings
+        self._course_terms: Dict[str, Set[Term]] = {}
+        for course in courses:
+            self.add(course)
+
+    def __len__(self) -> int:
+        return len(self._courses)
+
+    def __contains__(self, course_id: str) -> bool:
+        return course_id in self._courses
+
+    def get(self, course_id: str) -> Course | None:
+        return self._courses.get(course_id)
+
+    def add(self, course: Course) -> None:
+        """
+        Indexes the course, replacing a previously indexed course with the same id.
+        """
+        self.remove(course.course_id)
+
+        terms = {(field_name, token) for field_name, value in _field_values(course) for token in tokenize(value)}
+        for term in terms:
+            self._postings.setdefault(term, set()).add(course.course_id)
+        self._courses[course.course_id] = course
+        self._course_terms[course.course_id] = terms
+
+    def remove(self, course_id: str) -> None:
+        """
+        Removes the course from the index, if it is indexed.
+        """
+        self._courses.pop(course_id, None)
+        for term in self._course_terms.pop(course_id, ()):
+            course_ids = self._postings[term]
+            course_ids.discard(course_id)
+            if not course_ids:
+                del self._postings[term]
+
+    def search_ids(self, **criteria: str) -> Set[str]:
+        """
+        :param criteria: field name -> text, e.g. lecturer="cohen", language="english". Every word of every
+                         criterion must match a word of the field.
+        :return: the ids of the courses matching all the criteria.
+        """
+        unknown = set(criteria) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}, expected some of {FIELDS}")
+
+        postings = [
+            self._postings.get((field_name, token), set())
+            for field_name, text in criteria.items()
+            for token in tokenize(text)
+        ]
+        if not postings:
+            return set()
+
+        # Intersecting from the rarest term keeps the intermediate sets small
+        postings.sort(key=len)
+        result = set(postings[0])
+        for course_ids in postings[1:]:
+            if not result:
+                break
+            result &= course_ids
+        return result
+
+    def search(self, **criteria: str) -> List[Course]:
+        """
+        :return: the courses matching all the criteria (see search_ids), ordered by course id.
+        """
+        return [self._courses[course_id] for course_id in sorted(self.search_ids(**criteria))]
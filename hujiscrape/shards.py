@@ -0,0 +1,471 @@
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Set, Tuple
+
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.html_to_object import BS4_ENGINE
+from hujiscrape.huji_objects import Course
+from hujiscrape.scrapers import DEFAULT_MAX_IN_FLIGHT, SingleCourseScraper
+
+DEFAULT_SHARD_SIZE = 100
+DEFAULT_LEASE_SECONDS = 120.0
+
+
+@dataclass(frozen=True)
+class Shard:
+    shard_id: int
+    year: int
+    course_ids: List[str]
+
+
+class ShardQueue:
+    """
+    Holds shards of course ids to be scraped by ShardWorkers, and the courses they scraped. A worker leases a
+    shard while scraping it, and a shard whose lease expired (because its worker died) is leased again by
+    another worker.
+    """
+
+    def __init__(self, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> None:
+        """
+        :param lease_seconds: How long a worker may go without renewing its lease before its shard is given to
+                              another worker, and before it is no longer counted as live.
+        """
+        self.lease_seconds = lease_seconds
+
+    def add_shards(self, year: int, course_ids: Iterable[int | str], shard_size: int = DEFAULT_SHARD_SIZE) -> int:
+        """
+        :return: the number of shards added.
+        """
+        raise NotImplementedError()
+
+    def shard_count(self, year: int) -> int:
+        raise NotImplementedError()
+
+    def lease(self, worker_id: str) -> Shard | None:
+        """
+        :return: a shard that is not done nor leased by a live worker, or None if there is none right now.
+        """
+        raise NotImplementedError()
+
+    def renew(self, shard: Shard, worker_id: str) -> None:
+        raise NotImplementedError()
+
+    def release(self, shard: Shard) -> None:
+        """
+        Gives up the lease of a shard that wasn't completed, so that it is leased again right away.
+        """
+        raise NotImplementedError()
+
+    def complete(self, shard: Shard, courses: List[Course], failed_course_ids: Set[str]) -> None:
+        """
+        Stores the courses of a shard. Completing a shard more than once keeps the first results.
+        """
+        raise NotImplementedError()
+
+    def is_done(self) -> bool:
+        """
+        :return: True if all the shards were completed.
+        """
+        raise NotImplementedError()
+
+    def heartbeat(self, worker_id: str) -> None:
+        raise NotImplementedError()
+
+    def leave(self, worker_id: str) -> None:
+        raise NotImplementedError()
+
+    def live_workers(self) -> int:
+        """
+        :return: the number of workers that sent a heartbeat within lease_seconds.
+        """
+        raise NotImplementedError()
+
+    def courses(self, year: int | None = None) -> Iterator[Course]:
+        raise NotImplementedError()
+
+    def failed_course_ids(self, year: int | None = None) -> Set[Tuple[str, int]]:
+        """
+        :return: (course id, year) of the courses that completed shards failed to scrape.
+        """
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'ShardQueue':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class SqliteShardQueue(ShardQueue):
+    """
+    Keeps the queue in a SQLite database, which processes on the same machine (or sharing its file system)
+    open by path.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> None:
+        super().__init__(lease_seconds)
+        self.path = path
+        # Workers wait for each other's transactions rather than failing on a locked database. ShardWorker calls
+        # the queue from a thread of its own, one call at a time.
+        self._db = sqlite3.connect(path, isolation_level=None, timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS shards (
+                shard_id INTEGER PRIMARY KEY,
+                year INTEGER NOT NULL,
+                course_ids TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS courses (
+                shard_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                course TEXT NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS failures (
+                shard_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                course_id TEXT NOT NULL
+            )
+            """
+        )
+
+    def _transaction(self):
+        # Takes the write lock up front, so that two workers can't lease the same shard
+        self._db.execute("BEGIN IMMEDIATE")
+        return self._db
+
+    def add_shards(self, year: int, course_ids: Iterable[int | str], shard_size: int = DEFAULT_SHARD_SIZE) -> int:
+        course_ids = iter(course_ids)
+        shards = 0
+        with self._transaction():
+            while shard := [str(course_id) for course_id in islice(course_ids, shard_size)]:
+                self._db.execute(
+                    "INSERT INTO shards (year, course_ids) VALUES (?, ?)", (year, json.dumps(shard))
+                )
+                shards += 1
+        return shards
+
+    def shard_count(self, year: int) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM shards WHERE year = ?", (year,)).fetchone()[0]
+
+    def lease(self, worker_id: str) -> Shard | None:
+        now = time.time()
+        with self._transaction():
+            row = self._db.execute(
+                "SELECT shard_id, year, course_ids FROM shards WHERE NOT done AND lease_expires < ? "
+                "ORDER BY shard_id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            shard_id, year, course_ids = row
+            self._db.execute(
+                "UPDATE shards SET worker_id = ?, lease_expires = ? WHERE shard_id = ?",
+                (worker_id, now + self.lease_seconds, shard_id),
+            )
+        return Shard(shard_id, year, json.loads(course_ids))
+
+    def renew(self, shard: Shard, worker_id: str) -> None:
+        self._db.execute(
+            "UPDATE shards SET lease_expires = ? WHERE shard_id = ? AND worker_id = ?",
+            (time.time() + self.lease_seconds, shard.shard_id, worker_id),
+        )
+        self.heartbeat(worker_id)
+
+    def release(self, shard: Shard) -> None:
+        self._db.execute("UPDATE shards SET lease_expires = 0 WHERE shard_id = ?", (shard.shard_id,))
+
+    def complete(self, shard: Shard, courses: List[Course], failed_course_ids: Set[str]) -> None:
+        with self._transaction():
+            (done,) = self._db.execute(
+                "SELECT done FROM shards WHERE shard_id = ?", (shard.shard_id,)
+            ).fetchone()
+            if done:
+                return
+            self._db.executemany(
+                "INSERT INTO courses VALUES (?, ?, ?)",
+                (
+                    (shard.shard_id, shard.year, json.dumps(course.to_dict(), ensure_ascii=False))
+                    for course in courses
+                ),
+            )
+            self._db.executemany(
+                "INSERT INTO failures VALUES (?, ?, ?)",
+                ((shard.shard_id, shard.year, course_id) for course_id in failed_course_ids),
+            )
+            self._db.execute("UPDATE shards SET done = 1 WHERE shard_id = ?", (shard.shard_id,))
+
+    def is_done(self) -> bool:
+        return self._db.execute("SELECT COUNT(*) FROM shards WHERE NOT done").fetchone()[0] == 0
+
+    def heartbeat(self, worker_id: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO workers VALUES (?, ?)", (worker_id, time.time()))
+
+    def leave(self, worker_id: str) -> None:
+        self._db.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self) -> int:
+        return self._db.execute(
+            "SELECT COUNT(*) FROM workers WHERE seen_at > ?", (time.time() - self.lease_seconds,)
+        ).fetchone()[0]
+
+    def courses(self, year: int | None = None) -> Iterator[Course]:
+        rows = (
+            self._db.execute("SELECT course FROM courses ORDER BY shard_id")
+            if year is None
+            else self._db.execute("SELECT course FROM courses WHERE year = ? ORDER BY shard_id", (year,))
+        )
+        for (course,) in rows:
+            yield Course.from_dict(json.loads(course))
+
+    def failed_course_ids(self, year: int | None = None) -> Set[Tuple[str, int]]:
+        rows = (
+            self._db.execute("SELECT course_id, year FROM failures")
+            if year is None
+            else self._db.execute("SELECT course_id, year FROM failures WHERE year = ?", (year,))
+        )
+        return set(rows)
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class ShardWorker:
+    """
+    Scrapes shards from a ShardQueue until all of them are done, with a Fetcher of its own. Workers may run in
+    separate processes, or on separate machines given a queue they all reach.
+    """
+    # Seconds between checks for shards, while the remaining ones are leased by other workers
+    POLL_INTERVAL = 1.0
+
+    def __init__(
+            self,
+            queue: ShardQueue,
+            worker_id: str | None = None,
+            requests_per_second: float | None = None,
+            min_workers: int = 1,
+            include_exams: bool = True,
+            max_cpu_workers: int | None = None,
+            parser_engine: str = BS4_ENGINE,
+            heartbeat_interval: float = 10.0,
+            fetcher_kwargs: dict | None = None,
+    ) -> None:
+        """
+        :param requests_per_second: The rate budget shared by all the workers. Each worker takes an equal share
+                                    of it, adjusted as workers join and leave. If None, the rate is not limited.
+        :param min_workers: The budget is split between at least this many workers, so that workers starting
+                            together don't each take the whole budget before seeing each other.
+        :param heartbeat_interval: Seconds between renewals of the worker's lease. Must be well below the
+                                   queue's lease_seconds.
+        :param fetcher_kwargs: Arguments of the worker's Fetchers, other than requests_per_second.
+        """
+        if fetcher_kwargs and "requests_per_second" in fetcher_kwargs:
+            raise ValueError("Pass requests_per_second to the worker rather than in fetcher_kwargs")
+        self._queue = queue
+        self.worker_id = worker_id or uuid.uuid4().hex
+        self._requests_per_second = requests_per_second
+        self._min_workers = min_workers
+        self._include_exams = include_exams
+        self._max_cpu_workers = max_cpu_workers
+        self._parser_engine = parser_engine
+        self._heartbeat_interval = heartbeat_interval
+        self._fetcher_kwargs = fetcher_kwargs or {}
+        # Runs the calls to the queue while the worker runs
+        self._queue_thread: ThreadPoolExecutor | None = None
+
+    async def _call_queue(self, method: Callable, *args):
+        # Queue calls may wait for the transactions of other workers, so they run off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            self._queue_thread, functools.partial(method, *args)
+        )
+
+    async def _rate_share(self) -> float | None:
+        if self._requests_per_second is None:
+            return None
+        live_workers = await self._call_queue(self._queue.live_workers)
+        return self._requests_per_second / max(live_workers, self._min_workers, 1)
+
+    async def run(self) -> int:
+        """
+        :return: the number of shards the worker completed.
+        """
+        completed = 0
+        self._queue_thread = ThreadPoolExecutor(max_workers=1)
+        try:
+            await self._call_queue(self._queue.heartbeat, self.worker_id)
+            fetcher = Fetcher(requests_per_second=await self._rate_share(), **self._fetcher_kwargs)
+            # The session and parse processes are kept between shards
+            scraper = SingleCourseScraper(fetcher, self._max_cpu_workers, self._parser_engine)
+            async with scraper:
+                while True:
+                    shard = await self._call_queue(self._queue.lease, self.worker_id)
+                    if shard is not None:
+                        await self._scrape_shard(shard, scraper, fetcher)
+                        completed += 1
+                    elif await self._call_queue(self._queue.is_done):
+                        return completed
+                    else:
+                        # The remaining shards are leased by other workers, and come back if their workers die
+                        await asyncio.sleep(min(self.POLL_INTERVAL, self._heartbeat_interval))
+                        await self._call_queue(self._queue.heartbeat, self.worker_id)
+        finally:
+            try:
+                await self._call_queue(self._queue.leave, self.worker_id)
+            finally:
+                self._queue_thread.shutdown(wait=False)
+
+    async def _scrape_shard(self, shard: Shard, scraper: SingleCourseScraper, fetcher: Fetcher) -> None:
+        fetcher.requests_per_second = await self._rate_share()
+        keeping_alive = asyncio.create_task(self._keep_alive(shard, fetcher))
+        courses = []
+        # Ids as requested, since the ids of the parsed courses may be formatted differently
+        scraped_course_ids = set()
+        try:
+            async for (course_id, _), course in scraper._stream(
+                    ((course_id, shard.year) for course_id in shard.course_ids),
+                    total=len(shard.course_ids),
+                    include_exams=self._include_exams,
+                    show_progress=False,
+                    fail_after_n_missing_courses=0,
+                    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                    state_store=None,
+                    journal=None,
+            ):
+                courses.append(course)
+                scraped_course_ids.add(course_id)
+        except BaseException:
+            await asyncio.shield(self._call_queue(self._queue.release, shard))
+            raise
+        finally:
+            keeping_alive.cancel()
+            await asyncio.gather(keeping_alive, return_exceptions=True)
+
+        await self._call_queue(
+            self._queue.complete,
+            shard,
+            courses,
+            {course_id for course_id in shard.course_ids if course_id not in scraped_course_ids},
+        )
+
+    async def _keep_alive(self, shard: Shard, fetcher: Fetcher) -> None:
+        while True:
+            await asyncio.sleep(self._heartbeat_interval)
+            await self._call_queue(self._queue.renew, shard, self.worker_id)
+            fetcher.requests_per_second = await self._rate_share()
+
+
+def _run_worker(queue_path: str, lease_seconds: float, worker_kwargs: dict) -> None:
+    with SqliteShardQueue(queue_path, lease_seconds) as queue:
+        asyncio.run(ShardWorker(queue, **worker_kwargs).run())
+
+
+class ShardedCourseScraper:
+    """
+    Splits the course ids into shards in a SqliteShardQueue, and scrapes them with ShardWorker processes.
+    Workers on other machines may join by running a ShardWorker on the same queue.
+    """
+
+    def __init__(
+            self,
+            queue_path: str,
+            workers: int | None = None,
+            shard_size: int = DEFAULT_SHARD_SIZE,
+            requests_per_second: float | None = None,
+            max_cpu_workers_per_worker: int = 1,
+            parser_engine: str = BS4_ENGINE,
+            lease_seconds: float = DEFAULT_LEASE_SECONDS,
+            fetcher_kwargs: dict | None = None,
+    ) -> None:
+        """
+        :param queue_path: The queue's database. If a scrape is interrupted, running it again with the same path
+                           resumes it.
+        :param workers: Number of worker processes. If None, uses os.cpu_count().
+        :param requests_per_second: The rate budget of all the workers together, see ShardWorker.
+        :param fetcher_kwargs: Arguments of the workers' Fetchers, other than requests_per_second. Must be
+                               picklable.
+        """
+        if fetcher_kwargs and "requests_per_second" in fetcher_kwargs:
+            raise ValueError("Pass requests_per_second to the scraper rather than in fetcher_kwargs")
+        self._queue_path = queue_path
+        self._workers = workers or os.cpu_count() or 1
+        self._shard_size = shard_size
+        self._requests_per_second = requests_per_second
+        self._max_cpu_workers_per_worker = max_cpu_workers_per_worker
+        self._parser_engine = parser_engine
+        self._lease_seconds = lease_seconds
+        self._fetcher_kwargs = fetcher_kwargs
+
+    async def scrape(
+            self,
+            course_ids: Iterable[int | str],
+            year: int,
+            include_exams: bool = True,
+    ) -> List[Course]:
+        # Queue calls may wait for the transactions of workers of other scrapes, so they run off the event loop
+        await asyncio.to_thread(self._add_shards, course_ids, year)
+
+        worker_kwargs = dict(
+            requests_per_second=self._requests_per_second,
+            min_workers=self._workers,
+            include_exams=include_exams,
+            max_cpu_workers=self._max_cpu_workers_per_worker,
+            parser_engine=self._parser_engine,
+            heartbeat_interval=self._lease_seconds / 6,
+            fetcher_kwargs=self._fetcher_kwargs,
+        )
+        # Forking a process with a running event loop and executor threads isn't safe
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=_run_worker, args=(self._queue_path, self._lease_seconds, worker_kwargs))
+            for _ in range(self._workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                await asyncio.to_thread(process.join)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        return await asyncio.to_thread(self._courses, year, [process.exitcode for process in processes])
+
+    def _add_shards(self, course_ids: Iterable[int | str], year: int) -> None:
+        with SqliteShardQueue(self._queue_path, self._lease_seconds) as queue:
+            # Shards from an interrupted run of the same year are resumed rather than added again
+            if not queue.shard_count(year):
+                queue.add_shards(year, course_ids, self._shard_size)
+
+    def _courses(self, year: int, exit_codes: List[int]) -> List[Course]:
+        with SqliteShardQueue(self._queue_path, self._lease_seconds) as queue:
+            if not queue.is_done():
+                raise RuntimeError(f"Workers exited with codes {exit_codes} before all shards were scraped")
+            return list(queue.courses(year))
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+from dataclasses import replace
+from typing import Dict, Set, TextIO, Tuple
+
+from hujiscrape.huji_objects import Course
+
+def hash_html(html: str) -> str:
+    """
+    :return: a hash of the exact html. Whitespace is not ignored, since the parsed courses keep it.
+    """
+    return hashlib.blake2b(html.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CourseStateStore:
+    """
+    Remembers the content hash of every course page and the course parsed from it, so that a later scrape can
+    skip parsing pages that haven't changed. Courses are kept by id only, so use a store per year.
+    """
+
+    def __init__(self, states: Dict[str, Tuple[str, Course]] | None = None) -> None:
+        """
+        :param states: course id -> (content hash, course)
+        """
+        self._states = states or {}
+        # Courses whose page was new or changed, or unchanged, since the store was loaded
+        self.changed_course_ids: Set[str] = set()
+        self.unchanged_course_ids: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def lookup(self, course_id: str, content_hash: str) -> Course | None:
+        """
+        :return: a copy of the previously parsed course if its page had the same hash, otherwise None.
+        """
+        state = self._states.get(course_id)
+        if state is None or state[0] != content_hash:
+            return None
+
+        self.unchanged_course_ids.add(course_id)
+        return self._copy(state[1])
+
+    def update(self, course_id: str, content_hash: str, course: Course) -> None:
+        """
+        Keeps a copy of the course, without its exams, so that changes to the course don't reach the store.
+        """
+        self._states[course_id] = (content_hash, self._copy(course))
+        self.changed_course_ids.add(course_id)
+
+    @staticmethod
+    def _copy(course: Course) -> Course:
+        # Lessons are immutable, so a copy of the schedule list is enough
+        return replace(course, schedule=list(course.schedule), exams=None)
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    course_id: {"hash": content_hash, "course": course.to_dict()}
+                    for course_id, (content_hash, course) in self._states.items()
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> 'CourseStateStore':
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            {
+                course_id: (state["hash"], Course.from_dict(state["course"]))
+                for course_id, state in data.items()
+            }
+        )
+
+
+class ScrapeJournal:
+    """
+    Appends every scraped course and failed course id to a JSON Lines file as soon as it completes, so that an
+    interrupted scrape can be resumed without scraping the completed courses again. Courses are kept by
+    (course id, year), so one journal may be used for several years.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: The journal file. If it exists, the courses it records are loaded and new records are
+                     appended to it.
+        """
+        self._courses: Dict[Tuple[str, int], Course] = {}
+        self.failed_course_ids: Set[Tuple[str, int]] = set()
+        self._file: TextIO | None = None
+
+        needs_newline = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    self._load_record(line)
+                    needs_newline = not line.endswith("\n")
+
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            # Keeps the next record off a line torn by a crash
+            self._file.write("\n")
+
+    def _load_record(self, line: str) -> None:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # A line torn by a crash in the middle of writing it
+            return
+
+        key = (record["course_id"], record["year"])
+        if record.get("failed"):
+            self.failed_course_ids.add(key)
+        else:
+            self._courses[key] = Course.from_dict(record["course"])
+            self.failed_course_ids.discard(key)
+
+    def __len__(self) -> int:
+        return len(self._courses)
+
+    def course(self, course_id: int | str, year: int) -> Course | None:
+        """
+        :return: the recorded course, or None if it was not scraped yet.
+        """
+        return self._courses.get((str(course_id), year))
+
+    def record_course(self, course_id: int | str, year: int, course: Course) -> None:
+        key = (str(course_id), year)
+        self._courses[key] = course
+        self.failed_course_ids.discard(key)
+        self._write({"course_id": key[0], "year": year, "course": course.to_dict()})
+
+    def record_failure(self, course_id: int | str, year: int) -> None:
+        key = (str(course_id), year)
+        self.failed_course_ids.add(key)
+        self._write({"course_id": key[0], "year": year, "failed": True})
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Each record reaches the OS right away, so killing the process doesn't lose it
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None and not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self) -> 'ScrapeJournal':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
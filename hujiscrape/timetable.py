@@ -0,0 +1,128 @@
+"""
+Vectorized queries over the lessons of many courses, such as which courses conflict with a given schedule.
+Requires the optional numpy package ('pip install hujiscrape[export]').
+"""
+from typing import Dict, Iterable, List, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+from hujiscrape.exporters import day_code, semester_code
+from hujiscrape.huji_objects import Course
+from hujiscrape.magics import Day, Semester
+
+# Semesters as bit masks, so that overlapping semesters share a bit (a yearly course takes place in A and B)
+_SEMESTER_A = 1
+_SEMESTER_B = 2
+_SEMESTER_SUMMER = 4
+SEMESTER_MASKS = {
+    Semester.A: _SEMESTER_A,
+    Semester.B: _SEMESTER_B,
+    Semester.AB: _SEMESTER_A | _SEMESTER_B,
+    Semester.Summer: _SEMESTER_SUMMER,
+    Semester.Yearly: _SEMESTER_A | _SEMESTER_B,
+}
+
+# (semester, day, start minute, end minute)
+TimeSlot = Tuple[Semester, Day | int, int, int]
+
+
+class TimetableIndex:
+    """
+    Keeps the lessons of courses as arrays of (semester, day, start minute, end minute, course) to answer
+    interval queries over the whole catalog at once. Lessons without a known semester, day or time are not
+    indexed.
+    """
+
+    def __init__(self, courses: Iterable[Course]) -> None:
+        if np is None:
+            raise ImportError("TimetableIndex requires numpy, install it with 'pip install hujiscrape[export]'")
+
+        self.course_ids: List[str] = []
+        self._course_indices: Dict[str, int] = {}
+        semesters, days, starts, ends, course_indices = [], [], [], [], []
+        self._lecturers: List[Tuple[str, ...]] = []
+
+        for course in courses:
+            course_index = self._course_indices.setdefault(course.course_id, len(self.course_ids))
+            if course_index == len(self.course_ids):
+                self.course_ids.append(course.course_id)
+
+            for lesson in course.schedule:
+                semester_mask = SEMESTER_MASKS.get(semester_code(lesson.semester), 0)
+                day = day_code(lesson.day)
+                start, end = lesson.start_minute, lesson.end_minute
+                if not semester_mask or day == -1 or start == -1 or end == -1:
+                    continue
+
+                semesters.append(semester_mask)
+                days.append(day)
+                starts.append(start)
+                ends.append(end)
+                course_indices.append(course_index)
+                self._lecturers.append(lesson.lecturers)
+
+        self.semesters = np.array(semesters, dtype=np.uint8)
+        self.days = np.array(days, dtype=np.int8)
+        self.starts = np.array(starts, dtype=np.int16)
+        self.ends = np.array(ends, dtype=np.int16)
+        self.courses = np.array(course_indices, dtype=np.int32)
+
+    def __len__(self) -> int:
+        """
+        :return: the number of indexed lessons.
+        """
+        return len(self.courses)
+
+    def _course_set(self, course_indices: 'np.ndarray') -> Set[str]:
+        return {self.course_ids[index] for index in np.unique(course_indices)}
+
+    def conflicts_with(self, course_ids: Iterable[str]) -> Set[str]:
+        """
+        :return: the other courses that have a lesson overlapping a lesson of the given courses.
+        """
+        chosen = [self._course_indices[course_id] for course_id in course_ids if course_id in self._course_indices]
+        chosen_lessons = np.flatnonzero(np.isin(self.courses, chosen))
+
+        conflicting = np.zeros(len(self), dtype=bool)
+        # A schedule has few lessons, so each of them is compared against the whole catalog at once
+        for lesson in chosen_lessons:
+            conflicting |= (
+                ((self.semesters & self.semesters[lesson]) != 0)
+                & (self.days == self.days[lesson])
+                & (self.starts < self.ends[lesson])
+                & (self.ends > self.starts[lesson])
+            )
+        conflicting &= ~np.isin(self.courses, chosen)
+        return self._course_set(self.courses[conflicting])
+
+    def fitting_in(self, free_slots: Iterable[TimeSlot]) -> Set[str]:
+        """
+        :return: the courses whose lessons all fall within the free slots. Courses without indexed lessons
+                 are not returned.
+        """
+        # The semesters in which each lesson is covered by a free slot
+        covered = np.zeros(len(self), dtype=np.uint8)
+        for semester, day, start, end in free_slots:
+            inside = (self.days == int(day)) & (self.starts >= start) & (self.ends <= end)
+            covered |= np.where(inside, np.uint8(SEMESTER_MASKS[Semester(semester)]), np.uint8(0))
+
+        lesson_fits = (covered & self.semesters) == self.semesters
+        not_fitting = np.unique(self.courses[~lesson_fits])
+        fitting = np.setdiff1d(np.unique(self.courses), not_fitting)
+        return {self.course_ids[index] for index in fitting}
+
+    def teaching_at(self, semester: Semester, day: Day | int, minute: int) -> List[Tuple[str, Tuple[str, ...]]]:
+        """
+        :param minute: minutes since midnight.
+        :return: (course id, lecturers) of every lesson taking place at the given time.
+        """
+        lessons = np.flatnonzero(
+            ((self.semesters & SEMESTER_MASKS[Semester(semester)]) != 0)
+            & (self.days == int(day))
+            & (self.starts <= minute)
+            & (self.ends > minute)
+        )
+        return [(self.course_ids[self.courses[lesson]], self._lecturers[lesson]) for lesson in lessons]
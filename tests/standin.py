@@ -0,0 +1,134 @@
+"""
+A local stand-in for the Shnaton server, for testing and benchmarking the fetcher and the scrapers without sending
+requests to the real Shnaton.
+
+It replays recorded course and exam pages, or the pages of tests/data with the course id replaced if none were
+recorded, with configurable latency, server errors, connection resets and slow bodies.
+"""
+import asyncio
+import random
+from dataclasses import dataclass
+from pathlib import Path
+
+from aiohttp import web
+
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.scrapers import SingleCourseScraper
+
+TEST_DATA_DIR = Path(__file__).parent / "data"
+# The course id of the course page in tests/data
+TEMPLATE_COURSE_ID = "67101"
+SLOW_BODY_CHUNK_SIZE = 4096
+
+
+@dataclass
+class StandInConfig:
+    latency: float = 0.05  # seconds before responding
+    latency_jitter: float = 0.02  # latency varies uniformly by up to this many seconds
+    error_rate: float = 0.0  # responses that are a 500 error
+    reset_rate: float = 0.0  # connections closed without a response
+    slow_body_rate: float = 0.0  # responses whose body is sent in chunks
+    slow_body_delay: float = 0.05  # seconds between the chunks of a slow body
+    missing_rate: float = 0.0  # course ids answered with the missing course page
+
+
+class ShnatonStandIn:
+    """
+    Serves course and exam pages like the Shnaton, at its url once started. Fetchers send their requests to it
+    when given the url, as in stand_in.fetcher().
+    """
+
+    def __init__(
+            self,
+            config: StandInConfig | None = None,
+            pages_dir: str | None = None,
+            port: int = 0,
+            seed: int | None = None,
+    ) -> None:
+        """
+        :param pages_dir: Recorded pages, named course_<id>.html and exams_<id>.html.
+        :param port: 0 picks a free port.
+        """
+        self.config = config or StandInConfig()
+        self._pages_dir = Path(pages_dir) if pages_dir else None
+        self._port = port
+        self._random = random.Random(seed)
+        self._course_template = (TEST_DATA_DIR / "course.html").read_text(encoding="utf-8")
+        self._exams_template = (TEST_DATA_DIR / "exams.html").read_text(encoding="utf-8")
+        self._runner: web.AppRunner | None = None
+        self.url: str | None = None
+        self.requests = 0
+
+    def _page(self, kind: str, course_id: str) -> str:
+        if self._pages_dir is not None:
+            path = self._pages_dir / f"{kind}_{course_id}.html"
+            if path.exists():
+                return path.read_text(encoding="utf-8")
+        if kind == "exams":
+            return self._exams_template
+        # The same ids are missing on every request
+        if random.Random(course_id).random() < self.config.missing_rate:
+            return f"<html><body>{SingleCourseScraper.MISSING_COURSE_TEXT}</body></html>"
+        return self._course_template.replace(TEMPLATE_COURSE_ID, course_id)
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        data = await request.post()
+        config = self.config
+        await asyncio.sleep(max(0.0, config.latency + self._random.uniform(-1, 1) * config.latency_jitter))
+
+        if self._random.random() < config.reset_rate:
+            request.transport.close()
+            return web.Response()
+        if self._random.random() < config.error_rate:
+            return web.Response(status=500, text="Internal Server Error")
+
+        kind = "exams" if data.get("detail") == "examDates" else "course"
+        body = self._page(kind, str(data.get("course", ""))).encode("utf-8")
+        if self._random.random() >= config.slow_body_rate:
+            return web.Response(body=body, content_type="text/html", charset="utf-8")
+
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        try:
+            for start in range(0, len(body), SLOW_BODY_CHUNK_SIZE):
+                await response.write(body[start:start + SLOW_BODY_CHUNK_SIZE])
+                await asyncio.sleep(config.slow_body_delay)
+            await response.write_eof()
+        except ConnectionResetError:
+            # The client stopped reading, e.g. once it saw that the course is missing
+            pass
+        return response
+
+    async def start(self) -> str:
+        """
+        :return: the URL the stand-in serves at.
+        """
+        app = web.Application()
+        app.router.add_route("*", "/", self._handle)
+        app.router.add_route("*", "/index.php", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self._port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/index.php"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def fetcher(self, **kwargs) -> Fetcher:
+        """
+        :return: a fetcher that sends its Shnaton requests to the stand-in.
+        """
+        return Fetcher(shnaton_url=self.url, **kwargs)
+
+    async def __aenter__(self) -> 'ShnatonStandIn':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.stop()
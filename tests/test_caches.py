@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from hujiscrape.caches import CachedResponse, SqliteResponseCache
+from hujiscrape.fetch_tasks import CourseFetchTask, ExamFetchTask, FetchTask
+from hujiscrape.fetchers import Fetcher
+from tests.local_server import serve
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+class VersionedPage:
+    """
+    Serves a page with validators, answering 304 to requests that have its ETag. Records the request headers.
+    """
+
+    def __init__(self) -> None:
+        self.requests = []
+
+    async def __call__(self, request: web.Request) -> web.Response:
+        self.requests.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == ETAG:
+            return web.Response(status=304)
+        return web.Response(
+            text="קורס", content_type="text/html", headers={"ETag": ETAG, "Last-Modified": LAST_MODIFIED}
+        )
+
+
+def test_tasks_with_equal_requests_share_an_entry(tmp_path):
+    with SqliteResponseCache(str(tmp_path / "cache.db")) as cache:
+        cache.set(CourseFetchTask(67101, 2025), CachedResponse("קורס", time.time(), etag='"1"'))
+
+        cached = cache.get(CourseFetchTask("67101", 2025))
+        assert cached.body == "קורס"
+        assert cached.etag == '"1"'
+        assert cache.get(ExamFetchTask(67101, 2025)) is None
+
+
+def test_ttl_by_task_type(tmp_path):
+    with SqliteResponseCache(str(tmp_path / "cache.db"), default_ttl=100, ttls={ExamFetchTask: 0}) as cache:
+        response = CachedResponse("", time.time())
+        assert cache.is_fresh(CourseFetchTask(1, 2025), response)
+        assert not cache.is_fresh(ExamFetchTask(1, 2025), response)
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    with SqliteResponseCache(str(tmp_path / "cache.db"), max_entries=2) as cache:
+        for course_id in range(3):
+            cache.set(CourseFetchTask(course_id, 2025), CachedResponse(str(course_id), time.time()))
+        cache.get(CourseFetchTask(0, 2025))
+        cache.evict()
+
+        assert cache.get(CourseFetchTask(0, 2025)) is not None
+        assert cache.get(CourseFetchTask(1, 2025)) is None
+        assert cache.get(CourseFetchTask(2, 2025)) is not None
+
+
+def test_fetcher_serves_fresh_entries_without_a_request(tmp_path):
+    async def main():
+        page = VersionedPage()
+        with SqliteResponseCache(str(tmp_path / "cache.db"), default_ttl=100) as cache:
+            async with serve(page) as url, Fetcher(cache=cache) as fetcher:
+                task = FetchTask(url, "GET")
+                assert await fetcher.fetch(task) == "קורס"
+                assert await fetcher.fetch(task) == "קורס"
+                assert len(page.requests) == 1
+                assert fetcher.metrics.counter("cache_hits_total") == 1
+
+    asyncio.run(main())
+
+
+def test_fetcher_revalidates_stale_entries(tmp_path):
+    async def main():
+        page = VersionedPage()
+        with SqliteResponseCache(str(tmp_path / "cache.db"), default_ttl=0) as cache:
+            async with serve(page) as url, Fetcher(cache=cache) as fetcher:
+                task = FetchTask(url, "GET")
+                assert await fetcher.fetch(task) == "קורס"
+                assert "If-None-Match" not in page.requests[0]
+
+                # The server answers 304 with no body, and the cached body is used
+                assert await fetcher.fetch(task) == "קורס"
+                assert page.requests[1]["If-None-Match"] == ETAG
+                assert page.requests[1]["If-Modified-Since"] == LAST_MODIFIED
+                assert fetcher.metrics.counter("cache_revalidations_total") == 1
+                assert fetcher.metrics.counter("cache_hits_total") == 0
+
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+import datetime
+from pathlib import Path
+
+import pytest
+
+from hujiscrape.exporters import CatalogTables
+from hujiscrape.html_to_object import HtmlToCourse, HtmlToExams
+from hujiscrape.magics import Day, Semester
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def course():
+    course = HtmlToCourse().convert((DATA_DIR / "course.html").read_text(encoding="utf-8"))
+    course.exams = HtmlToExams().convert((DATA_DIR / "exams.html").read_text(encoding="utf-8"))
+    return course
+
+
+def test_lessons_are_normalized_to_numbers(course):
+    tables = CatalogTables.from_courses([course]).tables
+
+    lessons = tables["lessons"]
+    assert lessons["day"][:3] == [Day.Monday, Day.Wednesday, Day.Thursday]
+    assert lessons["start_minute"][0] == 11 * 60
+    assert lessons["end_minute"][0] == 12 * 60 + 45
+    assert lessons["semester_code"][0] == Semester.A
+    # A lesson without a day or time
+    assert lessons["day"][3] == -1
+    assert lessons["start_minute"][3] == -1
+
+    assert tables["exams"]["date"][0] == datetime.date(2026, 2, 1)
+
+
+def test_lecturers_are_shared_between_lessons(course):
+    tables = CatalogTables.from_courses([course, course]).tables
+
+    assert len(tables["lecturers"]["name"]) == 7
+    assert len(tables["lesson_lecturers"]["lesson_id"]) == 2 * sum(len(lesson.lecturers) for lesson in course.schedule)
+
+
+def test_arrow_tables_have_the_schema_types(course):
+    pa = pytest.importorskip("pyarrow")
+    arrow_tables = CatalogTables.from_courses([course]).to_arrow()
+
+    assert arrow_tables["lessons"].schema.field("day").type == pa.int8()
+    assert arrow_tables["exams"].schema.field("date").type == pa.date32()
+    assert arrow_tables["lessons"].num_rows == len(course.schedule)
@@ -0,0 +1,207 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from hujiscrape.fetch_tasks import CourseFetchTask, FetchTask, Priority
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.metrics import Metrics
+from hujiscrape.retries import RetryPolicy
+from hujiscrape.scrapers import SingleCourseScraper, _CoursePageGuard
+from tests.local_server import serve
+
+MISSING_TEXT = SingleCourseScraper.MISSING_COURSE_TEXT
+
+
+class CountingFetcher(Fetcher):
+    def __init__(self, response, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self._response = response
+
+    async def _fetch(self, task, should_stop=None, in_flight=None):
+        self.requests += 1
+        await asyncio.sleep(0.01)
+        if isinstance(self._response, Exception):
+            raise self._response
+        return self._response, True
+
+
+class ChunkedResponse:
+    """
+    The parts of aiohttp.ClientResponse read by Fetcher._read_until, with the body sent in the given chunks.
+    """
+
+    def __init__(self, chunks, charset=None):
+        self._chunks = chunks
+        self.charset = charset
+        self.content = self
+        self.closed = False
+
+    async def iter_chunked(self, size):
+        for chunk in self._chunks:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def _split(body: bytes, chunk_size: int) -> list:
+    return [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)]
+
+
+def test_concurrent_equal_fetches_share_a_request():
+    async def main():
+        async with CountingFetcher("page") as fetcher:
+            pages = await asyncio.gather(
+                *(fetcher.fetch(CourseFetchTask(67101, 2026)) for _ in range(5)),
+                fetcher.fetch(CourseFetchTask(67102, 2026)),
+            )
+            assert pages == ["page"] * 6
+            assert fetcher.requests == 2
+            assert fetcher.metrics.counter("coalesced_fetches_total") == 4
+
+            # Done requests are not shared
+            await fetcher.fetch(CourseFetchTask(67101, 2026))
+            assert fetcher.requests == 3
+
+    asyncio.run(main())
+
+
+def test_shared_request_errors_reach_every_fetch():
+    async def main():
+        async with CountingFetcher(ValueError("failed")) as fetcher:
+            results = await asyncio.gather(
+                *(fetcher.fetch(CourseFetchTask(67101, 2026)) for _ in range(3)), return_exceptions=True
+            )
+            assert [type(result) for result in results] == [ValueError] * 3
+            assert fetcher.requests == 1
+
+    asyncio.run(main())
+
+
+def test_cancelling_one_fetch_keeps_the_request_for_the_others():
+    async def main():
+        async with CountingFetcher("page") as fetcher:
+            first = asyncio.create_task(fetcher.fetch(CourseFetchTask(67101, 2026)))
+            second = asyncio.create_task(fetcher.fetch(CourseFetchTask(67101, 2026)))
+            await asyncio.sleep(0)
+            first.cancel()
+            assert await second == "page"
+            with pytest.raises(asyncio.CancelledError):
+                await first
+
+    asyncio.run(main())
+
+
+def test_urgent_fetch_does_not_join_a_less_urgent_waiting_request():
+    async def main():
+        async with CountingFetcher("page") as fetcher:
+            pages = await asyncio.gather(
+                fetcher.fetch(CourseFetchTask(67101, 2026, Priority.BACKGROUND)),
+                fetcher.fetch(CourseFetchTask(67101, 2026, Priority.INTERACTIVE)),
+                fetcher.fetch(CourseFetchTask(67101, 2026, Priority.NORMAL)),
+            )
+            assert pages == ["page"] * 3
+            # The normal fetch joins the interactive request
+            assert fetcher.requests == 2
+            assert fetcher.metrics.counter("coalesced_fetches_total") == 1
+
+    asyncio.run(main())
+
+
+def test_reading_stops_at_a_marker_split_between_chunks():
+    async def main():
+        body = ("<html>" + "x" * 2000 + MISSING_TEXT + "y" * 50000 + "</html>").encode("utf-8")
+        marker_start = body.index(MISSING_TEXT.encode("utf-8"))
+        # Also splits one of the marker's characters in the middle
+        chunks = [body[:marker_start + 3], *_split(body[marker_start + 3:], 1000)]
+        response = ChunkedResponse(chunks, charset="utf-8")
+
+        text, complete, bytes_read = await Fetcher()._read_until(response, _CoursePageGuard(MISSING_TEXT, 10 ** 6))
+        assert MISSING_TEXT in text and not complete and response.closed
+        assert bytes_read < len(body) // 2
+
+    asyncio.run(main())
+
+
+def test_reading_a_page_without_the_marker_reads_it_all():
+    async def main():
+        page = "<html>" + "קורס " * 10000 + "</html>"
+        response = ChunkedResponse(_split(page.encode("utf-8"), 777))
+
+        text, complete, bytes_read = await Fetcher()._read_until(response, _CoursePageGuard(MISSING_TEXT, 10 ** 6))
+        assert (text, complete, bytes_read) == (page, True, len(page.encode("utf-8")))
+        assert not response.closed
+
+        # Unless it is too large
+        response = ChunkedResponse(_split(page.encode("utf-8"), 777))
+        text, complete, _ = await Fetcher()._read_until(response, _CoursePageGuard(MISSING_TEXT, 1000))
+        assert not complete and len(text) < len(page)
+
+    asyncio.run(main())
+
+
+def test_page_retried_after_a_dropped_connection_is_read_in_full():
+    page = "<html>" + "x" * 700 * 1024 + "</html>"
+    requests = []
+
+    async def handle(request):
+        requests.append(request)
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        response.content_length = len(page)
+        await response.prepare(request)
+        if len(requests) == 1:
+            # Drops the connection in the middle of the body
+            await response.write(page[:400 * 1024].encode("utf-8"))
+            request.transport.close()
+            return response
+        await response.write(page.encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def main():
+        policy = RetryPolicy(base_delay=0.0, max_delay=0.0)
+        async with serve(handle) as url, Fetcher(retry_policy=policy, adaptive_concurrency=True) as fetcher:
+            text, complete = await fetcher.fetch_until(FetchTask(url, "GET"), _CoursePageGuard(MISSING_TEXT, 10 ** 6))
+        assert len(requests) == 2
+        assert complete and text == page
+
+    asyncio.run(main())
+
+
+def test_charset_declared_in_the_page_decodes_the_same_when_streamed():
+    page = (
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1255"></head>'
+        + "<body>" + "מבוא למדעי המחשב " * 200 + "</body></html>"
+    )
+
+    async def handle(request):
+        # No charset in the Content-Type header
+        return web.Response(body=page.encode("windows-1255"), headers={"Content-Type": "text/html"})
+
+    async def main():
+        async with serve(handle) as url, Fetcher() as fetcher:
+            task = FetchTask(url, "GET")
+            text = await fetcher.fetch(task)
+            streamed, complete = await fetcher.fetch_until(task, lambda text, bytes_read: False)
+        assert text == streamed == page and complete
+
+    asyncio.run(main())
+
+
+def test_failing_metrics_callback_does_not_fail_the_fetch():
+    async def handle(request):
+        return web.Response(text="page")
+
+    def callback(kind, name, value, labels):
+        raise ValueError("failed")
+
+    async def main():
+        metrics = Metrics()
+        metrics.subscribe(callback)
+        async with serve(handle) as url, Fetcher(metrics=metrics) as fetcher:
+            assert await fetcher.fetch(FetchTask(url, "GET")) == "page"
+        assert metrics.counter("requests_total") == 1
+
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+from hujiscrape.fetch_tasks import CourseFetchTask, Priority
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.limiters import AIMDLimiter, ConcurrencyLimiter, TokenBucket
+
+
+def test_limiter_lets_waiters_through_in_order():
+    async def run():
+        limiter = ConcurrencyLimiter(1)
+        order = []
+
+        async def request(name):
+            await limiter.acquire()
+            order.append(name)
+            await asyncio.sleep(0)
+            limiter.release()
+
+        await asyncio.gather(*(request(i) for i in range(5)))
+        return order, limiter.in_flight
+
+    assert asyncio.run(run()) == ([0, 1, 2, 3, 4], 0)
+
+
+def test_urgent_waiters_jump_the_queue():
+    async def run():
+        limiter = ConcurrencyLimiter(1)
+        order = []
+
+        async def request(name, task):
+            await limiter.acquire(task.urgency)
+            order.append(name)
+            await asyncio.sleep(0)
+            limiter.release()
+
+        await limiter.acquire()
+        waiting = [
+            asyncio.create_task(request(name, task))
+            for name, task in [
+                ("background", CourseFetchTask(1, 2026, Priority.BACKGROUND)),
+                ("normal", CourseFetchTask(2, 2026)),
+                ("late interactive", CourseFetchTask(3, 2026, Priority.INTERACTIVE, deadline=20.0)),
+                ("interactive", CourseFetchTask(4, 2026, Priority.INTERACTIVE)),
+                ("early interactive", CourseFetchTask(5, 2026, Priority.INTERACTIVE, deadline=10.0)),
+            ]
+        ]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*waiting)
+        return order
+
+    assert asyncio.run(run()) == ["early interactive", "late interactive", "interactive", "normal", "background"]
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def run():
+        limiter = ConcurrencyLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        limiter.release()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return limiter.in_flight
+
+    assert asyncio.run(run()) == 0
+
+
+def test_aimd_limit_grows_on_stable_latency_and_backs_off_on_failure():
+    limiter = AIMDLimiter(initial_limit=10, max_limit=20, backoff_cooldown=0)
+    for _ in range(100):
+        limiter.on_success(0.1)
+    assert limiter.limit > 10
+
+    grown_limit = limiter.limit
+    limiter.on_failure()
+    assert limiter.limit == grown_limit // 2
+
+
+def test_aimd_backs_off_when_latency_rises():
+    limiter = AIMDLimiter(initial_limit=10, backoff_cooldown=0)
+    for _ in range(10):
+        limiter.on_success(0.1)
+    before = limiter.limit
+    for _ in range(5):
+        limiter.on_success(1.0)
+    assert limiter.limit < before
+
+
+def test_aimd_initial_limit_is_within_the_bounds():
+    async def run():
+        limiter = AIMDLimiter(max_limit=5)
+        acquiring = [asyncio.create_task(limiter.acquire()) for _ in range(10)]
+        await asyncio.sleep(0)
+        in_flight = limiter.in_flight
+        for task in acquiring:
+            task.cancel()
+        await asyncio.gather(*acquiring, return_exceptions=True)
+        async with Fetcher(max_concurrency=5, adaptive_concurrency=True) as fetcher:
+            fetcher_limit = fetcher._limiter.limit
+        return limiter.limit, in_flight, fetcher_limit
+
+    assert asyncio.run(run()) == (5, 5, 5)
+    assert AIMDLimiter(initial_limit=1, min_limit=2).limit == 2
+
+
+def test_token_bucket_spaces_requests_by_rate():
+    async def run():
+        bucket = TokenBucket(rate=100, burst=2)
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # The burst goes out at once, the other 4 requests are 10ms apart
+    assert 0.035 <= asyncio.run(run()) < 0.2
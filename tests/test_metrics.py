@@ -0,0 +1,43 @@
+from hujiscrape.metrics import Metrics
+
+
+def test_snapshot_keeps_series_by_labels():
+    metrics = Metrics()
+    metrics.increment("request_errors_total", error="TimeoutError")
+    metrics.increment("request_errors_total", error="TimeoutError")
+    metrics.increment("request_errors_total", error="ClientOSError")
+    metrics.observe("ttfb_seconds", 0.02)
+    metrics.observe("ttfb_seconds", 3)
+
+    snapshot = metrics.snapshot()
+    assert {"labels": {"error": "TimeoutError"}, "value": 2} in snapshot["counters"]["request_errors_total"]
+    ttfb = snapshot["histograms"]["ttfb_seconds"][0]["value"]
+    assert ttfb["count"] == 2
+    assert ttfb["buckets"][0.025] == 1
+    assert ttfb["buckets"][float("inf")] == 2
+
+
+def test_histogram_quantile_is_a_bucket_bound():
+    metrics = Metrics()
+    for _ in range(99):
+        metrics.observe("download_seconds", 0.04)
+    metrics.observe("download_seconds", 20)
+
+    histogram = metrics.histogram("download_seconds")
+    assert histogram.quantile(0.5) == 0.05
+    assert histogram.quantile(1) == 30.0
+
+
+def test_prometheus_text_and_callbacks():
+    metrics = Metrics()
+    recorded = []
+    metrics.subscribe(lambda *args: recorded.append(args))
+    metrics.increment("requests_total")
+    metrics.set_gauge("in_flight_requests", 3)
+    metrics.observe("response_bytes", 100, buckets=(1024,), page='a"b')
+
+    text = metrics.to_prometheus()
+    assert "# TYPE hujiscrape_requests_total counter\nhujiscrape_requests_total 1\n" in text
+    assert 'hujiscrape_response_bytes_bucket{page="a\\"b",le="1024"} 1' in text
+    assert 'hujiscrape_response_bytes_count{page="a\\"b"} 1' in text
+    assert recorded[1] == ("gauge", "in_flight_requests", 3, {})
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from hujiscrape.html_to_object import BS4_ENGINE
+from hujiscrape.huji_objects import Exam
+from hujiscrape.parse_pool import (
+    COURSE_PAGE,
+    EXAMS_PAGE,
+    INLINE,
+    MAX_BATCH_CHARS,
+    PROCESS,
+    THREAD,
+    ParseBatcher,
+    ParseCostModel,
+    ParseDispatcher,
+    _init_worker,
+)
+
+DATA_DIR = Path(__file__).parent / "data"
+COURSE_HTML = (DATA_DIR / "course.html").read_text(encoding="utf-8")
+EXAMS_HTML = (DATA_DIR / "exams.html").read_text(encoding="utf-8")
+# The course id of the course page in tests/data
+TEMPLATE_COURSE_ID = "67101"
+
+
+class InlinePool:
+    """
+    Runs the batches sent to it in this process, and records them.
+    """
+
+    def __init__(self) -> None:
+        _init_worker(BS4_ENGINE)
+        self.batches = []
+
+    def submit(self, fn, page_type, htmls) -> Future:
+        self.batches.append(htmls)
+        future = Future()
+        future.set_result(fn(page_type, htmls))
+        return future
+
+
+def _course_page(course_id: int) -> str:
+    return COURSE_HTML.replace(TEMPLATE_COURSE_ID, str(course_id))
+
+
+def test_batches_are_sent_when_full_and_after_the_delay():
+    async def main():
+        pool = InlinePool()
+        batcher = ParseBatcher(pool, COURSE_PAGE, batch_size=3, batch_delay=0.05)
+        course_ids = list(range(10000, 10007))
+
+        start = time.monotonic()
+        results = await asyncio.gather(*(batcher.parse(_course_page(course_id)) for course_id in course_ids))
+
+        # Two full batches at once, and the rest once the delay passed
+        assert [len(batch) for batch in pool.batches] == [3, 3, 1]
+        assert time.monotonic() - start >= 0.05
+        # Every caller gets the course of its own page
+        assert [course.course_id for course, _ in results] == [str(course_id) for course_id in course_ids]
+
+    asyncio.run(main())
+
+
+def test_large_pages_are_sent_without_waiting_for_the_batch():
+    async def main():
+        pool = InlinePool()
+        batcher = ParseBatcher(pool, COURSE_PAGE, batch_size=8, batch_delay=10.0)
+        large_page = _course_page(10000).replace("</body>", " " * MAX_BATCH_CHARS + "</body>")
+
+        course, _ = await asyncio.wait_for(batcher.parse(large_page), timeout=1.0)
+        assert course.course_id == "10000"
+        assert len(pool.batches) == 1
+
+    asyncio.run(main())
+
+
+def test_pages_of_all_types_parsed_together_reach_their_callers():
+    async def main():
+        dispatcher = ParseDispatcher(1, inline_max_chars=-1, process_min_chars=0, calibrate=False)
+        try:
+            first, exams, second, search = await asyncio.gather(
+                dispatcher.parse_course(_course_page(10000)),
+                dispatcher.parse_exams(EXAMS_HTML),
+                dispatcher.parse_course(_course_page(10001)),
+                dispatcher.parse_search_results('<div class="title">קורס 10002</div>'),
+            )
+        finally:
+            dispatcher.shutdown()
+        assert (first[0].course_id, second[0].course_id) == ("10000", "10001")
+        assert exams[0] and all(isinstance(exam, Exam) for exam in exams[0])
+        assert search[0] == ["10002"]
+
+    asyncio.run(main())
+
+
+def _calibrate(dispatcher: ParseDispatcher, page_type: str, overhead: float, cost_per_char: float) -> None:
+    for size in range(1000, 1000 + 1000 * ParseDispatcher.MIN_CALIBRATION_SAMPLES, 1000):
+        dispatcher._record(page_type, size, overhead + cost_per_char * size)
+
+
+def test_cost_model_separates_the_overhead_from_the_cost_per_char():
+    model = ParseCostModel(smoothing=0.1)
+    for size in (1000, 5000, 20000, 3000, 50000):
+        model.add(size, 0.004 + 1e-7 * size)
+
+    overhead, cost_per_char = model.fit()
+    assert abs(overhead - 0.004) < 1e-9 and abs(cost_per_char - 1e-7) < 1e-12
+    assert model.max_chars(0.005) == 10000
+    assert model.max_chars(0.003) == -1
+
+
+def test_pages_are_not_parsed_inline_until_calibrated():
+    dispatcher = ParseDispatcher(1)
+    assert dispatcher.venue_for("x" * 100) == THREAD
+    assert dispatcher.venue_for("x" * 300 * 1024) == PROCESS
+
+
+def test_calibrated_routing_accounts_for_the_parse_overhead():
+    dispatcher = ParseDispatcher(1, inline_budget=0.005, process_min_duration=0.05)
+    _calibrate(dispatcher, COURSE_PAGE, overhead=0.004, cost_per_char=1e-7)
+
+    assert dispatcher.venue_for("x" * 5000, COURSE_PAGE) == INLINE
+    assert dispatcher.venue_for("x" * 50000, COURSE_PAGE) == THREAD
+    assert dispatcher.venue_for("x" * 500000, COURSE_PAGE) == PROCESS
+    # Exam pages have their own calibration
+    assert dispatcher.venue_for("x" * 5000, EXAMS_PAGE) == THREAD
+
+
+def test_pages_with_overhead_over_the_budget_are_never_parsed_inline():
+    dispatcher = ParseDispatcher(1, inline_budget=0.005)
+    _calibrate(dispatcher, EXAMS_PAGE, overhead=0.013, cost_per_char=1e-8)
+
+    assert dispatcher.venue_for("x" * 10, EXAMS_PAGE) == THREAD
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from hujiscrape.html_to_object import HtmlToCourse, HtmlToExams
+from hujiscrape.parse_profiles import HEADER, LESSONS, ROWS, SORT, TREE_BUILD, ParseProfile
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def test_profile_times_every_stage():
+    html = (DATA_DIR / "course.html").read_text(encoding="utf-8")
+    profile = ParseProfile()
+    parser = HtmlToCourse(profile=profile)
+
+    assert parser.convert(html) == HtmlToCourse().convert(html)
+    parser.convert(html)
+
+    assert profile.pages == 2
+    stages = profile.to_dict()["stages"]
+    assert set(stages) == {TREE_BUILD, HEADER, ROWS, LESSONS, SORT}
+    # Once per schedule row (the title row is skipped)
+    assert stages[ROWS][1] == stages[LESSONS][1] == 6
+    assert all(seconds >= 0 for seconds, _ in stages.values())
+
+
+def test_profiles_merge_and_drain():
+    worker_profile = ParseProfile()
+    HtmlToExams(profile=worker_profile).convert((DATA_DIR / "exams.html").read_text(encoding="utf-8"))
+
+    profile = ParseProfile()
+    profile.merge(worker_profile.drain())
+    profile.merge(profile.to_dict())
+
+    assert profile.pages == 2
+    assert profile.to_dict()["stages"][TREE_BUILD][1] == 2
+    assert worker_profile.pages == 0
+    assert worker_profile.seconds(TREE_BUILD) == 0
+    assert "tree_build" in profile.report()
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import pytest
+
+from hujiscrape.html_to_object import HtmlToCourse, HtmlToCourseIds, HtmlToExams, BS4_ENGINE, LXML_ENGINE
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        HtmlToCourse("html5lib")
+
+
+def test_bs4_course_golden_output():
+    course = HtmlToCourse(BS4_ENGINE).convert((DATA_DIR / "course.html").read_text(encoding="utf-8"))
+
+    assert course.course_id == "67101"
+    assert course.faculty == "הפקולטה למדעי הטבע"
+    assert course.department == "מדעי המחשב"
+    assert course.credits == 7
+    assert course.exam_length == 3.0
+    assert course.syllabus_url == "https://shnaton.huji.ac.il/syllabus.php?course=67101&year=2025"
+    assert len(course.schedule) == 6
+    assert course.schedule[0].lecturers == ('ד"ר ישראל ישראלי', "פרופ'", "משה", "כהן")
+
+
+def test_search_results_course_ids():
+    html = (DATA_DIR / "search.html").read_text(encoding="utf-8")
+
+    # The page's own title has no id
+    assert HtmlToCourseIds(BS4_ENGINE).convert(html) == ["67101", "67109", "67504"]
+
+
+@pytest.mark.parametrize(
+    "parser_type, file_name",
+    [(HtmlToCourse, "course.html"), (HtmlToExams, "exams.html"), (HtmlToCourseIds, "search.html")],
+)
+def test_lxml_engine_matches_bs4(parser_type, file_name):
+    pytest.importorskip("lxml")
+    html = (DATA_DIR / file_name).read_text(encoding="utf-8")
+
+    assert parser_type(LXML_ENGINE).convert(html) == parser_type(BS4_ENGINE).convert(html)
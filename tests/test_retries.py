@@ -0,0 +1,110 @@
+import asyncio
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict
+
+from hujiscrape.fetch_tasks import CourseFetchTask
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.retries import RetryBudget, RetryPolicy
+
+
+def _http_error(status: int, retry_after: str | None = None) -> aiohttp.ClientResponseError:
+    headers = CIMultiDict({"Retry-After": retry_after} if retry_after is not None else {})
+    return aiohttp.ClientResponseError(None, (), status=status, headers=headers)
+
+
+class FailingFetcher(Fetcher):
+    def __init__(self, errors, **kwargs):
+        super().__init__(**kwargs)
+        self.attempts = 0
+        self._errors = list(errors)
+
+    async def _single_request_attempt(self, *args, **kwargs):
+        self.attempts += 1
+        if self._errors:
+            raise self._errors.pop(0)
+        return 200, {}, "page", True
+
+
+def test_only_retryable_errors_are_retried():
+    policy = RetryPolicy()
+    assert policy.is_retryable(_http_error(503))
+    assert policy.is_retryable(aiohttp.ServerDisconnectedError())
+    assert policy.is_retryable(asyncio.TimeoutError())
+    assert not policy.is_retryable(_http_error(404))
+    assert not policy.is_retryable(asyncio.CancelledError())
+
+
+def test_retry_after_overrides_the_backoff():
+    policy = RetryPolicy(max_retry_after=60)
+    assert policy.delay(_http_error(429, "7"), 0.0) == 7
+    assert policy.delay(_http_error(503, "600"), 0.0) is None
+    # As an HTTP date
+    assert policy.delay(_http_error(503, "Wed, 21 Oct 2015 07:28:00 GMT"), 0.0) == 0.0
+    assert policy.delay(_http_error(503, "Wed, 21 Oct 2099 07:28:00 GMT"), 0.0) is None
+
+
+def test_decorrelated_jitter_backoff_is_bounded():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    delay = 0.0
+    for _ in range(100):
+        next_delay = policy.delay(aiohttp.ServerDisconnectedError(), delay)
+        assert 1.0 <= next_delay <= min(10.0, max(1.0, delay * 3))
+        delay = next_delay
+
+
+def test_budget_limits_retries_to_a_share_of_the_requests():
+    budget = RetryBudget(ratio=0.1, min_retries_per_second=0.0)
+    for _ in range(50):
+        budget.record_request()
+    assert sum(budget.try_retry() for _ in range(20)) == 5
+
+
+def test_fetcher_retries_server_errors_but_not_missing_pages():
+    async def main():
+        policy = RetryPolicy(base_delay=0.0, max_delay=0.0)
+        errors = [_http_error(503), _http_error(502)]
+        async with FailingFetcher(errors, retry_policy=policy, adaptive_concurrency=True) as fetcher:
+            assert await fetcher.fetch(CourseFetchTask(67101, 2026)) == "page"
+            assert fetcher.attempts == 3
+
+        async with FailingFetcher([_http_error(404)], retry_policy=policy, adaptive_concurrency=True) as fetcher:
+            with pytest.raises(aiohttp.ClientResponseError):
+                await fetcher.fetch(CourseFetchTask(67101, 2026))
+            assert fetcher.attempts == 1
+
+    asyncio.run(main())
+
+
+def test_fetcher_stops_retrying_when_the_budget_is_spent():
+    async def main():
+        policy = RetryPolicy(
+            max_attempts=5, base_delay=0.0, max_delay=0.0, budget=RetryBudget(ratio=0.0, min_retries_per_second=0.1)
+        )
+        errors = [aiohttp.ServerDisconnectedError() for _ in range(10)]
+        async with FailingFetcher(errors, retry_policy=policy, adaptive_concurrency=True) as fetcher:
+            with pytest.raises(aiohttp.ServerDisconnectedError):
+                await fetcher.fetch(CourseFetchTask(67101, 2026))
+            # The budget allows a single retry in its 10 seconds window
+            assert fetcher.attempts == 2
+            assert fetcher.metrics.counter("retries_denied_total", reason="budget") == 1
+
+    asyncio.run(main())
+
+
+def test_adaptive_fetcher_replaces_a_broken_session_without_pausing():
+    async def fetch_after(error):
+        policy = RetryPolicy(base_delay=0.0, max_delay=0.0)
+        async with FailingFetcher([error], retry_policy=policy, adaptive_concurrency=True) as fetcher:
+            session = fetcher._session
+            assert await asyncio.wait_for(fetcher.fetch(CourseFetchTask(67101, 2026)), timeout=1.0) == "page"
+            await asyncio.sleep(0)
+            return fetcher._session is not session, fetcher.metrics.counter("session_recycles_total", reason="error")
+
+    async def main():
+        assert await fetch_after(aiohttp.ServerDisconnectedError()) == (True, 1)
+        # Server errors don't replace the session
+        assert await fetch_after(_http_error(503)) == (False, 0)
+
+    asyncio.run(main())
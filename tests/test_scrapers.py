@@ -0,0 +1,379 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from hujiscrape.fetch_tasks import ExamFetchTask, Priority, SearchFetchTask
+from hujiscrape.fetchers import Fetcher
+from hujiscrape.parse_pool import ParseDispatcher
+from hujiscrape.metrics import Metrics
+from hujiscrape.scrapers import CourseIdScraper, SingleCourseScraper, _SharedParses
+from tests.standin import ShnatonStandIn, StandInConfig
+
+FIRST_COURSE_ID = 10000
+YEAR = 2026
+
+
+def _stand_in(**config) -> ShnatonStandIn:
+    return ShnatonStandIn(StandInConfig(**{"latency": 0.01, "latency_jitter": 0.0, **config}), seed=0)
+
+
+def _course_ids(count: int) -> range:
+    return range(FIRST_COURSE_ID, FIRST_COURSE_ID + count)
+
+
+def _process_dispatcher() -> ParseDispatcher:
+    # Parses every page in the process pool
+    return ParseDispatcher(1, inline_max_chars=-1, process_min_chars=0, calibrate=False)
+
+
+def _process_parsing_scraper(fetcher: Fetcher | None = None, **kwargs) -> SingleCourseScraper:
+    scraper = SingleCourseScraper(fetcher, max_cpu_workers=1, **kwargs)
+    dispatcher = scraper._parse_dispatcher
+    dispatcher.inline_max_chars, dispatcher.process_min_chars, dispatcher._calibrate = -1, 0, False
+    return scraper
+
+
+def test_scraper_context_keeps_the_session_and_parse_pool_between_scrapes():
+    async def main():
+        async with _stand_in() as stand_in:
+            scraper = _process_parsing_scraper(stand_in.fetcher())
+            async with scraper:
+                assert len(await scraper.scrape(_course_ids(3), YEAR)) == 3
+                session, pool = scraper._fetcher._session, scraper._parse_dispatcher._pool
+                assert not session.closed and pool is not None
+
+                assert len(await scraper.scrape(_course_ids(3), YEAR + 1)) == 3
+                assert scraper._fetcher._session is session and scraper._parse_dispatcher._pool is pool
+            assert session.closed and scraper._parse_dispatcher._pool is None
+
+            # Used again, within a block or not
+            async with scraper:
+                assert len(await scraper.scrape(_course_ids(2), YEAR)) == 2
+            assert len(await scraper.scrape(_course_ids(2), YEAR)) == 2
+            assert scraper._fetcher._session.closed and scraper._parse_dispatcher._pool is None
+
+    asyncio.run(main())
+
+
+def test_scraper_does_not_shut_down_a_dispatcher_it_was_given():
+    async def main():
+        dispatcher = _process_dispatcher()
+        try:
+            async with _stand_in() as stand_in:
+                scraper = SingleCourseScraper(stand_in.fetcher(), parse_dispatcher=dispatcher)
+                assert len(await scraper.scrape(_course_ids(2), YEAR)) == 2
+                pool = dispatcher._pool
+                assert pool is not None
+
+                async with scraper:
+                    assert len(await scraper.scrape(_course_ids(2), YEAR)) == 2
+                assert dispatcher._pool is pool
+        finally:
+            dispatcher.shutdown()
+
+    asyncio.run(main())
+
+
+class TrackingScraper(SingleCourseScraper):
+    """
+    Records how many courses are scraped at once, and delays the scraping of the given courses.
+    """
+
+    def __init__(self, fetcher: Fetcher | None = None, delays: dict | None = None) -> None:
+        super().__init__(fetcher, max_cpu_workers=1)
+        self._delays = delays or {}
+        self.scraping = 0
+        self.max_scraping = 0
+
+    async def _scrape_course_with_exams(self, course_fetch_task, *args):
+        self.scraping += 1
+        self.max_scraping = max(self.max_scraping, self.scraping)
+        try:
+            await asyncio.sleep(self._delays.get(course_fetch_task.course_id, 0))
+            return await super()._scrape_course_with_exams(course_fetch_task, *args)
+        finally:
+            self.scraping -= 1
+
+
+class NoExamsFetcher(Fetcher):
+    async def fetch(self, task):
+        if isinstance(task, ExamFetchTask):
+            raise aiohttp.ServerDisconnectedError()
+        return await super().fetch(task)
+
+
+class SearchResultsFetcher(Fetcher):
+    """
+    Answers search results pages from faculty -> page -> course ids, with no results past the given pages.
+    A faculty mapped to an exception fails, and one mapped to None never answers.
+    """
+
+    def __init__(self, results: dict) -> None:
+        super().__init__()
+        self._results = results
+        self.pages = []
+        self.priorities = []
+        self.cancelled = []
+
+    async def fetch(self, task: SearchFetchTask) -> str:
+        faculty, page = task.faculty, task.page
+        self.pages.append((faculty, page))
+        self.priorities.append(task.priority)
+        results = self._results[faculty]
+        if isinstance(results, Exception):
+            raise results
+        if results is None:
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                self.cancelled.append((faculty, page))
+                raise
+        titles = "".join(f'<div class="title">קורס {course_id}</div>' for course_id in results(page))
+        return f"<html><body>{titles}</body></html>"
+
+
+class GatedFetcher(Fetcher):
+    """
+    Holds the course requests of BACKGROUND tasks until the gate is set, and sets held once one is held.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.gate = asyncio.Event()
+        self.held = asyncio.Event()
+
+    async def fetch_until(self, task, should_stop):
+        if task.priority == Priority.BACKGROUND:
+            self.held.set()
+            await self.gate.wait()
+        return await super().fetch_until(task, should_stop)
+
+class ExamsSignallingFetcher(Fetcher):
+    """
+    Sets exams_requested once an exams request is issued.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.exams_requested = asyncio.Event()
+
+    async def fetch(self, task):
+        if isinstance(task, ExamFetchTask):
+            self.exams_requested.set()
+        return await super().fetch(task)
+
+
+class ExamsAwaitingDispatcher(ParseDispatcher):
+    """
+    Parses a course page only once the exams of the course were requested.
+    """
+
+    def __init__(self, exams_requested: asyncio.Event) -> None:
+        super().__init__(1, calibrate=False)
+        self._exams_requested = exams_requested
+
+    async def parse_course(self, html):
+        await asyncio.wait_for(self._exams_requested.wait(), timeout=1.0)
+        return await super().parse_course(html)
+
+def _ids(courses) -> list:
+    return [int(course.course_id) for course in courses]
+
+
+def test_stream_bounds_the_courses_in_flight():
+    async def main():
+        async with _stand_in() as stand_in:
+            scraper = TrackingScraper(stand_in.fetcher())
+            courses = [course async for course in scraper.stream(_course_ids(20), YEAR, max_in_flight=3)]
+            assert sorted(_ids(courses)) == list(_course_ids(20))
+            assert scraper.max_scraping == 3
+
+    asyncio.run(main())
+
+
+def test_stream_yields_courses_as_they_complete():
+    async def main():
+        async with _stand_in() as stand_in:
+            scraper = TrackingScraper(stand_in.fetcher(), delays={str(FIRST_COURSE_ID): 0.3})
+            courses = [course async for course in scraper.stream(_course_ids(5), YEAR)]
+            assert _ids(courses)[-1] == FIRST_COURSE_ID
+
+    asyncio.run(main())
+
+
+def test_stream_consumes_async_iterables_lazily():
+    async def course_ids():
+        for course_id in _course_ids(10):
+            await asyncio.sleep(0)
+            yield course_id
+
+    async def main():
+        async with _stand_in() as stand_in:
+            scraper = TrackingScraper(stand_in.fetcher())
+            courses = [course async for course in scraper.stream(course_ids(), YEAR, max_in_flight=2)]
+            assert sorted(_ids(courses)) == list(_course_ids(10))
+            assert scraper.max_scraping == 2
+
+    asyncio.run(main())
+
+
+def test_failed_exams_do_not_end_the_stream():
+    async def main():
+        async with _stand_in() as stand_in:
+            scraper = SingleCourseScraper(NoExamsFetcher(shnaton_url=stand_in.url), max_cpu_workers=1)
+            courses = await scraper.scrape(_course_ids(3), YEAR)
+            assert sorted(_ids(courses)) == list(_course_ids(3))
+            assert all(course.exams is None for course in courses)
+            assert scraper.metrics.counter("exam_failures_total") == 3
+
+    asyncio.run(main())
+
+
+def test_exams_are_fetched_while_the_course_is_parsed():
+    async def main():
+        async with _stand_in() as stand_in:
+            fetcher = ExamsSignallingFetcher(shnaton_url=stand_in.url)
+            dispatcher = ExamsAwaitingDispatcher(fetcher.exams_requested)
+            scraper = SingleCourseScraper(fetcher, parse_dispatcher=dispatcher)
+            try:
+                courses = await scraper.scrape([FIRST_COURSE_ID], YEAR)
+            finally:
+                dispatcher.shutdown()
+            assert _ids(courses) == [FIRST_COURSE_ID] and courses[0].exams
+
+    asyncio.run(main())
+
+def test_scrapers_sharing_a_fetcher_keep_its_session_open():
+    async def main():
+        async with _stand_in() as stand_in:
+            fetcher = GatedFetcher(shnaton_url=stand_in.url, max_concurrency=5)
+            background = SingleCourseScraper(fetcher, max_cpu_workers=1, priority=Priority.BACKGROUND)
+            interactive = SingleCourseScraper(fetcher, max_cpu_workers=1, priority=Priority.INTERACTIVE)
+
+            catalog = asyncio.create_task(background.scrape(_course_ids(40), YEAR))
+            await fetcher.held.wait()
+            refreshed = await interactive.scrape([FIRST_COURSE_ID + 100], YEAR)
+            # The catalog scrape still uses the session
+            assert not fetcher._session.closed
+            fetcher.gate.set()
+
+            assert len(await catalog) == 40
+            assert [course.course_id for course in refreshed] == [str(FIRST_COURSE_ID + 100)]
+            assert "request_errors_total" not in fetcher.metrics.snapshot()["counters"]
+            assert fetcher._session.closed
+
+    asyncio.run(main())
+
+
+def test_concurrent_scrapes_of_a_course_share_its_requests():
+    async def main():
+        async with _stand_in() as stand_in:
+            scraper = SingleCourseScraper(stand_in.fetcher(), max_cpu_workers=1)
+            async with scraper:
+                first, second = await asyncio.gather(
+                    scraper.scrape([FIRST_COURSE_ID], YEAR), scraper.scrape([FIRST_COURSE_ID], YEAR)
+                )
+            assert first == second and len(first) == 1
+            # One course page request and one exams page request
+            assert stand_in.requests == 2
+            assert scraper.metrics.counter("coalesced_fetches_total") == 2
+
+    asyncio.run(main())
+
+
+def test_course_ids_are_listed_until_the_results_end():
+    async def main():
+        # 5 pages of 2 courses, then empty pages
+        fetcher = SearchResultsFetcher({1: lambda page: [1000 + 2 * page, 1001 + 2 * page] if page <= 5 else []})
+        course_ids = await CourseIdScraper(fetcher, page_window=4).scrape(YEAR, [1])
+
+        assert sorted(map(int, course_ids)) == list(range(1002, 1012))
+        # The window of the first empty page is the last one fetched
+        assert sorted(page for _, page in fetcher.pages) == list(range(1, 9))
+
+    asyncio.run(main())
+
+
+def test_course_ids_are_parsed_by_the_dispatcher_with_the_scraper_priority():
+    async def main():
+        fetcher = SearchResultsFetcher({1: lambda page: [1000 + page] if page <= 2 else []})
+        scraper = CourseIdScraper(fetcher, page_window=2, max_cpu_workers=1, priority=Priority.BACKGROUND)
+        assert sorted(await scraper.scrape(YEAR, [1])) == ["1001", "1002"]
+
+        assert set(fetcher.priorities) == {Priority.BACKGROUND}
+        search_parses = [
+            series["value"]["count"]
+            for series in fetcher.metrics.snapshot()["histograms"]["parse_seconds"]
+            if series["labels"]["page"] == "search"
+        ]
+        assert sum(search_parses) == len(fetcher.pages)
+
+    asyncio.run(main())
+
+def test_course_ids_listing_stops_when_pages_repeat():
+    async def main():
+        # The same results for any page number
+        fetcher = SearchResultsFetcher({1: lambda page: [1000, 1001]})
+        course_ids = await CourseIdScraper(fetcher, page_window=4).scrape(YEAR, [1])
+
+        assert sorted(course_ids) == ["1000", "1001"]
+        assert len(fetcher.pages) == 8
+
+    asyncio.run(main())
+
+
+def test_failed_faculty_listing_cancels_the_others():
+    async def main():
+        fetcher = SearchResultsFetcher({1: ValueError("failed"), 2: None})
+        with pytest.raises(ValueError):
+            await CourseIdScraper(fetcher, page_window=2).scrape(YEAR, [1, 2])
+        assert sorted(fetcher.cancelled) == [(2, 1), (2, 2)]
+
+    asyncio.run(main())
+
+
+def test_identical_pages_of_several_years_are_parsed_once():
+    async def main():
+        # The stand-in serves the same page for a course in every year
+        async with _stand_in() as stand_in:
+            scraper = SingleCourseScraper(stand_in.fetcher(), max_cpu_workers=1)
+            courses = await scraper.scrape_years(_course_ids(4), [2025, 2026, 2027])
+
+        assert {year: sorted(_ids(year_courses)) for year, year_courses in courses.items()} == {
+            year: list(_course_ids(4)) for year in (2025, 2026, 2027)
+        }
+        course_parses = [
+            series["value"]["count"]
+            for series in scraper.metrics.snapshot()["histograms"]["parse_seconds"]
+            if series["labels"]["page"] == "course"
+        ]
+        assert sum(course_parses) == 4
+        assert scraper.metrics.counter("shared_parses_total") == 8
+
+        # Every year has its own copy of the course
+        first, second = courses[2025][0], next(
+            course for course in courses[2026] if course.course_id == courses[2025][0].course_id
+        )
+        assert first == second and first is not second
+        first.schedule.clear()
+        first.exams.clear()
+        assert second.schedule and second.exams
+
+    asyncio.run(main())
+
+
+def test_only_byte_identical_pages_share_a_parse():
+    async def main():
+        parses = []
+
+        async def parse(html):
+            parses.append(html)
+            return None
+
+        shared_parses = _SharedParses(10, Metrics())
+        for html in ("<div>(א) </div>", "<div>(א)  </div>", "<div>(א) </div>"):
+            await shared_parses.parse(html, lambda: parse(html))
+        assert parses == ["<div>(א) </div>", "<div>(א)  </div>"]
+
+    asyncio.run(main())
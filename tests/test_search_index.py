@@ -0,0 +1,49 @@
+import pytest
+
+from hujiscrape.huji_objects import Course, Lesson
+from hujiscrape.search_index import CourseIndex, tokenize
+
+
+def _course(course_id, lecturers, location="", language="עברית", department="מדעי המחשב"):
+    lesson = Lesson(location=location, passing_type="", time="", day="", semester="", group="", type="",
+                    lecturers=lecturers, row=0)
+    return Course(course_id=course_id, hebrew_name="", english_name="", department=department, faculty="",
+                  semester="", weekly_hours=0, credits=0, language=language, exam_length=0, exam_type="",
+                  schedule=[lesson], exams=None, hebrew_notes="", english_notes="", is_running=True,
+                  syllabus_url="", moodle_url="")
+
+
+def test_tokenize_normalizes_hebrew():
+    assert tokenize('ד"ר כֹּהֵן') == tokenize("ד״ר כהן") == ["דר", "כהנ"]
+    assert tokenize("Dr. COHEN") == ["dr", "cohen"]
+    # The maqaf separates words
+    assert tokenize("בית־ספר") == ["בית", "ספר"]
+
+
+def test_conjunctive_search():
+    index = CourseIndex([
+        _course("1", ["ד\"ר כהן יוסי"], location="רוס 1"),
+        _course("2", ["פרופ' לוי"], location="רוס 2"),
+        _course("3", ["ד\"ר כהן דנה"], language="אנגלית"),
+    ])
+
+    assert index.search_ids(lecturer="כהן") == {"1", "3"}
+    assert index.search_ids(lecturer="כהן", language="עברית") == {"1"}
+    assert index.search_ids(location="רוס") == {"1", "2"}
+    assert index.search_ids(location="רוס", lecturer="דנה") == set()
+    assert [course.course_id for course in index.search(department="מדעי")] == ["1", "2", "3"]
+    with pytest.raises(ValueError):
+        index.search_ids(room="רוס")
+
+
+def test_replace_and_remove():
+    index = CourseIndex([_course("1", ["כהן"])])
+    index.add(_course("1", ["לוי"]))
+
+    assert len(index) == 1
+    assert index.search_ids(lecturer="כהן") == set()
+    assert index.search_ids(lecturer="לוי") == {"1"}
+
+    index.remove("1")
+    assert "1" not in index
+    assert index.search_ids(lecturer="לוי") == set()
@@ -0,0 +1,159 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from hujiscrape.html_to_object import HtmlToCourse
+from hujiscrape.shards import ShardedCourseScraper, ShardWorker, SqliteShardQueue
+from tests.standin import ShnatonStandIn, StandInConfig
+
+DATA_DIR = Path(__file__).parent / "data"
+YEAR = 2026
+COURSE_IDS = [str(course_id) for course_id in range(10000, 10010)]
+
+
+def _stand_in() -> ShnatonStandIn:
+    return ShnatonStandIn(StandInConfig(latency=0.01, latency_jitter=0.0), seed=0)
+
+
+def _worker(queue: SqliteShardQueue, worker_id: str, stand_in: ShnatonStandIn) -> ShardWorker:
+    return ShardWorker(
+        queue,
+        worker_id,
+        include_exams=False,
+        max_cpu_workers=1,
+        heartbeat_interval=0.05,
+        fetcher_kwargs={"shnaton_url": stand_in.url},
+    )
+
+
+def _course_ids(queue: SqliteShardQueue) -> list:
+    return sorted(course.course_id for course in queue.courses(YEAR))
+
+
+def test_shards_are_leased_once_until_the_lease_expires(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    with SqliteShardQueue(path) as queue:
+        assert queue.add_shards(2026, range(5), shard_size=2) == 3
+        assert queue.shard_count(2026) == 3
+
+    with SqliteShardQueue(path) as first, SqliteShardQueue(path, lease_seconds=-1) as second:
+        shard = first.lease("first")
+        assert shard.course_ids == ["0", "1"]
+        assert second.lease("second").course_ids == ["2", "3"]
+        # The second queue's leases expire right away, so its shard is leased again
+        assert first.lease("first").course_ids == ["2", "3"]
+        assert first.lease("first").course_ids == ["4"]
+        assert first.lease("first") is None
+
+        first.release(shard)
+        assert first.lease("first") == shard
+
+
+def test_completed_shards_are_merged(tmp_path):
+    course = HtmlToCourse().convert((DATA_DIR / "course.html").read_text(encoding="utf-8"))
+    with SqliteShardQueue(str(tmp_path / "queue.sqlite")) as queue:
+        queue.add_shards(2026, [course.course_id, "1"])
+        shard = queue.lease("worker")
+        assert not queue.is_done()
+
+        queue.complete(shard, [course], {"1"})
+        # A late worker whose lease expired completes the shard again
+        queue.complete(shard, [course], {"1"})
+
+        assert queue.is_done()
+        assert [c.schedule for c in queue.courses(2026)] == [course.schedule]
+        assert list(queue.courses(2025)) == []
+        assert queue.failed_course_ids() == {("1", 2026)}
+
+
+def test_live_workers(tmp_path):
+    with SqliteShardQueue(str(tmp_path / "queue.sqlite")) as queue:
+        queue.heartbeat("first")
+        queue.heartbeat("second")
+        assert queue.live_workers() == 2
+        queue.leave("first")
+        assert queue.live_workers() == 1
+
+
+def test_workers_each_scrape_their_own_shards(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+
+    async def main():
+        with SqliteShardQueue(path) as queue:
+            queue.add_shards(YEAR, COURSE_IDS, shard_size=2)
+        async with _stand_in() as stand_in:
+            with SqliteShardQueue(path) as first, SqliteShardQueue(path) as second:
+                completed = await asyncio.gather(
+                    _worker(first, "first", stand_in).run(), _worker(second, "second", stand_in).run()
+                )
+                assert sum(completed) == 5
+                assert first.is_done() and first.live_workers() == 0
+                # Every course was scraped once
+                assert _course_ids(first) == COURSE_IDS
+                assert stand_in.requests == len(COURSE_IDS)
+
+    asyncio.run(main())
+
+
+def test_shard_of_a_dead_worker_is_scraped_once_its_lease_expires(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+
+    async def main():
+        with SqliteShardQueue(path) as queue:
+            queue.add_shards(YEAR, COURSE_IDS, shard_size=5)
+        # A worker that leased a shard and died
+        with SqliteShardQueue(path, lease_seconds=0.3) as dead:
+            assert dead.lease("dead").course_ids == COURSE_IDS[:5]
+
+        async with _stand_in() as stand_in:
+            with SqliteShardQueue(path) as queue:
+                assert await _worker(queue, "alive", stand_in).run() == 2
+                assert _course_ids(queue) == COURSE_IDS
+
+    asyncio.run(main())
+
+
+def test_workers_resume_an_interrupted_scrape(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    course = HtmlToCourse().convert((DATA_DIR / "course.html").read_text(encoding="utf-8"))
+
+    async def main():
+        with SqliteShardQueue(path) as queue:
+            queue.add_shards(YEAR, [course.course_id, *COURSE_IDS], shard_size=1)
+            queue.complete(queue.lease("interrupted"), [course], set())
+
+        async with _stand_in() as stand_in:
+            with SqliteShardQueue(path) as queue:
+                assert await _worker(queue, "resuming", stand_in).run() == len(COURSE_IDS)
+                assert stand_in.requests == len(COURSE_IDS)
+
+        # Once all the shards are done, scraping again only collects their courses
+        courses = await ShardedCourseScraper(path, workers=1).scrape([], YEAR)
+        assert sorted(course.course_id for course in courses) == sorted([course.course_id, *COURSE_IDS])
+
+    asyncio.run(main())
+
+
+def test_courses_are_matched_to_shards_by_the_requested_ids(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+
+    async def main():
+        with SqliteShardQueue(path) as queue:
+            # Parsed as course "10000"
+            queue.add_shards(YEAR, [" 10000", "10001"])
+        async with _stand_in() as stand_in:
+            with SqliteShardQueue(path) as queue:
+                assert await _worker(queue, "worker", stand_in).run() == 1
+                assert queue.failed_course_ids(YEAR) == set()
+                assert _course_ids(queue) == ["10000", "10001"]
+
+    asyncio.run(main())
+
+
+def test_rate_budget_is_not_a_fetcher_argument(tmp_path):
+    with SqliteShardQueue(str(tmp_path / "queue.sqlite")) as queue:
+        with pytest.raises(ValueError):
+            ShardWorker(queue, fetcher_kwargs={"requests_per_second": 10})
+    with pytest.raises(ValueError):
+        ShardedCourseScraper(str(tmp_path / "queue.sqlite"), fetcher_kwargs={"requests_per_second": 10})
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from hujiscrape.html_to_object import HtmlToCourse
+from hujiscrape.huji_objects import Exam
+from hujiscrape.state_stores import CourseStateStore, ScrapeJournal, hash_html
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def test_hash_is_of_the_exact_html():
+    assert hash_html("<div>a b</div>") == hash_html("<div>a b</div>")
+    # The parser keeps whitespace in text fields
+    assert hash_html("<div>a b</div>") != hash_html("<div>a  b</div>")
+
+
+def test_store_returns_course_only_for_unchanged_page(tmp_path):
+    html = (DATA_DIR / "course.html").read_text(encoding="utf-8")
+    course = HtmlToCourse().convert(html)
+    course.exams = [Exam("01/02/2026", "09:00", "", "", "א", "סמסטר א'")]
+
+    store = CourseStateStore()
+    store.update(course.course_id, hash_html(html), course)
+    # The store keeps its own copy, without exams
+    course.schedule.clear()
+    assert store.lookup(course.course_id, hash_html(html)).schedule
+    assert store.lookup(course.course_id, hash_html(html)) is not store.lookup(course.course_id, hash_html(html))
+    course.schedule = HtmlToCourse().convert(html).schedule
+    store.save(str(tmp_path / "state.json"))
+    store = CourseStateStore.load(str(tmp_path / "state.json"))
+
+    assert store.lookup(course.course_id, hash_html(html + "changed")) is None
+    cached = store.lookup(course.course_id, hash_html(html))
+    assert cached.schedule == course.schedule
+    assert cached.exams is None
+    assert store.unchanged_course_ids == {course.course_id}
+
+
+def test_journal_resumes_recorded_courses(tmp_path):
+    course = HtmlToCourse().convert((DATA_DIR / "course.html").read_text(encoding="utf-8"))
+    path = str(tmp_path / "journal.jsonl")
+
+    with ScrapeJournal(path) as journal:
+        journal.record_failure(course.course_id, 2025)
+        journal.record_course(course.course_id, 2026, course)
+        journal.record_failure("1", 2026)
+    # A record torn by a crash
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"course_id": "2", "ye')
+
+    with ScrapeJournal(path) as journal:
+        assert len(journal) == 1
+        assert journal.course(course.course_id, 2026).schedule == course.schedule
+        assert journal.course(course.course_id, 2025) is None
+        assert journal.failed_course_ids == {(course.course_id, 2025), ("1", 2026)}
+        journal.record_course("1", 2026, course)
+
+    with ScrapeJournal(path) as journal:
+        assert len(journal) == 2
+        assert journal.failed_course_ids == {(course.course_id, 2025)}
@@ -0,0 +1,52 @@
+import pytest
+
+from hujiscrape.huji_objects import Course, Lesson
+from hujiscrape.magics import Day, Semester
+
+np = pytest.importorskip("numpy")
+
+from hujiscrape.timetable import TimetableIndex  # noqa: E402
+
+
+def _course(course_id, *lessons):
+    schedule = [
+        Lesson(location="", passing_type="", time=time, day=day, semester=semester, group="", type="",
+               lecturers=[f"lecturer {course_id}"], row=0)
+        for semester, day, time in lessons
+    ]
+    return Course(course_id=course_id, hebrew_name="", english_name="", department="", faculty="", semester="",
+                  weekly_hours=0, credits=0, language="", exam_length=0, exam_type="", schedule=schedule, exams=None,
+                  hebrew_notes="", english_notes="", is_running=True, syllabus_url="", moodle_url="")
+
+
+@pytest.fixture
+def index():
+    return TimetableIndex([
+        _course("1", ("סמסטר א'", "יום ב'", "12:00-10:00")),
+        # Overlaps course 1
+        _course("2", ("סמסטר א'", "יום ב'", "13:00-11:00")),
+        # Same time, other semester
+        _course("3", ("סמסטר ב'", "יום ב'", "12:00-10:00")),
+        # Yearly, so it overlaps both semesters
+        _course("4", ("שנתי", "יום ב'", "14:00-11:45"), ("שנתי", "יום ה'", "10:00-09:00")),
+        # Touches course 1 without overlapping
+        _course("5", ("סמסטר א'", "יום ב'", "14:00-12:00")),
+        # Not indexed
+        _course("6", ("סמסטר א'", "", "")),
+    ])
+
+
+def test_conflicts(index):
+    assert index.conflicts_with(["1"]) == {"2", "4"}
+    assert index.conflicts_with(["3"]) == {"4"}
+    assert index.conflicts_with(["1", "2"]) == {"4", "5"}
+
+
+def test_fitting_in_free_slots(index):
+    free_slots = [(Semester.A, Day.Monday, 8 * 60, 13 * 60), (Semester.B, Day.Monday, 8 * 60, 12 * 60)]
+    assert index.fitting_in(free_slots) == {"1", "2", "3"}
+
+
+def test_teaching_at(index):
+    assert index.teaching_at(Semester.B, Day.Monday, 11 * 60 + 50) == [("3", ("lecturer 3",)), ("4", ("lecturer 4",))]
+    assert index.teaching_at(Semester.A, Day.Thursday, 9 * 60) == [("4", ("lecturer 4",))]